@@ -7,6 +7,7 @@ import webob
 
 from xdrs import hosts
 from xdrs import exception
+from xdrs.algorithms.filters import placement
 from oslo.config import cfg
 from random import choice
 import libvirt
@@ -39,6 +40,8 @@ def multiple_hosts_select(context, vms_list, local_host_uuid, hosts_list):
     2 获取所有主机的可用ram和CPU相关数据； 
     注：这里的hosts_cpu_data是通过get_host_cpu_data_temp_by_id获取，
     从HostCpuDataTemp数据表获取；
+    内存信息来自HostCpuData的total_ram和free_ram，没有上报过的主机由
+    get_hosts_meminfo通过gather_meminfo获取；
     """
     hosts_cpu_data, hosts_total_ram, hosts_free_ram = _get_hosts_statics(context, hosts_list)
     
@@ -81,13 +84,12 @@ def _get_vms_statics(context, vms_list, host_uuid):
     vms_cpu_data = dict()
     vms_ram_data = dict()
     
+    vms_cpu_data_rows = hosts_api.get_vms_cpu_data(context, vms_list)
     for vm in vms_list:
-        try:
-            cpu_data = hosts_api.get_vm_cpu_data_by_vm_id(context, vm)
-        except exception.NotFound:
+        if vm not in vms_cpu_data_rows:
             raise webob.exc.HTTPNotFound()
         
-        vms_cpu_data[vm] = cpu_data['cpu_data']
+        vms_cpu_data[vm] = vms_cpu_data_rows[vm]['cpu_data']
         
     try:
         vms_ram_data = hosts_api.get_vms_ram_on_specific(context, vms_list, host_uuid)
@@ -104,12 +106,15 @@ def _get_hosts_statics(context, hosts_list):
     获取所有主机的可用ram和CPU相关数据； 
     注：这里的hosts_cpu_data是通过get_host_cpu_data_temp_by_id获取，
     从HostCpuDataTemp数据表获取；
+    内存信息来自HostCpuData的total_ram和free_ram，没有上报过的主机由
+    get_hosts_meminfo通过gather_meminfo获取；
     """
     hosts_api = hosts.API()
     
     hosts_cpu_data = dict()
     hosts_total_ram = dict()
     hosts_free_ram = dict()
+    hosts_meminfo = hosts_api.get_hosts_meminfo(context, hosts_list)
     for host in hosts_list:
         try:
             cpu_data = hosts_api.get_host_cpu_data_temp_by_id(context, host)
@@ -119,12 +124,11 @@ def _get_hosts_statics(context, hosts_list):
         
         hosts_cpu_data[host] = cpu_data['cpu_data']
         
-        try:
-            host_meminfo = hosts_api.get_meminfo_by_id(context, host)
-        except exception.HostMemroyInfoNotFound:
+        if host not in hosts_meminfo:
             msg = _('host memroy info not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
         
+        host_meminfo = hosts_meminfo[host]
         hosts_total_ram[host] = host_meminfo['MemTotal']
         hosts_free_ram[host] = host_meminfo['MemFree']
     
@@ -270,10 +274,10 @@ def _multiple_hosts_select(
     for host_uuid_temp, vms_list_temp in hosts_select_2:
         for vm in vms_list_temp:
             vir_connection = libvirt.openReadOnly(host_uuid_temp)
-            physical_cpu_mhz_total = int(_physical_cpu_mhz_total(vir_connection) *
+            physical_cpu_mhz_total = int(placement.physical_cpu_mhz_total(vir_connection) *
                                             float(CONF.host_cpu_usable_by_vms))
             
-            host_cpu_utilization = _vm_mhz_to_percentage(
+            host_cpu_utilization = placement.vm_mhz_to_percentage(
                     vms_cpu_data[vm],
                     hosts_cpu_data[host_uuid_temp],
                     physical_cpu_mhz_total)
@@ -501,28 +505,6 @@ def _host_ram_not_enough_process(
     
     return vms_select_temp, min_ram_distance_host
 
-def _physical_cpu_mhz_total(vir_connection):
-    """ 
-    通过libvirt获取所有CPU核频率之和（MHz）；
-    vir_connection：到libvirt的连接；
-    """
-    return _physical_cpu_count(vir_connection) * \
-        _physical_cpu_mhz(vir_connection)
-        
-def _physical_cpu_count(vir_connection):
-    """ 
-    通过libvirt获取物理CPU的数目；
-    vir_connection：到libvirt的连接；
-    """
-    return vir_connection.getInfo()[2]
-
-def _physical_cpu_mhz(vir_connection):
-    """ 
-    通过libvirt获取CPU频率（MHz）；
-    vir_connection：到libvirt的连接；
-    """
-    return vir_connection.getInfo()[3]
-
 def _host_cpu_overload_process(context, hosts_select_3, vms_cpu_data, hosts_cpu_data):
     hosts_api = hosts.API()
     
@@ -535,14 +517,14 @@ def _host_cpu_overload_process(context, hosts_select_3, vms_cpu_data, hosts_cpu_
     
     for host_uuid, vm_list_temp in hosts_select_3:
         vir_connection = libvirt.openReadOnly(host_uuid)
-        physical_cpu_mhz_total = int(_physical_cpu_mhz_total(vir_connection) *
+        physical_cpu_mhz_total = int(placement.physical_cpu_mhz_total(vir_connection) *
                                             float(CONF.host_cpu_usable_by_vms))
         overload = True
         while overload:
             vm = choice(vm_list_temp)
             vm_list_temp.delete(vm)
             for vm in vm_list_temp:
-                host_cpu_utilization = _vm_mhz_to_percentage(
+                host_cpu_utilization = placement.vm_mhz_to_percentage(
                     vms_cpu_data[vm],
                     hosts_cpu_data[host_uuid],
                     physical_cpu_mhz_total)
@@ -556,23 +538,6 @@ def _host_cpu_overload_process(context, hosts_select_3, vms_cpu_data, hosts_cpu_
     
     return hosts_select_4
 
-def _vm_mhz_to_percentage(vm_mhz_history, host_mhz_history, physical_cpu_mhz):
-    """ 
-    转换虚拟机的CPU利用率到主机的CPU利用率；
-    由历史虚拟机CPU利用率数据和历史主机CPU使用数据，共同来计算主机的CPU利用率百分比；
-
-    vm_mhz_history：历史虚拟机CPU利用率列表，从本地读取虚拟机实例的采集数据（经过过滤）；
-    host_mhz_history：历史主机CPU使用数据列表，从本地读取本地主机的采集数据；
-    physical_cpu_mhz：所有可用的CPU核频率之和（MHz）；
-    """
-    max_len = max(len(x) for x in vm_mhz_history)
-    if len(host_mhz_history) > max_len:
-        host_mhz_history = host_mhz_history[-max_len:]
-    
-    mhz_history = [[0] * (max_len - len(x)) + x
-                   for x in vm_mhz_history + [host_mhz_history]]
-    return [float(sum(x)) / physical_cpu_mhz for x in zip(*mhz_history)]
-
 def _compute_host_cpu_mhz(context, host_uuid_temp):
     hosts_api = hosts.API()
     
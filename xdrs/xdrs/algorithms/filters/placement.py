@@ -0,0 +1,88 @@
+"""
+目标主机放置流程中与OpenStack无关的纯计算部分；
+
+single.py、multiple.py通过hosts.API访问数据库、通过libvirt获取主机的CPU频率，
+这里的函数只依赖传入的数据，不导入libvirt、oslo.messaging和数据库，
+离线的集群模拟器和微基准测试（xdrs/benchmarks）直接调用这些函数；
+"""
+
+
+def physical_cpu_mhz_total(vir_connection):
+    """
+    通过libvirt获取所有CPU核频率之和（MHz）；
+    vir_connection：到libvirt的连接；
+    """
+    return physical_cpu_count(vir_connection) * \
+        physical_cpu_mhz(vir_connection)
+
+def physical_cpu_count(vir_connection):
+    """
+    通过libvirt获取物理CPU的数目；
+    vir_connection：到libvirt的连接；
+    """
+    return vir_connection.getInfo()[2]
+
+def physical_cpu_mhz(vir_connection):
+    """
+    通过libvirt获取CPU频率（MHz）；
+    vir_connection：到libvirt的连接；
+    """
+    return vir_connection.getInfo()[3]
+
+def vm_mhz_to_percentage(vm_mhz_history, host_mhz_history, physical_cpu_mhz):
+    """
+    转换虚拟机的CPU利用率到主机的CPU利用率；
+    由历史虚拟机CPU利用率数据和历史主机CPU使用数据，共同来计算主机的CPU利用率百分比；
+    参数：
+    vm_mhz_history：历史虚拟机CPU利用率列表，从本地读取虚拟机实例的采集数据（经过过滤）；
+    host_mhz_history：历史主机CPU使用数据列表，从本地读取本地主机的采集数据；
+    physical_cpu_mhz：所有可用的CPU核频率之和（MHz）；
+    """
+    max_len = max(len(x) for x in vm_mhz_history)
+    if len(host_mhz_history) > max_len:
+        host_mhz_history = host_mhz_history[-max_len:]
+
+    mhz_history = [[0] * (max_len - len(x)) + x
+                   for x in vm_mhz_history + [host_mhz_history]]
+    return [float(sum(x)) / physical_cpu_mhz for x in zip(*mhz_history)]
+
+def select_host(vm_mhz_history, vm_ram, hosts_list, hosts_cpu_data,
+                hosts_free_ram, hosts_cpu_mhz, overload_detection):
+    """
+    为一个虚拟机实例选取迁移的目标主机（single_host_select中每个虚拟机的流程）：
+    在可用RAM大于虚拟机RAM、并且预迁移之后不过载的主机中，
+    选取预迁移之后CPU利用率最低的主机；
+    参数：
+    vm_mhz_history：虚拟机的历史CPU使用数据（MHz）；
+    vm_ram：虚拟机的RAM；
+    hosts_list：备选主机列表；
+    hosts_cpu_data：{host: 主机的历史CPU使用数据（MHz）}；
+    hosts_free_ram：{host: 主机的可用RAM}；
+    hosts_cpu_mhz：{host: 主机可用于虚拟机的CPU频率之和（MHz）}；
+    overload_detection：过载检测函数，参数为主机的CPU利用率列表，
+                        返回(是否过载, 检测状态)；
+    输出：
+    (host, host_cpu_utilization)，没有合适的主机时为(None, None)；
+    """
+    selected_host = None
+    selected_utilization = None
+    for host in hosts_list:
+        if hosts_free_ram[host] <= vm_ram:
+            continue
+
+        host_cpu_utilization = vm_mhz_to_percentage(
+            [vm_mhz_history],
+            hosts_cpu_data[host],
+            hosts_cpu_mhz[host])
+
+        overload, overload_detection_state = \
+            overload_detection(host_cpu_utilization)
+        if overload:
+            continue
+
+        if (selected_utilization is None or
+                host_cpu_utilization[-1] < selected_utilization[-1]):
+            selected_host = host
+            selected_utilization = host_cpu_utilization
+
+    return selected_host, selected_utilization
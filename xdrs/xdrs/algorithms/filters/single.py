@@ -7,6 +7,7 @@ import webob
 
 from xdrs import hosts
 from xdrs import exception
+from xdrs.algorithms.filters import placement
 from oslo.config import cfg
 import libvirt
 
@@ -40,13 +41,12 @@ def single_host_select(context, vms_list, host_uuid, hosts_list):
     vms_ram_data = dict()
     
         
+    vms_cpu_data_rows = hosts_api.get_vms_cpu_data(context, vms_list)
     for vm in vms_list:
-        try:
-            cpu_data = hosts_api.get_vm_cpu_data_by_vm_id(context, vm)
-        except exception.NotFound:
+        if vm not in vms_cpu_data_rows:
             raise webob.exc.HTTPNotFound()
         
-        vms_cpu_data[vm] = cpu_data['cpu_data']
+        vms_cpu_data[vm] = vms_cpu_data_rows[vm]['cpu_data']
         
     try:
         vms_ram_data = hosts_api.get_vms_ram_on_specific(context, vms_list, host_uuid)
@@ -63,21 +63,22 @@ def single_host_select(context, vms_list, host_uuid, hosts_list):
     hosts_cpu_data = dict()
     hosts_total_ram = dict()
     hosts_free_ram = dict()
+    hosts_cpu_data_rows = hosts_api.get_hosts_cpu_data(context, hosts_list)
+    # 内存信息来自HostCpuData的total_ram和free_ram，没有上报过的主机由
+    # get_hosts_meminfo通过gather_meminfo获取；
+    hosts_meminfo = hosts_api.get_hosts_meminfo(context, hosts_list)
     for host in hosts_list:
-        try:
-            cpu_data = hosts_api.get_host_cpu_data_by_id(context, host)
-        except exception.HostCpuDataNotFound:
+        if host not in hosts_cpu_data_rows:
             msg = _('host cpu data not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
         
-        hosts_cpu_data[host] = cpu_data['cpu_data']
+        hosts_cpu_data[host] = hosts_cpu_data_rows[host]['cpu_data']
         
-        try:
-            host_meminfo = hosts_api.get_meminfo_by_id(context, host)
-        except exception.HostMemroyInfoNotFound:
+        if host not in hosts_meminfo:
             msg = _('host memroy info not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
         
+        host_meminfo = hosts_meminfo[host]
         hosts_total_ram[host] = host_meminfo['MemTotal']
         hosts_free_ram[host] = host_meminfo['MemFree']
     
@@ -104,34 +105,29 @@ def single_host_select(context, vms_list, host_uuid, hosts_list):
     overload_algorithm_fuction = CONF.overload_algorithm_path + '.' + overload_algorithm_name
     overload_algorithm_fuction_params = [overload_algorithm_params]
     
-    vm_hosts_cpu = dict()
+    def overload_detection(utilization):
+        return overload_algorithm_fuction(utilization,
+                                          overload_algorithm_fuction_params)
+    
+    hosts_cpu_mhz = dict()
+    for host in hosts_list:
+        vir_connection = libvirt.openReadOnly(host)
+        hosts_cpu_mhz[host] = int(placement.physical_cpu_mhz_total(vir_connection) *
+                                  float(CONF.host_cpu_usable_by_vms))
+    
     vms_hosts_mapper = dict()
     for vm in vms_list:
-        for host in hosts_list:
-            if hosts_free_ram[host] > vms_ram_data[vm]:
-                vir_connection = libvirt.openReadOnly(host)
-                physical_cpu_mhz_total = int(_physical_cpu_mhz_total(vir_connection) *
-                                            float(CONF.host_cpu_usable_by_vms))
-                
-                host_cpu_utilization = _vm_mhz_to_percentage(
-                    vms_cpu_data[vm],
-                    hosts_cpu_data[host],
-                    physical_cpu_mhz_total)
-                
-                overload, overload_detection_state = overload_algorithm_fuction(host_cpu_utilization, 
-                                                                   overload_algorithm_fuction_params)
-                
-                vm_hosts_cpu[host] = (host_cpu_utilization, overload)
-        
-        count_num = 0
-        cpu_data = 100.0
-        for host_uuid, cpu_utilization in vm_hosts_cpu:
-            host_cpu_utilization = cpu_utilization[0]
-            host_load_state = cpu_utilization[1]
-            
-            if host_load_state == 'normalload':
-                if host_cpu_utilization < cpu_data:
-                    count_num = host_uuid
+        count_num, host_cpu_utilization = placement.select_host(
+                                              vms_cpu_data[vm],
+                                              vms_ram_data[vm],
+                                              hosts_list,
+                                              hosts_cpu_data,
+                                              hosts_free_ram,
+                                              hosts_cpu_mhz,
+                                              overload_detection)
+        if count_num is None:
+            vms_hosts_mapper[vm] = 0
+            continue
         
         vms_hosts_mapper[vm] = count_num
         
@@ -162,44 +158,3 @@ def single_host_select(context, vms_list, host_uuid, hosts_list):
             del vms_hosts_mapper_fales[vm]
     
     return vms_hosts_mapper_success, vms_hosts_mapper_fales
-
-
-
-def _physical_cpu_mhz_total(vir_connection):
-    """ 
-    通过libvirt获取所有CPU核频率之和（MHz）；
-    vir_connection：到libvirt的连接；
-    """
-    return _physical_cpu_count(vir_connection) * \
-        _physical_cpu_mhz(vir_connection)
-        
-def _physical_cpu_count(vir_connection):
-    """ 
-    通过libvirt获取物理CPU的数目；
-    vir_connection：到libvirt的连接；
-    """
-    return vir_connection.getInfo()[2]
-
-def _physical_cpu_mhz(vir_connection):
-    """ 
-    通过libvirt获取CPU频率（MHz）；
-    vir_connection：到libvirt的连接；
-    """
-    return vir_connection.getInfo()[3]
-
-def _vm_mhz_to_percentage(vm_mhz_history, host_mhz_history, physical_cpu_mhz):
-    """ 
-    转换虚拟机的CPU利用率到主机的CPU利用率；
-    由历史虚拟机CPU利用率数据和历史主机CPU使用数据，共同来计算主机的CPU利用率百分比；
-    参数：
-    vm_mhz_history：历史虚拟机CPU利用率列表，从本地读取虚拟机实例的采集数据（经过过滤）；
-    host_mhz_history：历史主机CPU使用数据列表，从本地读取本地主机的采集数据；
-    physical_cpu_mhz：所有可用的CPU核频率之和（MHz）；
-    """
-    max_len = max(len(x) for x in vm_mhz_history)
-    if len(host_mhz_history) > max_len:
-        host_mhz_history = host_mhz_history[-max_len:]
-    
-    mhz_history = [[0] * (max_len - len(x)) + x
-                   for x in vm_mhz_history + [host_mhz_history]]
-    return [float(sum(x)) / physical_cpu_mhz for x in zip(*mhz_history)]
\ No newline at end of file
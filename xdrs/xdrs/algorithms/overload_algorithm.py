@@ -1,12 +1,16 @@
 """
-实现三种简单的过载检测算法；
+实现四种简单的过载检测算法；
 1.永远不认为主机是过载的算法；
 2.静CPU利用率阈值算法；
 3.平均CPU利用率阈值算法；
+4.CPU利用率分位数阈值算法；
 """
 
 from contracts import contract
 
+from xdrs.algorithms import time_series
+from xdrs import quantile_sketch
+
 import logging
 log = logging.getLogger(__name__)
 
@@ -20,7 +24,8 @@ def never_overloaded_factory(time_step, migration_time, params):
     migration_time：所计算出的虚拟机迁移所花费的时间；
     params：若干参数信息；
     """
-    return lambda utilization, state=None: (False, {})
+    return lambda utilization, state=None, time_steps=None, \
+        percentiles=None: (False, {})
 
 
 @contract
@@ -32,9 +37,10 @@ def threshold_factory(time_step, migration_time, params):
     migration_time：所计算出的虚拟机迁移所花费的时间；
     params：若干参数信息；
     """
-    return lambda utilization, state=None: (threshold(params['threshold'],
-                                                      utilization),
-                                            {})
+    return lambda utilization, state=None, time_steps=None, \
+        percentiles=None: (
+            threshold(params['threshold'], utilization),
+            {})
 
 
 @contract
@@ -45,12 +51,17 @@ def last_n_average_threshold_factory(time_step, migration_time, params):
     time_step：调用算法的时间长度；
     migration_time：所计算出的虚拟机迁移所花费的时间；
     params：若干参数信息；
+    返回的算法可以传入time_steps（每个采样代表的时间长度），
+    此时按照最近n * time_step秒内的时间加权平均值判断；
     """
-    return lambda utilization, state=None: (
-        last_n_average_threshold(params['threshold'],
-                                 params['n'],
-                                 utilization),
-        {})
+    return lambda utilization, state=None, time_steps=None, \
+        percentiles=None: (
+            last_n_average_threshold(params['threshold'],
+                                     params['n'],
+                                     utilization,
+                                     time_step,
+                                     time_steps),
+            {})
 
 
 @contract
@@ -64,11 +75,52 @@ def threshold(threshold, utilization):
 
 
 @contract
-def last_n_average_threshold(threshold, n, utilization):
+def last_n_average_threshold(threshold, n, utilization, time_step=None,
+                             time_steps=None):
     """ 
     平均CPU利用率阈值算法；
     """
     if utilization:
-        utilization = utilization[-n:]
-        return sum(utilization) / len(utilization) > threshold
-    return False
\ No newline at end of file
+        values, weights = time_series.last_n_window(time_step, n,
+                                                    utilization, time_steps)
+        return time_series.weighted_mean(values, weights) > threshold
+    return False
+
+
+@contract
+def percentile_threshold_factory(time_step, migration_time, params):
+    """ 
+    CPU利用率分位数阈值过载检测算法的实现；
+    time_step：调用算法的时间长度；
+    migration_time：所计算出的虚拟机迁移所花费的时间；
+    params：threshold（阈值）、percentile（50、95或者99）、
+    n（没有分位数草图时使用的最近采样的个数）；
+    """
+    return lambda utilization, state=None, time_steps=None, \
+        percentiles=None: (
+            percentile_threshold(params['threshold'],
+                                 params['percentile'],
+                                 params['n'],
+                                 utilization,
+                                 percentiles),
+            {})
+
+
+@contract
+def percentile_threshold(threshold, percentile, n, utilization,
+                         percentiles=None):
+    """ 
+    CPU利用率分位数阈值过载检测算法；
+
+    如果主机CPU利用率的percentile分位数超过指定的阈值，则算法返回值为True，
+    认为被检测的主机是过载的；
+    percentiles为数据采集的分位数草图给出的主机CPU利用率分位数
+    （见hosts/sketch_store.py），提供时直接使用，不需要历史数据；
+    否则由最近n个主机CPU利用率计算；
+    """
+    value = (percentiles or {}).get('p%d' % percentile)
+    if value is None:
+        value = quantile_sketch.exact_percentile(utilization[-n:], percentile)
+    if value is None:
+        return False
+    return value > threshold
@@ -0,0 +1,54 @@
+"""
+检测算法使用的采样序列的辅助方法；
+
+数据采集的周期可以自适应调整（见xdrs.hosts.adaptive_interval），
+采样之间的时间间隔不再相同，"最近n个采样"不再代表固定的时间长度；
+检测算法收到每个采样代表的时间长度time_steps时，"最近n个采样"按照
+最近n * time_step秒计算，平均值按照时间加权；
+"""
+
+
+def last_n_window(time_step, n, utilization, time_steps=None):
+    """
+    返回最近n个采样周期内的采样及其权重：(values, weights)；
+    time_step：名义的采样周期（秒）；
+    time_steps：每个采样代表的时间长度（秒），与utilization的末尾对齐；
+    time_steps比utilization短时（例如采样时间的记录晚于采样开始，或者丢失），
+    较早的、没有记录时间的采样按照名义的采样周期计算；
+    没有time_steps时采样是等间隔的，返回最近n个采样，权重均为1；
+    """
+    if not time_steps or not time_step:
+        values = list(utilization[-n:])
+        return values, [1.0] * len(values)
+    missing = len(utilization) - len(time_steps)
+    if missing > 0:
+        time_steps = [float(time_step)] * missing + list(time_steps)
+    window = float(n * time_step)
+    values = []
+    weights = []
+    for value, step in zip(reversed(utilization), reversed(time_steps)):
+        if window <= 0:
+            break
+        values.append(value)
+        weights.append(min(step, window))
+        window -= step
+    values.reverse()
+    weights.reverse()
+    return values, weights
+
+
+def weighted_mean(values, weights):
+    total = sum(weights)
+    if not total:
+        return 0.0
+    return sum(value * weight
+               for value, weight in zip(values, weights)) / total
+
+
+def time_steps(times, time_step):
+    """
+    由采样的时间得到每个采样代表的时间长度；
+    第一个采样之前没有采样，使用名义的采样周期time_step；
+    """
+    steps = [b - a for a, b in zip(times, times[1:])]
+    return [float(time_step)] + steps if times else []
@@ -1,9 +1,10 @@
 """
-实现四种简单的虚拟机实例选取算法；
+实现五种简单的虚拟机实例选取算法；
 1.随机选取虚拟机实例算法的实现；
 2.基于资源最小利用率的虚拟机实例选取算法实现；
 3.基于最小迁移时间的虚拟机选取算法的实现；
 4.基于最小迁移时间和最大CPU使用的虚拟机实例选取算法的实现；
+5.基于最小迁移时间和最大CPU使用分位数的虚拟机实例选取算法的实现；
 """
 
 from contracts import contract
@@ -11,6 +12,8 @@ from random import choice
 import operator
 import logging
 
+from xdrs import quantile_sketch
+
 log = logging.getLogger(__name__)
 
 
@@ -26,7 +29,8 @@ def random_factory(time_step, migration_time, params):
     """
     random:随机选取虚拟机算法；
     """
-    return lambda vms_cpu, vms_ram, state=None: ([random(vms_cpu)], {})
+    return lambda vms_cpu, vms_ram, state=None, vms_percentiles=None: \
+        ([random(vms_cpu)], {})
 
 
 @contract
@@ -41,7 +45,7 @@ def minimum_utilization_factory(time_step, migration_time, params):
     """
     minimum_utilization:基于最小CPU利用率的虚拟机选取算法；
     """
-    return lambda vms_cpu, vms_ram, state=None: \
+    return lambda vms_cpu, vms_ram, state=None, vms_percentiles=None: \
         ([minimum_utilization(vms_cpu)], {})
 
 
@@ -57,7 +61,7 @@ def minimum_migration_time_factory(time_step, migration_time, params):
     """
     minimum_migration_time:基于最小RAM使用(表示虚拟机迁移的时间将会最少)的虚拟机选取算法；
     """
-    return lambda vms_cpu, vms_ram, state=None: \
+    return lambda vms_cpu, vms_ram, state=None, vms_percentiles=None: \
         ([minimum_migration_time(vms_ram)], {})
 
 
@@ -73,12 +77,30 @@ def minimum_migration_time_max_cpu_factory(time_step, migration_time, params):
     """
     minimum_migration_time_max_cpu:应用最小RAM和最大CPU使用的选取虚拟机算法；
     """
-    return lambda vms_cpu, vms_ram, state=None: \
+    return lambda vms_cpu, vms_ram, state=None, vms_percentiles=None: \
         ([minimum_migration_time_max_cpu(params['last_n'],
                                          vms_cpu,
                                          vms_ram)], {})
 
 
+@contract
+def minimum_migration_time_max_percentile_factory(time_step, migration_time,
+                                                 params):
+    """ 
+    基于最小迁移时间和最大CPU使用分位数的虚拟机选取算法的实现；
+    time_step：调用算法的时间长度；
+    migration_time：所计算出的虚拟机迁移所花费的时间；
+    params：percentile（50、95或者99）、
+    last_n（没有分位数草图时使用的最近采样的个数）；
+    """
+    return lambda vms_cpu, vms_ram, state=None, vms_percentiles=None: \
+        ([minimum_migration_time_max_percentile(params['percentile'],
+                                                params['last_n'],
+                                                vms_cpu,
+                                                vms_ram,
+                                                vms_percentiles)], {})
+
+
 @contract
 def minimum_migration_time(vms_ram):
     """ 
@@ -124,4 +146,30 @@ def minimum_migration_time_max_cpu(last_n, vms_cpu, vms_ram):
         if max_cpu < avg:
             max_cpu = avg
             selected_vm = vm
-    return selected_vm
\ No newline at end of file
+    return selected_vm
+
+
+@contract
+def minimum_migration_time_max_percentile(percentile, last_n, vms_cpu, vms_ram,
+                                          vms_percentiles=None):
+    """ 
+    应用最小RAM和最大CPU使用分位数的选取虚拟机算法；
+    vms_percentiles为数据采集的分位数草图给出的虚拟机实例CPU分位数
+    （见hosts/sketch_store.py），提供时直接使用，不需要历史数据；
+    否则由虚拟机实例最近last_n个CPU采样计算；
+    """
+    min_ram = min(vms_ram.values())
+    key = 'p%d' % percentile
+    max_cpu = None
+    selected_vm = None
+    for vm, ram in vms_ram.items():
+        if ram > min_ram:
+            continue
+        value = (vms_percentiles or {}).get(vm, {}).get(key)
+        if value is None:
+            value = quantile_sketch.exact_percentile(
+                vms_cpu.get(vm, [])[-last_n:], percentile)
+        if value is not None and (max_cpu is None or value > max_cpu):
+            max_cpu = value
+            selected_vm = vm
+    return selected_vm
@@ -0,0 +1,116 @@
+"""
+Request concurrency limiting middleware.
+并发请求数限制中间件的实现，用于在API worker过载时快速返回503（load shedding），
+并为每个请求设置截止时间（见xdrs.deadline）；
+注：流式输出的响应（StreamingCollection、CPU历史数据导出等）在返回之后
+还会继续调用conductor，所以请求的并发数配额和截止时间在响应输出完毕
+（app_iter.close()）时才释放；
+"""
+
+import eventlet
+from eventlet import semaphore
+from oslo.config import cfg
+import webob.dec
+import webob.exc
+
+from xdrs.conductor import rpcapi as conductor_rpcapi
+from xdrs import deadline
+from xdrs import metrics
+from xdrs.openstack.common.gettextutils import _
+from xdrs import wsgi
+
+
+concurrency_opts = [
+    cfg.IntOpt('osapi_max_in_flight_requests',
+               default=100,
+               help='Maximum number of requests an API worker processes at '
+                    'the same time; 0 disables the limit'),
+    cfg.FloatOpt('osapi_queue_wait',
+                 default=0.5,
+                 help='Seconds a request waits for a free slot before it is '
+                      'rejected with 503'),
+    cfg.IntOpt('osapi_request_timeout',
+               default=30,
+               help='Seconds an API request may spend on conductor calls '
+                    'before it fails with 503; 0 disables the deadline. '
+                    'Bulk requests such as the cpu data archive import '
+                    'and export are exempt'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(concurrency_opts)
+
+
+class _ClosingIterator(object):
+    """
+    包装响应的app_iter，在WSGI服务器关闭它（输出完毕或者客户端断开）时调用callback；
+    callback只调用一次；
+    """
+
+    def __init__(self, app_iter, callback):
+        self._app_iter = app_iter
+        self._iter = iter(app_iter)
+        self._callback = callback
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self._iter)
+
+    __next__ = next
+
+    def close(self):
+        callback, self._callback = self._callback, None
+        try:
+            if hasattr(self._app_iter, 'close'):
+                self._app_iter.close()
+        finally:
+            if callback is not None:
+                callback()
+
+
+class ConcurrencyLimiter(wsgi.Middleware):
+    """
+    Limit the number of requests in flight and set their deadline.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ConcurrencyLimiter, self).__init__(*args, **kwargs)
+        limit = CONF.osapi_max_in_flight_requests
+        self.slots = semaphore.Semaphore(limit) if limit > 0 else None
+        # conductor调用的并发数限制只在API服务中启用；
+        conductor_rpcapi.limit_in_flight_calls()
+
+    def _shed(self):
+        metrics.incr('xdrs_api_shed_requests')
+        msg = _("Too many requests in flight, please retry later.")
+        return webob.exc.HTTPServiceUnavailable(explanation=msg,
+                                                headers={'Retry-After': '1'})
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def __call__(self, req):
+        if self.slots is not None:
+            if not self.slots.acquire(blocking=False):
+                acquired = False
+                with eventlet.Timeout(CONF.osapi_queue_wait, False):
+                    acquired = self.slots.acquire()
+                if not acquired:
+                    return self._shed()
+
+        deadline.set_timeout(CONF.osapi_request_timeout or None)
+        try:
+            response = req.get_response(self.application)
+        except Exception:
+            self._release()
+            raise
+        # 替换app_iter时webob会清除Content-Length，这里保留原来的值；
+        content_length = response.content_length
+        response.app_iter = _ClosingIterator(response.app_iter, self._release)
+        response.content_length = content_length
+        return response
+
+    def _release(self):
+        deadline.clear()
+        if self.slots is not None:
+            self.slots.release()
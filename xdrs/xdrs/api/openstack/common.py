@@ -8,6 +8,8 @@ from oslo.config import cfg
 import six.moves.urllib.parse as urlparse
 import webob
 
+from xdrs.api.openstack import wsgi
+from xdrs import cpu_data_series
 from xdrs.openstack.common.gettextutils import _
 from xdrs.openstack.common import log as logging
 
@@ -16,6 +18,10 @@ osapi_opts = [
                default=1000,
                help='The maximum number of items returned in a single '
                     'response from a collection resource'),
+    cfg.IntOpt('osapi_stream_page_size',
+               default=500,
+               help='The number of rows fetched from the conductor per '
+                    'round trip when a collection response is streamed'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(osapi_opts)
@@ -51,6 +57,50 @@ def get_pagination_params(request):
     return params
 
 
+def get_cpu_data_query(request):
+    """
+    Return the CPU history query parameters of the request.
+
+    'start' and 'end' restrict the samples to a time range (ISO 8601 UTC),
+    'points' is the number of samples to return, downsampled with the
+    'downsample' method ('lttb' or 'minmax'), and 'stats' is a comma
+    separated list of statistics computed over the range (see
+    xdrs.cpu_data_series).  An empty dict means the raw data is returned.
+    """
+    params = {}
+    for param in ('start', 'end'):
+        if param in request.GET:
+            params[param] = _get_time_param(request, param)
+    if request.GET.get('points'):
+        params['points'] = _get_int_param(request, 'points')
+    if 'downsample' in request.GET:
+        downsample = request.GET['downsample']
+        if downsample not in cpu_data_series.DOWNSAMPLE_METHODS:
+            msg = _('downsample param must be one of %s') % \
+                ', '.join(cpu_data_series.DOWNSAMPLE_METHODS)
+            raise webob.exc.HTTPBadRequest(explanation=msg)
+        params['downsample'] = downsample
+    if request.GET.get('stats'):
+        try:
+            params['stats'] = cpu_data_series.parse_stats(
+                request.GET['stats'])
+        except ValueError as ex:
+            msg = _('unknown statistic %s') % ex
+            raise webob.exc.HTTPBadRequest(explanation=msg)
+    return params
+
+
+def _get_time_param(request, param):
+    """
+    Extract ISO 8601 time param from request or fail.
+    """
+    try:
+        return cpu_data_series.parse_time(request.GET[param])
+    except ValueError:
+        msg = _('%s param must be an ISO 8601 time') % param
+        raise webob.exc.HTTPBadRequest(explanation=msg)
+
+
 def _get_int_param(request, param):
     """
     Extract integer param from request or fail.
@@ -163,6 +213,39 @@ def limited_by_marker(items, request, max_limit=CONF.osapi_max_limit):
     return items[start_index:range_end]
 
 
+def iter_pages(fetch_page, marker_key, marker=None, limit=None):
+    """
+    Return an iterator over all items of a paged collection.
+
+    fetch_page(marker=..., limit=...) must return the items following
+    marker ordered by marker_key.  The first page is fetched eagerly
+    so that errors such as NotFound are raised before the response
+    starts streaming; the remaining pages are fetched lazily while
+    the previous one is being serialized.
+    """
+    page_size = CONF.osapi_stream_page_size
+    if limit:
+        page_size = min(page_size, limit)
+    page = fetch_page(marker=marker, limit=page_size)
+    return _iter_remaining_pages(fetch_page, marker_key, page,
+                                 page_size, limit)
+
+
+def _iter_remaining_pages(fetch_page, marker_key, page, page_size, limit):
+    returned = 0
+    while page:
+        for item in page:
+            yield item
+        returned += len(page)
+        if len(page) < page_size:
+            break
+        if limit:
+            if returned >= limit:
+                break
+            page_size = min(page_size, limit - returned)
+        page = fetch_page(marker=page[-1][marker_key], limit=page_size)
+
+
 def dict_to_query_str(params):
     param_str = ""
     for key, val in params.iteritems():
@@ -257,6 +340,47 @@ class ViewBuilder(object):
             })
         return links
 
+    def _stream_list_view(self, func, request, items, collection_key,
+                          item_key, links_key=None, id_key="uuid"):
+        """
+        Provide a lazily serialized view for a list of items.
+
+        Each item is rendered with func only when the serializer asks
+        for it; the 'next' link, if any, is computed once the last item
+        has been rendered.
+        """
+        state = {'count': 0, 'last': None}
+
+        def _render():
+            for item in items:
+                view = func(request, item)[item_key]
+                state['count'] += 1
+                state['last'] = view
+                yield view
+
+        def _links():
+            limit = int(request.params.get("limit", 0))
+            last_item = state['last']
+            if (not links_key or not limit or limit != state['count'] or
+                    last_item is None or id_key not in last_item):
+                return {}
+            return {links_key: [{
+                "rel": "next",
+                "href": self._get_next_link(request,
+                                            last_item[id_key],
+                                            self._collection_name),
+            }]}
+
+        return wsgi.StreamingCollection(collection_key, _render(),
+                                        extra=_links)
+
+    def _get_cpu_data_query_fields(self, item):
+        """
+        Return the fields added by a CPU history query, if any.
+        """
+        return dict((key, item[key]) for key in cpu_data_series.QUERY_FIELDS
+                    if key in item)
+
     def _update_link_prefix(self, orig_url, prefix):
         if not prefix:
             return orig_url
@@ -3,11 +3,13 @@ wsgi实现相关，是很重要，回头看的；
 """
 
 import inspect
+import logging as std_logging
 import math
 import time
 from xml.dom import minidom
 
 from lxml import etree
+from oslo.config import cfg
 import six
 import webob
 
@@ -21,6 +23,15 @@ from xdrs import utils
 from xdrs import wsgi
 
 
+wsgi_stream_opts = [
+    cfg.IntOpt('osapi_stream_chunk_size',
+               default=65536,
+               help='Approximate size in bytes of each chunk written when a '
+                    'collection response is streamed to the client'),
+]
+CONF = cfg.CONF
+CONF.register_opts(wsgi_stream_opts)
+
 XMLNS_V10 = 'http://docs.rackspacecloud.com/servers/api/v1.0'
 XMLNS_V11 = 'http://docs.openstack.org/compute/api/v1.1'
 XMLNS_ATOM = 'http://www.w3.org/2005/Atom'
@@ -345,6 +356,38 @@ class MetadataXMLDeserializer(XMLDeserializer):
         return metadata
 
 
+class StreamingCollection(object):
+    """
+    Lazily evaluated collection response body.
+
+    Wraps an iterable of already rendered items which is serialized
+    as ``{key: [item, ...], extra_key: extra_value}`` one item at a
+    time, so that large collections are never held in memory as a
+    single dict.  ``extra`` may be a dict or a callable returning a
+    dict; a callable is only evaluated after all items were consumed,
+    which lets view builders emit e.g. pagination links that depend
+    on the last item.
+    """
+
+    def __init__(self, key, items, extra=None):
+        self.key = key
+        self.items = items
+        self.extra = extra
+
+    def get_extra(self):
+        if callable(self.extra):
+            return self.extra() or {}
+        return self.extra or {}
+
+    def to_dict(self):
+        """
+        Materialize the collection, for serializers that cannot stream.
+        """
+        data = {self.key: list(self.items)}
+        data.update(self.get_extra())
+        return data
+
+
 class DictSerializer(ActionDispatcher):
     """
     Default request body serialization.
@@ -365,6 +408,35 @@ class JSONDictSerializer(DictSerializer):
     def default(self, data):
         return jsonutils.dumps(data)
 
+    def iter_serialize(self, data, chunk_size=None):
+        """
+        Serialize a StreamingCollection as a sequence of JSON chunks.
+
+        Items are encoded one by one and buffered until roughly
+        chunk_size bytes are pending, so peak memory is bounded by the
+        chunk size plus the largest single item.
+        """
+        chunk_size = chunk_size or CONF.osapi_stream_chunk_size
+        buf = ['{%s: [' % jsonutils.dumps(data.key)]
+        pending = len(buf[0])
+        separator = ''
+        for item in data.items:
+            encoded = separator + jsonutils.dumps(item)
+            separator = ', '
+            buf.append(encoded)
+            pending += len(encoded)
+            if pending >= chunk_size:
+                yield ''.join(buf)
+                buf = []
+                pending = 0
+
+        buf.append(']')
+        for key, value in six.iteritems(data.get_extra()):
+            buf.append(', %s: %s' % (jsonutils.dumps(key),
+                                     jsonutils.dumps(value)))
+        buf.append('}')
+        yield ''.join(buf)
+
 
 class XMLDictSerializer(DictSerializer):
     def __init__(self, metadata=None, xmlns=None):
@@ -506,6 +578,19 @@ def deserializers(**deserializers):
     return decorator
 
 
+def raw_body(func):
+    """
+    Marks a method that reads the request body itself.
+
+    The body of such a method is not deserialized, so any Content-Type
+    is accepted and the method may stream request.body_file instead of
+    having the whole body buffered.  Note that the function attributes
+    are directly manipulated; the method is not wrapped.
+    """
+    func.wsgi_raw_body = True
+    return func
+
+
 def response(code):
     """
     Attaches response code to a method.
@@ -649,7 +734,14 @@ class ResponseObject(object):
         for hdr, value in self._headers.items():
             response.headers[hdr] = utils.utf8(str(value))
         response.headers['Content-Type'] = utils.utf8(content_type)
-        if self.obj is not None:
+        if isinstance(self.obj, StreamingCollection):
+            if hasattr(serializer, 'iter_serialize'):
+                # NOTE: no Content-Length, the body is sent chunked.
+                response.app_iter = serializer.iter_serialize(self.obj)
+                response.content_length = None
+            else:
+                response.body = serializer.serialize(self.obj.to_dict())
+        elif self.obj is not None:
             response.body = serializer.serialize(self.obj)
 
         return response
@@ -1208,7 +1300,8 @@ class Resource(wsgi.Application):
             msg = _("Malformed request body")
             return Fault(webob.exc.HTTPBadRequest(explanation=msg))
 
-        if body:
+        # NOTE: masking the body is expensive, only do it when it is logged
+        if body and LOG.isEnabledFor(std_logging.DEBUG):
             msg = _("Action: '%(action)s', body: "
                     "%(body)s") % {'action': action,
                                    'body': unicode(body, 'utf-8')}
@@ -1247,7 +1340,8 @@ class Resource(wsgi.Application):
                                   u'volume_type': None, 
                                   u'size': 1}}}
             """
-            if self._should_have_body(request):
+            if (self._should_have_body(request) and
+                    not getattr(meth, 'wsgi_raw_body', False)):
                 #allow empty body with PUT and POST
                 if request.content_length == 0:
                     contents = {'body': None}
@@ -1418,7 +1512,8 @@ class Resource(wsgi.Application):
             # No exceptions; convert action_result into a
             # ResponseObject
             resp_obj = None
-            if type(action_result) is dict or action_result is None:
+            if (type(action_result) is dict or action_result is None or
+                    isinstance(action_result, StreamingCollection)):
                 resp_obj = ResponseObject(action_result)
             elif isinstance(action_result, ResponseObject):
                 resp_obj = action_result
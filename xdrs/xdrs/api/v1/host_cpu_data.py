@@ -1,9 +1,13 @@
+import functools
+
 import webob
 from webob import exc
 
 from xdrs.api.v1.admin_detection import authorize
 from xdrs.api.views import host_cpu_data as host_cpu_data_view
+from xdrs.api.openstack import common
 from xdrs.api.openstack import wsgi
+from xdrs import cpu_data_series
 from xdrs import hosts
 from xdrs import exception
 from xdrs.openstack.common.gettextutils import _
@@ -34,6 +38,7 @@ class Controller(wsgi.Controller):
     def show(self, req, id):
         context = req.environ['xdrs.context']
         authorize(context, 'show_host_cpu_data')
+        query = common.get_cpu_data_query(req)
         
         try:
             host_cpu_data = self.hosts_api.get_host_cpu_data_by_id(context, id)
@@ -41,17 +46,27 @@ class Controller(wsgi.Controller):
             msg = _('host cpu data not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
 
+        host_cpu_data = cpu_data_series.apply_query(host_cpu_data, query)
         return self._view_builder.show(req, host_cpu_data)
 
     def _get_host_cpu_data(self, req):
         context = req.environ['xdrs.context']
+        params = common.get_pagination_params(req)
+        query = common.get_cpu_data_query(req)
+        fetch_page = functools.partial(self.hosts_api.get_hosts_cpu_data_page,
+                                       context)
         
         try:
-            host_cpu_data = self.hosts_api.get_all_host_cpu_data(context)
+            host_cpu_data = common.iter_pages(fetch_page, 'host_id',
+                                              marker=params.get('marker'),
+                                              limit=params.get('limit'))
         except exception.HostCpuDataNotFound:
             msg = _('host cpu data not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
 
+        if query:
+            host_cpu_data = (cpu_data_series.apply_query(row, query)
+                             for row in host_cpu_data)
         return host_cpu_data
     
     def create(self, req, body):
@@ -1,8 +1,11 @@
+import functools
+
 import webob
 from webob import exc
 
 from xdrs.api.v1.admin_detection import authorize
 from xdrs.api.views import vm_migration_record as vm_migration_record_view
+from xdrs.api.openstack import common
 from xdrs.api.openstack import wsgi
 from xdrs import vms
 from xdrs import exception
@@ -45,9 +48,16 @@ class Controller(wsgi.Controller):
 
     def _get_vms_migration_records(self, req):
         context = req.environ['xdrs.context']
+        params = common.get_pagination_params(req)
+        fetch_page = functools.partial(
+                            self.vms_api.get_vms_migration_records_page,
+                            context)
         
         try:
-            vms_migration_records = self.vms_api.get_all_vms_migration_records(context)
+            vms_migration_records = common.iter_pages(
+                                            fetch_page, 'id',
+                                            marker=params.get('marker'),
+                                            limit=params.get('limit'))
         except exception.VmMigrationRecordNotFound:
             msg = _('vm migration record not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
@@ -1,9 +1,13 @@
+import functools
+
 import webob
 from webob import exc
 
 from xdrs.api.v1.admin_detection import authorize
 from xdrs.api.views import vm_cpu_data as vm_cpu_data_view
+from xdrs.api.openstack import common
 from xdrs.api.openstack import wsgi
+from xdrs import cpu_data_series
 from xdrs import hosts
 from xdrs import exception
 from xdrs.openstack.common.gettextutils import _
@@ -33,13 +37,22 @@ class Controller(wsgi.Controller):
 
     def _get_vm_cpu_data(self, req):
         context = req.environ['xdrs.context']
+        params = common.get_pagination_params(req)
+        query = common.get_cpu_data_query(req)
+        fetch_page = functools.partial(self.hosts_api.get_vms_cpu_data_page,
+                                       context)
         
         try:
-            vms_cpu_data = self.hosts_api.get_all_vms_cpu_data(context)
+            vms_cpu_data = common.iter_pages(fetch_page, 'vm_id',
+                                             marker=params.get('marker'),
+                                             limit=params.get('limit'))
         except exception.HostCpuDataNotFound:
             msg = _('host cpu data not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
 
+        if query:
+            vms_cpu_data = (cpu_data_series.apply_query(row, query)
+                            for row in vms_cpu_data)
         return vms_cpu_data
     
     def create(self, req, body):
@@ -0,0 +1,94 @@
+"""
+The cpu data archive API extension.
+CPU历史数据批量导出和导入的API扩展；
+
+GET /os-cpu-data-archive/vms（或者hosts）?start=XXX&end=XXX&compress=true
+导出虚拟机实例（或者主机）的CPU历史数据；
+POST /os-cpu-data-archive，请求体为导出的数据，批量导入；
+数据格式见xdrs/cpu_data_archive.py；
+导出和导入的耗时与数据量成正比，不受osapi_request_timeout的限制
+（见xdrs/deadline.py的exempt）；
+"""
+
+import webob
+from webob import exc
+
+from xdrs.api.v1.admin_detection import authorize
+from xdrs.api.openstack import common
+from xdrs.api.openstack import extensions
+from xdrs.api.openstack import wsgi
+from xdrs import cpu_data_archive
+from xdrs import deadline
+from xdrs import hosts
+from xdrs import exception
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class CpuDataArchiveController(wsgi.Controller):
+    """
+    The cpu data archive API controller for the OpenStack API.
+    """
+
+    def __init__(self, **kwargs):
+        super(CpuDataArchiveController, self).__init__(**kwargs)
+        self.hosts_api = hosts.API()
+
+    @deadline.exempt
+    def show(self, req, id):
+        """
+        导出一种CPU历史数据，以分块的方式输出；
+        """
+        context = req.environ['xdrs.context']
+        authorize(context, 'export_cpu_data')
+
+        if id not in cpu_data_archive.KINDS:
+            raise exc.HTTPNotFound()
+        query = common.get_cpu_data_query(req)
+        compress = req.GET.get('compress', '').lower() in ('1', 'true',
+                                                           'yes')
+
+        try:
+            chunks = self.hosts_api.export_cpu_data(context, id,
+                                                    start=query.get('start'),
+                                                    end=query.get('end'),
+                                                    compress=compress)
+        except exception.NotFound:
+            raise exc.HTTPNotFound()
+
+        return webob.Response(app_iter=chunks,
+                              content_type=cpu_data_archive.CONTENT_TYPE)
+
+    @wsgi.raw_body
+    @deadline.exempt
+    def create(self, req):
+        """
+        批量导入请求体中的CPU历史数据，返回导入的序列数；
+        """
+        context = req.environ['xdrs.context']
+        authorize(context, 'import_cpu_data')
+
+        try:
+            count = self.hosts_api.import_cpu_data(context, req.body_file)
+        except ValueError as ex:
+            msg = _('Invalid cpu data archive: %s') % ex
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        LOG.audit(_("Imported %d cpu data series"), count, context=context)
+        return {'imported': count}
+
+
+class CpuDataArchive(extensions.ExtensionDescriptor):
+    name = "Cpu Data Archive"
+    alias = "os-cpu-data-archive"
+    namespace = " "
+    updated = "2026-10-19T00:00:00+00:00"
+
+    def get_resources(self):
+        resources = []
+        res = extensions.ResourceExtension('os-cpu-data-archive',
+                                           CpuDataArchiveController())
+        resources.append(res)
+        return resources
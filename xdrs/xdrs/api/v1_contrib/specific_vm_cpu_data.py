@@ -7,8 +7,10 @@ import webob
 from webob import exc
 
 from xdrs.api.v1.admin_detection import authorize
+from xdrs.api.openstack import common
 from xdrs.api.openstack import extensions
 from xdrs.api.openstack import wsgi
+from xdrs import cpu_data_series
 from xdrs import hosts
 from xdrs import exception
 from xdrs.openstack.common.gettextutils import _
@@ -40,6 +42,8 @@ def _translate_vm_cpu_data_summary_view(context, vm_cpu_data):
     d['host_name'] = vm_cpu_data['host_name']
     d['data_len'] = vm_cpu_data['data_len']
     d['cpu_data'] = vm_cpu_data['cpu_data']
+    d.update((key, vm_cpu_data[key]) for key in cpu_data_series.QUERY_FIELDS
+             if key in vm_cpu_data)
     LOG.audit(_("vm_cpu_data=%s"), vm_cpu_data, context=context)
 
     return d
@@ -58,12 +62,14 @@ class VMsCpuDataController(wsgi.Controller):
     def get_vm_cpu_data_by_host_id(self, req, id):
         context = req.environ['xdrs.context']
         authorize(context, 'get_vm_cpu_data')
+        query = common.get_cpu_data_query(req)
         
         try:
             vms_cpu_data = self.hosts_api.get_vm_cpu_data_by_host_id(context, id)
         except exception.NotFound:
             raise exc.HTTPNotFound()
         
+        vms_cpu_data = cpu_data_series.apply_query(vms_cpu_data, query)
         vms_cpu_data_dict = self._items(req, context, vms_cpu_data, entity_maker=_translate_vm_cpu_data_detail_view)
         
         return vms_cpu_data_dict
@@ -80,12 +86,14 @@ class VMsCpuDataController(wsgi.Controller):
     def get_vm_cpu_data_by_vm_id(self, req, id):
         context = req.environ['xdrs.context']
         authorize(context, 'get_vm_cpu_data')
+        query = common.get_cpu_data_query(req)
         
         try:
             vm_cpu_data = self.hosts_api.get_vm_cpu_data_by_vm_id(context, id)
         except exception.NotFound:
             raise exc.HTTPNotFound()
         
+        vm_cpu_data = cpu_data_series.apply_query(vm_cpu_data, query)
         vm_cpu_data = _translate_vm_cpu_data_detail_view(context, vm_cpu_data)
         vm_cpu_data_dict = {'vm_cpu_data':vm_cpu_data}
         
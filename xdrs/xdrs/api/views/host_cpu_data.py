@@ -1,11 +1,12 @@
 from xdrs.api.openstack import common
+from xdrs import quantile_sketch
 
 class ViewBuilder(common.ViewBuilder):
 
     _collection_name = "hosts_cpu_data"
 
     def show_basic(self, request, host_cpu_data):
-        return {
+        hosts_cpu_data_dict = {
             "cpu_data": {
                 "host_id": host_cpu_data["host_id"],
                 "cpu_data": host_cpu_data["cpu_data"],
@@ -14,6 +15,10 @@ class ViewBuilder(common.ViewBuilder):
                                         self._collection_name),
             },
         }
+        hosts_cpu_data_dict["cpu_data"].update(
+            self._get_cpu_data_query_fields(host_cpu_data))
+
+        return hosts_cpu_data_dict
 
     def show_detail(self, request, host_cpu_data):
         hosts_cpu_data_dict = {
@@ -22,11 +27,15 @@ class ViewBuilder(common.ViewBuilder):
                 "host_name": host_cpu_data["host_name"],
                 "data_len": host_cpu_data["data_len"],
                 "cpu_data": host_cpu_data["cpu_data"],
+                "cpu_percentiles": quantile_sketch.stored_percentiles(
+                    host_cpu_data.get("cpu_sketch")),
                 "links": self._get_links(request,
                                          host_cpu_data["host_id"],
                                          self._collection_name),
             },
         }
+        hosts_cpu_data_dict["cpu_data"].update(
+            self._get_cpu_data_query_fields(host_cpu_data))
 
         return hosts_cpu_data_dict
 
@@ -51,16 +60,9 @@ class ViewBuilder(common.ViewBuilder):
 
     def _list_view(self, func, request, hosts_cpu_data):
         """
-        Provide a view for a list of hosts cpu data.
+        Provide a streamed view for a list of hosts cpu data.
         """
-        hosts_cpu_data_list = [func(request, host_cpu_data)["cpu_data"] for host_cpu_data in hosts_cpu_data]
-        hosts_cpu_data_links = self._get_collection_links(request,
-                                                   host_cpu_data,
-                                                   self._collection_name,
-                                                   "host_id")
-        hosts_cpu_data_dict = dict(hosts_cpu_data=hosts_cpu_data_list)
-
-        if hosts_cpu_data_links:
-            hosts_cpu_data_dict["host_cpu_data_links"] = hosts_cpu_data_links
-
-        return hosts_cpu_data_dict
\ No newline at end of file
+        return self._stream_list_view(func, request, hosts_cpu_data,
+                                      "hosts_cpu_data", "cpu_data",
+                                      links_key="host_cpu_data_links",
+                                      id_key="host_id")
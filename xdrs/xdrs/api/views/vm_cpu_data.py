@@ -1,4 +1,7 @@
+import six
+
 from xdrs.api.openstack import common
+from xdrs.openstack.common import jsonutils
 
 class ViewBuilder(common.ViewBuilder):
 
@@ -17,6 +20,8 @@ class ViewBuilder(common.ViewBuilder):
                                          self._collection_name),
             },
         }
+        vm_cpu_data_dict["cpu_data"].update(
+            self._get_cpu_data_query_fields(host_cpu_data))
 
         return vm_cpu_data_dict
 
@@ -28,14 +33,26 @@ class ViewBuilder(common.ViewBuilder):
                 "host_name": host_cpu_data["host_name"],
                 "data_len": host_cpu_data["data_len"],
                 "cpu_data": host_cpu_data["cpu_data"],
+                "cpu_percentiles": self._get_cpu_percentiles(host_cpu_data),
                 "links": self._get_links(request,
                                          host_cpu_data["host_id"],
                                          self._collection_name),
             },
         }
+        vm_cpu_data_dict["cpu_data"].update(
+            self._get_cpu_data_query_fields(host_cpu_data))
 
         return vm_cpu_data_dict
 
+    def _get_cpu_percentiles(self, vm_cpu_data):
+        """
+        数据采集提交的虚拟机实例CPU使用分位数{'p50': XXX, 'p95': XXX, 'p99': XXX}；
+        """
+        percentiles = vm_cpu_data.get("cpu_percentiles")
+        if isinstance(percentiles, six.string_types):
+            percentiles = jsonutils.loads(percentiles)
+        return percentiles
+
     def index(self, request, vms_cpu_data):
         return self._list_view(self.show_basic, request, vms_cpu_data)
 
@@ -43,14 +60,7 @@ class ViewBuilder(common.ViewBuilder):
         return self._list_view(self.show_detail, request, vms_cpu_data)
 
     def _list_view(self, func, request, vms_cpu_data):
-        vms_cpu_data_list = [func(request, vm_cpu_data)["cpu_data"] for vm_cpu_data in vms_cpu_data]
-        vms_cpu_data_links = self._get_collection_links(request,
-                                                   vm_cpu_data,
-                                                   self._collection_name,
-                                                   "host_id")
-        vms_cpu_data_dict = dict(vms_cpu_data=vms_cpu_data_list)
-
-        if vms_cpu_data_links:
-            vms_cpu_data_dict["host_cpu_data_links"] = vms_cpu_data_links
-
-        return vms_cpu_data_dict
\ No newline at end of file
+        return self._stream_list_view(func, request, vms_cpu_data,
+                                      "vms_cpu_data", "cpu_data",
+                                      links_key="vms_cpu_data_links",
+                                      id_key="vm_id")
@@ -44,7 +44,8 @@ class ViewBuilder(common.ViewBuilder):
         return vm_migration_record_dict
 
     def _list_view(self, func, request, vms_migration_records):
-        vms_migration_records_list = [func(request, vm_migration_record)["cpu_data"] for vm_migration_record in vms_migration_records]
-        vms_migration_records_dict = dict(vms_migration_records=vms_migration_records_list)
-
-        return vms_migration_records_dict
\ No newline at end of file
+        return self._stream_list_view(func, request, vms_migration_records,
+                                      "vms_migration_records",
+                                      "vm_migration_record",
+                                      links_key="vms_migration_records_links",
+                                      id_key="id")
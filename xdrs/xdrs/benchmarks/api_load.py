@@ -0,0 +1,227 @@
+"""
+API服务多worker的负载测试；
+
+启动--workers指定数目的预先fork的worker进程（与xdrs-api相同，共享一个监听socket，
+每个worker运行eventlet wsgi服务），每个请求经过ConcurrencyLimiter中间件，
+调用--calls次假的conductor（FakeRPCClient：每次调用等待--rpc-ms毫秒，
+经过conductor.rpcapi中的并发数限制和截止时间处理），并占用--cpu-ms毫秒的CPU
+（模拟序列化等API进程中的计算）；
+
+负载由--concurrency个保持连接的客户端green thread产生，持续--duration秒；
+依次测试--workers中的每个worker数目，结果以JSON格式输出
+（每秒请求数、p50/p99延迟、各状态码的请求数），吞吐量应随worker数目增加，
+超过并发数限制的请求以503快速返回；
+
+运行方式：
+python -m xdrs.benchmarks.api_load --workers 1,2,4 --concurrency 64
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+import eventlet
+from eventlet import wsgi as eventlet_wsgi
+from oslo.config import cfg
+from oslo import messaging
+
+from xdrs.api import concurrency
+from xdrs.conductor import rpcapi
+from xdrs import exception
+
+CONF = cfg.CONF
+CONF.import_opt('wsgi_default_pool_size', 'xdrs.service')
+
+
+class FakeRPCClient(object):
+    """
+    模拟conductor的RPCClient：每次call等待rpc_latency秒；
+    """
+
+    def __init__(self, rpc_latency, timeout=None):
+        self.rpc_latency = rpc_latency
+        self.timeout = timeout
+
+    def can_send_version(self, version):
+        return True
+
+    def prepare(self, timeout=None, **kwargs):
+        return FakeRPCClient(self.rpc_latency,
+                             timeout if timeout is not None else self.timeout)
+
+    def call(self, ctxt, method, **kwargs):
+        if self.timeout is not None and self.timeout < self.rpc_latency:
+            eventlet.sleep(self.timeout)
+            raise messaging.MessagingTimeout()
+        eventlet.sleep(self.rpc_latency)
+        return {}
+
+    def cast(self, ctxt, method, **kwargs):
+        pass
+
+
+def _burn_cpu(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def make_app(args):
+    client = rpcapi._BoundedClient(FakeRPCClient(args.rpc_ms / 1000.0))
+    body = json.dumps({'hosts': [{'id': i} for i in range(10)]})
+
+    def handler(environ, start_response):
+        # 实际的API处理流程中由FaultWrapper转换为503响应；
+        try:
+            for _ in range(args.calls):
+                client.prepare().call(None, 'get_all_hosts_load_states')
+        except exception.ServiceUnavailable:
+            start_response('503 Service Unavailable',
+                           [('Content-Length', '0'), ('Retry-After', '1')])
+            return []
+        _burn_cpu(args.cpu_ms / 1000.0)
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body)))])
+        return [body]
+
+    return concurrency.ConcurrencyLimiter(handler)
+
+
+class _NullLog(object):
+
+    def write(self, data):
+        pass
+
+
+def start_workers(sock, workers, app):
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+            eventlet_wsgi.server(sock, app, log=_NullLog(),
+                                 max_size=CONF.wsgi_default_pool_size)
+            os._exit(0)
+        pids.append(pid)
+    return pids
+
+
+def stop_workers(pids):
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+_REQUEST = (b'GET /v1/hosts HTTP/1.1\r\nHost: localhost\r\n'
+            b'Connection: keep-alive\r\n\r\n')
+
+
+def _read_response(f):
+    status = f.readline()
+    if not status:
+        raise IOError('connection closed')
+    length = 0
+    while True:
+        line = f.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value)
+    f.read(length)
+    return int(status.split()[1])
+
+
+def run_clients(address, concurrency, duration):
+    latencies = []
+    statuses = {}
+    deadline = time.time() + duration
+
+    def client():
+        sock = f = None
+        while time.time() < deadline:
+            if sock is None:
+                sock = eventlet.connect(address)
+                f = sock.makefile('rb')
+            start = time.time()
+            try:
+                sock.sendall(_REQUEST)
+                status = _read_response(f)
+            except (IOError, socket.error):
+                sock = f = None
+                statuses['error'] = statuses.get('error', 0) + 1
+                continue
+            latencies.append(time.time() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    pool = eventlet.GreenPool(concurrency)
+    for _ in range(concurrency):
+        pool.spawn_n(client)
+    pool.waitall()
+    return latencies, statuses
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def measure(args, workers):
+    sock = eventlet.listen(('127.0.0.1', 0))
+    pids = start_workers(sock, workers, make_app(args))
+    try:
+        eventlet.sleep(0.5)
+        latencies, statuses = run_clients(sock.getsockname(),
+                                          args.concurrency, args.duration)
+    finally:
+        stop_workers(pids)
+        sock.close()
+    return {'workers': workers,
+            'requests_per_second': len(latencies) / float(args.duration),
+            'p50_ms': (_percentile(latencies, 50) or 0) * 1000,
+            'p99_ms': (_percentile(latencies, 99) or 0) * 1000,
+            'statuses': dict((str(k), v) for k, v in statuses.items())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', default='1,2,4',
+                        help='comma separated worker counts to measure')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--calls', type=int, default=2,
+                        help='conductor calls per request')
+    parser.add_argument('--rpc-ms', type=float, default=20)
+    parser.add_argument('--cpu-ms', type=float, default=2)
+    parser.add_argument('--max-in-flight-requests', type=int, default=100)
+    parser.add_argument('--max-in-flight-calls', type=int, default=64)
+    parser.add_argument('--request-timeout', type=int, default=30)
+    parser.add_argument('--output', help='write the JSON result here')
+    args = parser.parse_args(argv)
+
+    CONF([], project='xdrs')
+    CONF.set_override('osapi_max_in_flight_requests',
+                      args.max_in_flight_requests)
+    CONF.set_override('osapi_request_timeout', args.request_timeout)
+    CONF.set_override('max_in_flight_calls', args.max_in_flight_calls,
+                      'conductor')
+
+    result = {'params': vars(args),
+              'results': [measure(args, int(workers))
+                          for workers in args.workers.split(',')]}
+    output = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+数据采集读取虚拟机实例CPU时间的性能测试；
+
+在临时目录中建立一个伪造的cgroup目录树（--layout指定v1、v2或者非systemd的
+cgroupfs布局），其中有--vms个虚拟机实例的cgroup，每个周期修改其中的CPU时间
+和内存使用，然后用CgroupStats读取所有虚拟机实例，检查读到的值并统计每个周期
+占用的CPU时间；
+指定--libvirt时，同时测试通过libvirt对本机上每个运行中的虚拟机实例调用
+lookupByUUIDString和getCPUStats（data_collector_backend=libvirt时的做法）
+每个周期占用的CPU时间；
+结果以JSON格式输出；
+
+运行方式：
+python -m xdrs.benchmarks.cgroup_collector --vms 200 --cycles 100
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid as uuidlib
+
+from xdrs.hosts import cgroup_stats
+
+
+def _scope_name(layout, index, name):
+    if layout == 'cgroupfs':
+        return '%s.libvirt-qemu' % name
+    return 'machine-qemu\\x2d%d\\x2d%s.scope' % (index,
+                                                 name.replace('-', '\\x2d'))
+
+
+def _write(path, data):
+    with open(path, 'w') as f:
+        f.write(data)
+
+
+class FakeCgroupTree(object):
+    """
+    伪造的cgroup目录树；
+    """
+
+    def __init__(self, root, layout, vms):
+        self.root = root
+        self.layout = layout
+        self.domains = dict()
+        if layout == 'v2':
+            _write(os.path.join(root, 'cgroup.controllers'), 'cpu memory\n')
+            self.cpu_dir = self.memory_dir = os.path.join(root,
+                                                          'machine.slice')
+        else:
+            slice_name = 'machine' if layout == 'cgroupfs' else \
+                'machine.slice'
+            self.cpu_dir = os.path.join(root, 'cpu,cpuacct', slice_name)
+            self.memory_dir = os.path.join(root, 'memory', slice_name)
+        for directory in set([self.cpu_dir, self.memory_dir]):
+            os.makedirs(directory)
+        for index in range(vms):
+            name = 'instance-%08x' % (index + 1)
+            self.domains[name] = (_scope_name(layout, index + 1, name),
+                                  str(uuidlib.uuid4()))
+            for directory in set([self.cpu_dir, self.memory_dir]):
+                os.mkdir(os.path.join(directory, self.domains[name][0]))
+
+    def resolve_uuid(self, domain_name):
+        domain = self.domains.get(domain_name)
+        return domain[1] if domain else None
+
+    def update(self, cycle):
+        """
+        写入每个虚拟机实例的CPU时间（纳秒）和内存使用（字节），返回写入的值；
+        """
+        expected = dict()
+        for index, (scope, uuid) in enumerate(sorted(self.domains.values())):
+            cpu_time = (cycle + 1) * (index + 1) * 1000000
+            memory = (index + 1) * 1048576
+            if self.layout == 'v2':
+                _write(os.path.join(self.cpu_dir, scope, 'cpu.stat'),
+                       'usage_usec %d\nuser_usec 0\nsystem_usec 0\n' %
+                       (cpu_time // 1000))
+                _write(os.path.join(self.memory_dir, scope,
+                                    'memory.current'), '%d\n' % memory)
+            else:
+                _write(os.path.join(self.cpu_dir, scope, 'cpuacct.usage'),
+                       '%d\n' % cpu_time)
+                _write(os.path.join(self.memory_dir, scope,
+                                    'memory.usage_in_bytes'),
+                       '%d\n' % memory)
+            expected[uuid] = (cpu_time, memory)
+        return expected
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def measure_cgroup(args):
+    root = tempfile.mkdtemp(prefix='xdrs-cgroup-')
+    try:
+        tree = FakeCgroupTree(root, args.layout, args.vms)
+        stats = cgroup_stats.CgroupStats(root)
+        cpu = 0.0
+        for cycle in range(args.cycles):
+            expected = tree.update(cycle)
+            begin = _cpu_seconds()
+            cpu_times = stats.read_cpu_times(tree.resolve_uuid)
+            memory = stats.read_memory(tree.resolve_uuid) \
+                if args.memory else None
+            cpu += _cpu_seconds() - begin
+            for uuid, (cpu_time, ram) in expected.items():
+                if cpu_times.get(uuid) != cpu_time or \
+                        (memory is not None and memory.get(uuid) != ram):
+                    raise AssertionError('unexpected value for %s' % uuid)
+        return {'backend': 'cgroup',
+                'layout': args.layout,
+                'vms': args.vms,
+                'cpu_ms_per_cycle': cpu * 1000 / args.cycles}
+    finally:
+        shutil.rmtree(root)
+
+
+def measure_libvirt(args):
+    import libvirt
+
+    from xdrs.hosts import data_collection
+
+    vir_connection = libvirt.openReadOnly(None)
+    uuids = list(data_collection._get_current_vms(vir_connection))
+    cpu = 0.0
+    wall = time.time()
+    for _cycle in range(args.cycles):
+        begin = _cpu_seconds()
+        for uuid in uuids:
+            data_collection._get_cpu_time(vir_connection, uuid)
+        cpu += _cpu_seconds() - begin
+    return {'backend': 'libvirt',
+            'vms': len(uuids),
+            'cpu_ms_per_cycle': cpu * 1000 / args.cycles,
+            'wall_ms_per_cycle': (time.time() - wall) * 1000 / args.cycles}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--vms', type=int, default=200)
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--layout', default='v2',
+                        choices=('v1', 'v2', 'cgroupfs'))
+    parser.add_argument('--memory', action='store_true',
+                        help='also read the memory usage of every VM')
+    parser.add_argument('--libvirt', action='store_true',
+                        help='also measure libvirt on the local host')
+    parser.add_argument('--output', help='write the JSON result here')
+    args = parser.parse_args(argv)
+
+    results = [measure_cgroup(args)]
+    if args.libvirt:
+        results.append(measure_libvirt(args))
+    output = json.dumps({'params': vars(args), 'results': results},
+                        indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,550 @@
+"""
+基于负载轨迹的集群离线模拟器；
+
+把记录下来的（或合成的）虚拟机CPU使用数据（MHz）按时间步回放，依次调用真实的
+算法函数完成 检测 -> 选取 -> 放置 的整个流程：
+1.欠载/过载检测：algorithms/underload_algorithm.py、overload_algorithm.py中
+  *_factory构造的检测函数；
+2.虚拟机选取：algorithms/vm_select_algorithm.py中*_factory构造的选取函数；
+3.目标主机放置：algorithms/filters/placement.py中的select_host，即
+  single_host_select为每个虚拟机选取目标主机的流程（RAM过滤 -> 预迁移CPU
+  利用率计算 -> 过载检测 -> 选取利用率最低的主机），主机的可用CPU频率通过
+  placement.physical_cpu_mhz_total从伪libvirt连接获取；
+注：single_host_select本身还通过hosts.API访问数据库、通过libvirt连接主机，
+这里只调用其中不依赖OpenStack的placement模块，模拟器不需要libvirt、
+oslo.messaging和数据库即可运行；
+libvirt、nova和数据库均由内存中的Cluster对象代替；
+
+输出指标：
+SLA违例时间（主机CPU需求超过其可用频率的累计时间）、迁移次数、
+活跃主机小时数，以及每个阶段的墙钟时间和CPU时间；
+
+轨迹格式与<local_data_directory>/vms/*一致：每个虚拟机一个以UUID命名的文件，
+每行一个整数（MHz）；可选的hosts.json描述初始放置：
+{"hosts": {"host1": {"cpu_mhz": 16000, "ram": 32768, "vms": ["uuid1", ...]}},
+ "vms_ram": {"uuid1": 2048}}
+没有hosts.json时按轮询方式把虚拟机放置到默认规格的主机上；
+
+运行方式：
+python -m xdrs.benchmarks.cluster_simulator --trace-dir /var/lib/xdrs
+python -m xdrs.benchmarks.cluster_simulator --hosts 10000 --steps 12 --candidates 500
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from xdrs.algorithms import overload_algorithm
+from xdrs.algorithms import underload_algorithm
+from xdrs.algorithms import vm_select_algorithm
+from xdrs.algorithms.filters import placement
+
+
+_cpu_time = getattr(time, 'process_time', None) or time.clock
+
+STAGES = ('collect', 'detect', 'select', 'place')
+
+
+class _FakeVirConnection(object):
+    """
+    代替libvirt连接，只提供getInfo；
+    getInfo()[2]为CPU数目，getInfo()[3]为CPU频率（MHz）；
+    """
+
+    def __init__(self, cpus, cpu_mhz):
+        self._info = ['x86_64', 0, cpus, cpu_mhz, 1, 1, cpus, 1]
+
+    def getInfo(self):
+        return self._info
+
+
+class Host(object):
+
+    def __init__(self, uuid, cpus, cpu_mhz, ram, usable_by_vms=1.0):
+        self.uuid = uuid
+        self.ram = ram
+        self.vms = set()
+        self.active = True
+        self.cpu_mhz_total = int(
+            placement.physical_cpu_mhz_total(_FakeVirConnection(cpus, cpu_mhz))
+            * usable_by_vms)
+
+
+class Vm(object):
+
+    def __init__(self, uuid, trace, ram):
+        self.uuid = uuid
+        self.trace = trace
+        self.ram = ram
+        self.host = None
+
+
+class Cluster(object):
+    """
+    内存中的集群状态，代替数据库（放置关系、RAM）和nova（迁移、开关机）；
+    """
+
+    def __init__(self, history_length):
+        self.hosts = {}
+        self.vms = {}
+        self.history_length = history_length
+        self.step = 0
+        self.migrations = 0
+        self.switched_on = 0
+        self.switched_off = 0
+
+    def add_host(self, host):
+        self.hosts[host.uuid] = host
+
+    def add_vm(self, vm, host_uuid):
+        self.vms[vm.uuid] = vm
+        self._attach(vm, host_uuid)
+
+    def _attach(self, vm, host_uuid):
+        vm.host = host_uuid
+        self.hosts[host_uuid].vms.add(vm.uuid)
+        if not self.hosts[host_uuid].active:
+            self.hosts[host_uuid].active = True
+            self.switched_on += 1
+
+    def migrate(self, vm_uuid, host_uuid):
+        vm = self.vms[vm_uuid]
+        if vm.host == host_uuid:
+            return
+        self.hosts[vm.host].vms.discard(vm_uuid)
+        self._attach(vm, host_uuid)
+        self.migrations += 1
+
+    def switch_off_idle_hosts(self):
+        for host in self.hosts.values():
+            if host.active and not host.vms:
+                host.active = False
+                self.switched_off += 1
+
+    def vm_window(self, vm_uuid):
+        """
+        与本地采集数据相同，返回虚拟机最近history_length个CPU使用数据；
+        """
+        trace = self.vms[vm_uuid].trace
+        end = self.step + 1
+        return trace[max(0, end - self.history_length):end]
+
+    def vm_mhz(self, vm_uuid):
+        return self.vms[vm_uuid].trace[self.step]
+
+    def host_free_ram(self, host):
+        return host.ram - sum(self.vms[vm].ram for vm in host.vms)
+
+
+class _StageTimer(object):
+
+    def __init__(self):
+        self.wall = dict((stage, 0.0) for stage in STAGES)
+        self.cpu = dict((stage, 0.0) for stage in STAGES)
+        self._stage = None
+
+    def start(self, stage):
+        self._stage = stage
+        self._wall_start = time.time()
+        self._cpu_start = _cpu_time()
+
+    def stop(self):
+        self.wall[self._stage] += time.time() - self._wall_start
+        self.cpu[self._stage] += _cpu_time() - self._cpu_start
+        self._stage = None
+
+
+def _load_factory(module, name, time_step, migration_time, params):
+    factory = getattr(module, name + '_factory')
+    return factory(time_step, migration_time, params)
+
+
+def _sum_windows(windows):
+    if not windows:
+        return []
+    length = max(len(x) for x in windows)
+    padded = [[0] * (length - len(x)) + x for x in windows]
+    return [sum(x) for x in zip(*padded)]
+
+
+class _Overlay(object):
+    """
+    在基础字典之上记录放置过程中的修改，不需要为每次放置复制所有主机的数据；
+    """
+
+    def __init__(self, base, default=None):
+        self.base = base
+        self.default = default
+        self.changes = {}
+
+    def __getitem__(self, key):
+        if key in self.changes:
+            return self.changes[key]
+        return self.base.get(key, self.default)
+
+    def __setitem__(self, key, value):
+        self.changes[key] = value
+
+
+class Simulator(object):
+    """
+    按时间步回放轨迹：
+    collect：计算每个活跃主机的CPU利用率历史和当前需求；
+    detect：欠载/过载检测；
+    select：为过载主机选取要迁移的虚拟机；欠载主机的所有虚拟机都需要迁移；
+    place：为要迁移的虚拟机选取目标主机，必要时开启空闲主机；
+    """
+
+    def __init__(self, cluster, time_step=300, bandwidth=10.0,
+                 overload=('last_n_average_threshold',
+                           {'threshold': 0.9, 'n': 10}),
+                 underload=('last_n_average_threshold',
+                            {'threshold': 0.3, 'n': 10}),
+                 vm_select=('minimum_migration_time_max_cpu',
+                            {'last_n': 10}),
+                 max_candidates=None, seed=0):
+        self.cluster = cluster
+        self.time_step = time_step
+        self.max_candidates = max_candidates
+        self.rng = random.Random(seed)
+        self.timer = _StageTimer()
+        self.sla_violation_time = 0.0
+        self.active_host_time = 0.0
+        # 每个时间步开始时计算，迁移时增量更新；
+        self.host_windows = {}
+        self.free_ram = {}
+        self.hosts_cpu_mhz = dict((uuid, host.cpu_mhz_total)
+                                  for uuid, host in cluster.hosts.items())
+
+        vms_ram = [vm.ram for vm in cluster.vms.values()]
+        migration_time = (float(sum(vms_ram)) / len(vms_ram) / bandwidth
+                          if vms_ram else 0.0)
+        self.overload_detect = _load_factory(
+            overload_algorithm, overload[0], time_step, migration_time,
+            overload[1])
+        self.underload_detect = _load_factory(
+            underload_algorithm, underload[0], time_step, migration_time,
+            underload[1])
+        self.vm_select = _load_factory(
+            vm_select_algorithm, vm_select[0], time_step, migration_time,
+            vm_select[1])
+
+    def _collect(self):
+        cluster = self.cluster
+        utilization = {}
+        self.host_windows = {}
+        self.free_ram = {}
+        for host in cluster.hosts.values():
+            self.free_ram[host.uuid] = cluster.host_free_ram(host)
+            if not host.active:
+                continue
+            self.active_host_time += self.time_step
+            if not host.vms:
+                continue
+            demand = sum(cluster.vm_mhz(vm) for vm in host.vms)
+            if demand > host.cpu_mhz_total:
+                self.sla_violation_time += self.time_step
+            windows = [cluster.vm_window(vm) for vm in host.vms]
+            self.host_windows[host.uuid] = _sum_windows(windows)
+            utilization[host.uuid] = placement.vm_mhz_to_percentage(
+                windows, [], host.cpu_mhz_total)
+        return utilization
+
+    def _detect(self, utilization):
+        overloaded = []
+        underloaded = []
+        for host_uuid, host_utilization in utilization.items():
+            if self.underload_detect(host_utilization)[0]:
+                underloaded.append(host_uuid)
+            elif self.overload_detect(host_utilization)[0]:
+                overloaded.append(host_uuid)
+        underloaded.sort(key=lambda uuid: utilization[uuid][-1])
+        return overloaded, underloaded
+
+    def _select(self, overloaded):
+        cluster = self.cluster
+        selected = {}
+        for host_uuid in overloaded:
+            host = cluster.hosts[host_uuid]
+            vms_cpu = dict((vm, cluster.vm_window(vm)) for vm in host.vms)
+            vms_ram = dict((vm, cluster.vms[vm].ram) for vm in host.vms)
+            vms = [vm for vm in self.vm_select(vms_cpu, vms_ram)[0] if vm]
+            if vms:
+                selected[host_uuid] = vms
+        return selected
+
+    def _candidates(self, exclude, active=True):
+        candidates = [uuid for uuid, host in self.cluster.hosts.items()
+                      if host.active == active and uuid not in exclude]
+        if self.max_candidates and len(candidates) > self.max_candidates:
+            candidates = self.rng.sample(candidates, self.max_candidates)
+        return candidates
+
+    def _place(self, vms, candidates):
+        """
+        single_host_select的放置流程（placement.select_host）：每次为一个虚拟机
+        选取目标主机，在RAM足够并且预迁移后不过载的主机中选取CPU利用率最低的主机；
+        返回{vm: host}，没有合适主机的虚拟机不在其中；
+        放置结果只记录在局部变量中，由调用者决定是否执行迁移；
+        """
+        cluster = self.cluster
+        windows = _Overlay(self.host_windows, [])
+        free_ram = _Overlay(self.free_ram)
+        mapper = {}
+        for vm_uuid in vms:
+            vm = cluster.vms[vm_uuid]
+            vm_window = cluster.vm_window(vm_uuid)
+            best_host, _utilization = placement.select_host(
+                vm_window, vm.ram, candidates, windows, free_ram,
+                self.hosts_cpu_mhz, self.overload_detect)
+            if best_host is None:
+                continue
+            mapper[vm_uuid] = best_host
+            free_ram[best_host] = free_ram[best_host] - vm.ram
+            windows[best_host] = _sum_windows([windows[best_host], vm_window])
+        return mapper
+
+    def _migrate(self, mapper):
+        cluster = self.cluster
+        for vm_uuid, target in mapper.items():
+            vm = cluster.vms[vm_uuid]
+            vm_window = cluster.vm_window(vm_uuid)
+            source = vm.host
+            self.host_windows[source] = _sum_windows(
+                [self.host_windows.get(source, []),
+                 [-x for x in vm_window]])
+            self.host_windows[target] = _sum_windows(
+                [self.host_windows.get(target, []), vm_window])
+            self.free_ram[source] += vm.ram
+            self.free_ram[target] -= vm.ram
+            cluster.migrate(vm_uuid, target)
+
+    def _consolidate(self, underloaded, busy):
+        """
+        欠载主机：尝试把其上所有虚拟机迁移到其他活跃主机，全部成功时关闭该主机；
+        """
+        cluster = self.cluster
+        for host_uuid in underloaded:
+            if host_uuid in busy:
+                continue
+            busy.add(host_uuid)
+            candidates = [uuid for uuid in self._candidates(busy)
+                          if cluster.hosts[uuid].vms]
+            vms = sorted(cluster.hosts[host_uuid].vms)
+            mapper = self._place(vms, candidates)
+            if len(mapper) != len(vms):
+                busy.discard(host_uuid)
+                continue
+            self._migrate(mapper)
+            busy.update(mapper.values())
+
+    def _relieve(self, selected, busy):
+        """
+        过载主机：迁移选取的虚拟机，活跃主机不足时开启空闲主机；
+        """
+        for host_uuid, vms in selected.items():
+            busy.add(host_uuid)
+            mapper = self._place(vms, self._candidates(busy))
+            pending = [vm for vm in vms if vm not in mapper]
+            if pending:
+                mapper.update(self._place(
+                    pending, self._candidates(busy, active=False)))
+            self._migrate(mapper)
+            busy.update(mapper.values())
+
+    def run(self, steps=None):
+        cluster = self.cluster
+        trace_length = min(len(vm.trace) for vm in cluster.vms.values())
+        steps = trace_length if steps is None else min(steps, trace_length)
+        timer = self.timer
+
+        for step in range(steps):
+            cluster.step = step
+            timer.start('collect')
+            utilization = self._collect()
+            timer.stop()
+
+            timer.start('detect')
+            overloaded, underloaded = self._detect(utilization)
+            timer.stop()
+
+            timer.start('select')
+            selected = self._select(overloaded)
+            timer.stop()
+
+            timer.start('place')
+            busy = set()
+            self._relieve(selected, busy)
+            self._consolidate(underloaded, busy)
+            cluster.switch_off_idle_hosts()
+            timer.stop()
+
+        return self.report(steps)
+
+    def report(self, steps):
+        cluster = self.cluster
+        return {
+            'hosts': len(cluster.hosts),
+            'vms': len(cluster.vms),
+            'steps': steps,
+            'time_step': self.time_step,
+            'sla_violation_time': self.sla_violation_time,
+            'sla_violation_ratio': (self.sla_violation_time /
+                                    self.active_host_time
+                                    if self.active_host_time else 0.0),
+            'migrations': cluster.migrations,
+            'hosts_switched_on': cluster.switched_on,
+            'hosts_switched_off': cluster.switched_off,
+            'active_host_hours': self.active_host_time / 3600.0,
+            'stages': dict((stage, {'wall': self.timer.wall[stage],
+                                    'cpu': self.timer.cpu[stage]})
+                           for stage in STAGES),
+        }
+
+
+def _read_trace(path):
+    with open(path, 'r') as f:
+        return [int(x) for x in f.read().strip().splitlines()]
+
+
+def load_traces(trace_dir, history_length, cpus=8, cpu_mhz=2400,
+                host_ram=32768, vm_ram=2048, vms_per_host=4):
+    """
+    从<trace_dir>/vms/*读取虚拟机轨迹，按hosts.json（如果存在）构建集群；
+    """
+    cluster = Cluster(history_length)
+    vm_path = os.path.join(trace_dir, 'vms')
+    traces = dict((uuid, _read_trace(os.path.join(vm_path, uuid)))
+                  for uuid in sorted(os.listdir(vm_path)))
+
+    manifest_path = os.path.join(trace_dir, 'hosts.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    else:
+        manifest = {'hosts': {}}
+        uuids = sorted(traces)
+        for i in range(0, len(uuids), vms_per_host):
+            manifest['hosts']['host-%d' % (i // vms_per_host)] = {
+                'vms': uuids[i:i + vms_per_host]}
+
+    vms_ram = manifest.get('vms_ram', {})
+    for host_uuid, spec in sorted(manifest['hosts'].items()):
+        cluster.add_host(Host(host_uuid,
+                              spec.get('cpus', cpus),
+                              spec.get('cpu_mhz', cpu_mhz),
+                              spec.get('ram', host_ram)))
+        for vm_uuid in spec.get('vms', []):
+            cluster.add_vm(Vm(vm_uuid, traces[vm_uuid],
+                              vms_ram.get(vm_uuid, vm_ram)),
+                           host_uuid)
+    return cluster
+
+
+def synthetic_cluster(hosts, vms_per_host, steps, history_length,
+                      cpus=8, cpu_mhz=2400, host_ram=32768, vm_ram=2048,
+                      spare_hosts=0.1, seed=0):
+    """
+    构建合成集群：每个虚拟机的CPU使用数据为有界随机游走；
+    另外预留spare_hosts比例的空闲主机，供过载时开启；
+    """
+    rng = random.Random(seed)
+    cluster = Cluster(history_length)
+    vm_cpu_mhz = cpu_mhz * cpus // vms_per_host
+    spare = int(hosts * spare_hosts)
+    for i in range(hosts + spare):
+        host_uuid = 'host-%d' % i
+        cluster.add_host(Host(host_uuid, cpus, cpu_mhz, host_ram))
+        if i >= hosts:
+            cluster.hosts[host_uuid].active = False
+            continue
+        for j in range(vms_per_host):
+            value = rng.randint(0, vm_cpu_mhz)
+            trace = []
+            for _ in range(steps):
+                value += rng.randint(-vm_cpu_mhz // 10, vm_cpu_mhz // 10)
+                value = min(max(value, 0), int(vm_cpu_mhz * 1.2))
+                trace.append(value)
+            cluster.add_vm(Vm('vm-%d-%d' % (i, j), trace, vm_ram), host_uuid)
+    return cluster
+
+
+def _algorithm(value):
+    name, _, params = value.partition(':')
+    return name, json.loads(params) if params else {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--trace-dir',
+                        help='directory containing vms/* traces')
+    parser.add_argument('--hosts', type=int, default=100)
+    parser.add_argument('--vms-per-host', type=int, default=4)
+    parser.add_argument('--steps', type=int, default=288)
+    parser.add_argument('--length', type=int, default=100,
+                        help='data_collector_data_length')
+    parser.add_argument('--time-step', type=int, default=300,
+                        help='data_collector_interval')
+    parser.add_argument('--bandwidth', type=float, default=10.0,
+                        help='network_migration_bandwidth')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--candidates', type=int, default=0,
+                        help='sample at most this many candidate hosts '
+                             'per placement (0: all hosts)')
+    parser.add_argument('--overload', type=_algorithm,
+                        default='last_n_average_threshold:'
+                                '{"threshold": 0.9, "n": 10}',
+                        help='name[:json params]')
+    parser.add_argument('--underload', type=_algorithm,
+                        default='last_n_average_threshold:'
+                                '{"threshold": 0.3, "n": 10}',
+                        help='name[:json params]')
+    parser.add_argument('--vm-select', type=_algorithm,
+                        default='minimum_migration_time_max_cpu:'
+                                '{"last_n": 10}',
+                        help='name[:json params]')
+    parser.add_argument('--json', action='store_true',
+                        help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    if args.trace_dir:
+        cluster = load_traces(args.trace_dir, args.length,
+                              vms_per_host=args.vms_per_host)
+    else:
+        cluster = synthetic_cluster(args.hosts, args.vms_per_host,
+                                    args.steps, args.length, seed=args.seed)
+
+    simulator = Simulator(cluster,
+                          time_step=args.time_step,
+                          bandwidth=args.bandwidth,
+                          overload=args.overload,
+                          underload=args.underload,
+                          vm_select=args.vm_select,
+                          max_candidates=args.candidates or None,
+                          seed=args.seed)
+    report = simulator.run(args.steps)
+
+    if args.json:
+        sys.stdout.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
+        return
+
+    for key in ('hosts', 'vms', 'steps', 'migrations', 'hosts_switched_on',
+                'hosts_switched_off'):
+        sys.stdout.write('%-20s %d\n' % (key, report[key]))
+    sys.stdout.write('%-20s %.1f s (%.2f%%)\n' %
+                     ('sla_violation_time', report['sla_violation_time'],
+                      report['sla_violation_ratio'] * 100))
+    sys.stdout.write('%-20s %.1f\n' %
+                     ('active_host_hours', report['active_host_hours']))
+    sys.stdout.write('%-20s %10s %10s\n' % ('stage', 'wall(s)', 'cpu(s)'))
+    for stage in STAGES:
+        sys.stdout.write('%-20s %10.3f %10.3f\n' %
+                         (stage, report['stages'][stage]['wall'],
+                          report['stages'][stage]['cpu']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+算法热点路径的微基准测试；
+
+覆盖的函数：
+1.algorithms/filters/placement.py中的vm_mhz_to_percentage；
+2.hosts/cpu_usage.py中的calculate_cpu_mhz（数据采集的每个虚拟机实例的计算）；
+3.overload_algorithm/underload_algorithm中*_factory构造的检测函数；
+4.vm_select_algorithm.minimum_migration_time_max_cpu；
+5.algorithms/filters/placement.py中的select_host（single_host_select的放置流程）；
+
+负载参数：
+--vms-per-host：每个主机上的虚拟机数目；
+--length：历史数据长度（data_collector_data_length）；
+--hosts：每个cell中的主机数目（放置流程的备选主机数）；
+
+结果以JSON格式输出（每秒操作数、p50/p99单次耗时、进程峰值RSS）；
+指定--baseline时与保存的结果进行比较，每秒操作数下降超过--tolerance
+时以非零状态退出，以便离线发现这些内层循环的性能回退；
+
+运行方式：
+python -m xdrs.benchmarks.hot_paths --output current.json
+python -m xdrs.benchmarks.hot_paths --baseline baseline.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from xdrs.algorithms import overload_algorithm
+from xdrs.algorithms import underload_algorithm
+from xdrs.algorithms import vm_select_algorithm
+from xdrs.algorithms.filters import placement
+from xdrs.hosts import cpu_usage
+
+
+# name -> setup(params)，setup返回一个无参数的可调用对象；
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def _history(rng, length, high=3000):
+    return [rng.randint(0, high) for _ in range(length)]
+
+
+@benchmark('vm_mhz_to_percentage')
+def _vm_mhz_to_percentage(params, rng):
+    vms = [_history(rng, params['length'])
+           for _ in range(params['vms_per_host'])]
+    host = _history(rng, params['length'], 500)
+    return lambda: placement.vm_mhz_to_percentage(vms, host, 19200)
+
+
+@benchmark('calculate_cpu_mhz')
+def _calculate_cpu_mhz(params, rng):
+    """
+    一次数据采集：为主机上的每个虚拟机计算一次CPU使用数据；
+    """
+    samples = [(rng.randint(0, 10 ** 12), rng.randint(0, 10 ** 12))
+               for _ in range(params['vms_per_host'])]
+
+    def run():
+        for previous_cpu_time, current_cpu_time in samples:
+            cpu_usage.calculate_cpu_mhz(
+                2400, 0.0, 300.0,
+                min(previous_cpu_time, current_cpu_time),
+                max(previous_cpu_time, current_cpu_time))
+    return run
+
+
+def _detector(module, name, params, rng, algorithm_params):
+    utilization = [rng.random() for _ in range(params['length'])]
+    detect = getattr(module, name + '_factory')(300, 20.0, algorithm_params)
+    return lambda: detect(utilization)
+
+
+@benchmark('overload.threshold')
+def _overload_threshold(params, rng):
+    return _detector(overload_algorithm, 'threshold', params, rng,
+                     {'threshold': 0.8})
+
+
+@benchmark('overload.last_n_average_threshold')
+def _overload_last_n(params, rng):
+    return _detector(overload_algorithm, 'last_n_average_threshold',
+                     params, rng, {'threshold': 0.8, 'n': 10})
+
+
+@benchmark('underload.threshold')
+def _underload_threshold(params, rng):
+    return _detector(underload_algorithm, 'threshold', params, rng,
+                     {'threshold': 0.3})
+
+
+@benchmark('underload.last_n_average_threshold')
+def _underload_last_n(params, rng):
+    return _detector(underload_algorithm, 'last_n_average_threshold',
+                     params, rng, {'threshold': 0.3, 'n': 10})
+
+
+@benchmark('minimum_migration_time_max_cpu')
+def _minimum_migration_time_max_cpu(params, rng):
+    vms = ['vm-%d' % i for i in range(params['vms_per_host'])]
+    vms_cpu = dict((vm, _history(rng, params['length'])) for vm in vms)
+    vms_ram = dict((vm, rng.choice([1024, 2048, 4096])) for vm in vms)
+    return lambda: vm_select_algorithm.minimum_migration_time_max_cpu(
+        10, vms_cpu, vms_ram)
+
+
+@benchmark('placement.select_host')
+def _select_host(params, rng):
+    """
+    single_host_select中为一个虚拟机在一个cell的所有主机中选取目标主机的流程；
+    """
+    hosts_list = ['host-%d' % i for i in range(params['hosts'])]
+    hosts_cpu_data = dict(
+        (host, _history(rng, params['length'],
+                        params['vms_per_host'] * 1500))
+        for host in hosts_list)
+    hosts_free_ram = dict((host, rng.randint(0, 32768))
+                          for host in hosts_list)
+    hosts_cpu_mhz = dict((host, 19200) for host in hosts_list)
+    vm_history = _history(rng, params['length'])
+    detect = overload_algorithm.last_n_average_threshold_factory(
+        300, 20.0, {'threshold': 0.9, 'n': 10})
+    return lambda: placement.select_host(
+        vm_history, 2048, hosts_list, hosts_cpu_data, hosts_free_ram,
+        hosts_cpu_mhz, detect)
+
+
+def _percentile(values, percent):
+    """
+    最近秩法计算百分位数，values需要已排序；
+    """
+    index = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[min(max(index, 0), len(values) - 1)]
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: macOS上ru_maxrss的单位为字节，Linux上为KB；
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+def _calibrate(func, min_time):
+    number = 1
+    while True:
+        start = time.time()
+        for _ in range(number):
+            func()
+        if time.time() - start >= min_time:
+            return number
+        number *= 2
+
+
+def measure(func, samples=50, min_time=0.01):
+    """
+    每个样本执行number次（使单个样本至少耗时min_time秒），
+    返回单次调用耗时的统计结果；
+    """
+    number = _calibrate(func, min_time)
+    timings = []
+    for _ in range(samples):
+        start = time.time()
+        for _ in range(number):
+            func()
+        timings.append((time.time() - start) / number)
+    timings.sort()
+    p50 = _percentile(timings, 50)
+    # NOTE: 以中位数计算每秒操作数，不受个别样本抖动的影响；
+    return {'ops_per_sec': 1.0 / p50 if p50 else 0.0,
+            'mean': sum(timings) / len(timings),
+            'p50': p50,
+            'p99': _percentile(timings, 99),
+            'samples': samples,
+            'number': number,
+            'peak_rss_kb': _peak_rss_kb()}
+
+
+def run(names=None, vms_per_host=8, length=100, hosts=300,
+        samples=50, min_time=0.01, seed=0):
+    params = {'vms_per_host': vms_per_host,
+              'length': length,
+              'hosts': hosts}
+    results = {}
+    for name in sorted(names or BENCHMARKS):
+        func = BENCHMARKS[name](params, random.Random(seed))
+        results[name] = measure(func, samples=samples, min_time=min_time)
+    return {'params': params,
+            'python': platform.python_version(),
+            'results': results}
+
+
+def compare(current, baseline, tolerance):
+    """
+    返回[(name, 当前ops/s, 基准ops/s, 比值, 是否回退)]；
+    基准中不存在的测试项不参与比较；
+    """
+    if current['params'] != baseline.get('params'):
+        sys.stderr.write('warning: baseline params %s differ from %s\n' %
+                         (baseline.get('params'), current['params']))
+    rows = []
+    for name, result in sorted(current['results'].items()):
+        if name not in baseline.get('results', {}):
+            continue
+        base_ops = baseline['results'][name]['ops_per_sec']
+        ratio = result['ops_per_sec'] / base_ops if base_ops else 0.0
+        rows.append((name, result['ops_per_sec'], base_ops, ratio,
+                     ratio < 1.0 - tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run (default: all of %s)' %
+                             ', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('--vms-per-host', type=int, default=8)
+    parser.add_argument('--length', type=int, default=100,
+                        help='data_collector_data_length')
+    parser.add_argument('--hosts', type=int, default=300,
+                        help='hosts per cell')
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--min-time', type=float, default=0.01,
+                        help='minimum seconds per sample')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed ops/sec drop against the baseline')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: %s' % ', '.join(sorted(unknown)))
+
+    current = run(names=args.names, vms_per_host=args.vms_per_host,
+                  length=args.length, hosts=args.hosts,
+                  samples=args.samples, min_time=args.min_time,
+                  seed=args.seed)
+
+    output = json.dumps(current, indent=2, sort_keys=True) + '\n'
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressed = False
+    sys.stderr.write('%-36s %14s %14s %8s\n' %
+                     ('benchmark', 'ops/s', 'baseline', 'ratio'))
+    for name, ops, base_ops, ratio, regression in compare(
+            current, baseline, args.tolerance):
+        regressed = regressed or regression
+        sys.stderr.write('%-36s %14.1f %14.1f %7.2fx%s\n' %
+                         (name, ops, base_ops, ratio,
+                          '  REGRESSION' if regression else ''))
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+primitives.to_primitive与jsonutils.to_primitive的对比测试；
+
+负载模拟调度过程中实际在RPC总线上传输的数据：
+1.各主机的CPU历史数据（长度为data_collector_data_length的整数列表）；
+2.算法列表（每个算法一条包含字符串参数的记录）；
+3.虚拟机元数据（包含datetime字段，部分记录为带iteritems的模型对象）；
+
+运行方式：
+python -m xdrs.benchmarks.to_primitive --hosts 300 --length 100
+"""
+
+import argparse
+import datetime
+import random
+import sys
+import timeit
+
+from xdrs.openstack.common import jsonutils
+from xdrs import primitives
+
+
+class _FakeModel(object):
+    """
+    模拟sqlalchemy模型对象，只提供iteritems；
+    """
+
+    def __init__(self, values):
+        self._values = values
+
+    def iteritems(self):
+        return iter(self._values.items())
+
+
+def host_cpu_histories(hosts, length):
+    return dict(('host-%d' % i,
+                 [random.randint(0, 3000) for _ in range(length)])
+                for i in range(hosts))
+
+
+def algorithms_list(count):
+    return [{'id': i,
+             'algorithm_id': 'algorithm-%d' % i,
+             'algorithm_name': 'last_n_average_threshold',
+             'algorithm_params': '{"threshold": 0.8, "n": 10}',
+             'in_use': i == 0,
+             'description': 'overload detection algorithm'}
+            for i in range(count)]
+
+
+def vms_metadata(count):
+    now = datetime.datetime(2015, 3, 16, 1, 14, 52)
+    rows = []
+    for i in range(count):
+        values = {'id': i,
+                  'vm_id': 'vm-%d' % i,
+                  'host_id': 'host-%d' % (i % 300),
+                  'vm_state': 'active',
+                  'created_at': now,
+                  'updated_at': now,
+                  'deleted': 0}
+        rows.append(_FakeModel(values) if i % 2 else values)
+    return rows
+
+
+def _best(func, payload, number, repeat):
+    timer = timeit.Timer(lambda: func(payload, convert_instances=True))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(hosts=300, length=100, algorithms=50, vms=1000,
+        number=20, repeat=5):
+    """
+    返回每种负载下两种实现的单次耗时（秒）和加速比；
+    """
+    payloads = [
+        ('host_cpu_histories', host_cpu_histories(hosts, length)),
+        ('algorithms', algorithms_list(algorithms)),
+        ('vms_metadata', vms_metadata(vms)),
+    ]
+
+    results = []
+    for name, payload in payloads:
+        expected = jsonutils.to_primitive(payload, convert_instances=True)
+        actual = primitives.to_primitive(payload, convert_instances=True)
+        if expected != actual:
+            raise AssertionError('%s: results differ' % name)
+
+        baseline = _best(jsonutils.to_primitive, payload, number, repeat)
+        fast = _best(primitives.to_primitive, payload, number, repeat)
+        results.append({'payload': name,
+                        'jsonutils': baseline,
+                        'primitives': fast,
+                        'speedup': baseline / fast if fast else 0.0})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hosts', type=int, default=300)
+    parser.add_argument('--length', type=int, default=100)
+    parser.add_argument('--algorithms', type=int, default=50)
+    parser.add_argument('--vms', type=int, default=1000)
+    parser.add_argument('--number', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(hosts=args.hosts, length=args.length,
+                  algorithms=args.algorithms, vms=args.vms,
+                  number=args.number, repeat=args.repeat)
+
+    sys.stdout.write('%-20s %14s %14s %8s\n' %
+                     ('payload', 'jsonutils(ms)', 'primitives(ms)',
+                      'speedup'))
+    for result in results:
+        sys.stdout.write('%-20s %14.3f %14.3f %7.1fx\n' %
+                         (result['payload'],
+                          result['jsonutils'] * 1000,
+                          result['primitives'] * 1000,
+                          result['speedup']))
+
+
+if __name__ == '__main__':
+    main()
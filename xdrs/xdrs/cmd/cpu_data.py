@@ -0,0 +1,105 @@
+"""
+CPU历史数据批量导出和导入的命令行工具；
+
+导出虚拟机实例（或者主机）在一个时间范围内的CPU历史数据：
+  python -m xdrs.cmd.cpu_data export vms --start 2026-10-12T00:00:00 \
+      --output vms.xcpu
+导入导出的数据（例如为新的环境预置历史数据）：
+  python -m xdrs.cmd.cpu_data import --input vms.xcpu
+--output/--input为-时使用标准输出/标准输入；数据格式见xdrs/cpu_data_archive.py，
+与API扩展os-cpu-data-archive相同；
+"""
+
+import sys
+
+from oslo.config import cfg
+
+from xdrs import config
+from xdrs import context
+from xdrs import cpu_data_archive
+from xdrs import cpu_data_series
+from xdrs import hosts
+from xdrs.openstack.common import log as logging
+
+CONF = cfg.CONF
+
+
+def _parse_time(value):
+    try:
+        return cpu_data_series.parse_time(value)
+    except ValueError:
+        raise SystemExit('%s is not an ISO 8601 time' % value)
+
+
+def _stdio(stream):
+    return getattr(stream, 'buffer', stream)
+
+
+def _write(chunks, output):
+    for chunk in chunks:
+        output.write(chunk)
+
+
+def _import(fileobj):
+    try:
+        return hosts.API().import_cpu_data(context.get_admin_context(),
+                                           fileobj)
+    except ValueError as ex:
+        raise SystemExit('Invalid cpu data archive: %s' % ex)
+
+
+def do_export():
+    start = _parse_time(CONF.command.start) if CONF.command.start else None
+    end = _parse_time(CONF.command.end) if CONF.command.end else None
+    chunks = hosts.API().export_cpu_data(context.get_admin_context(),
+                                         CONF.command.kind,
+                                         start=start,
+                                         end=end,
+                                         compress=CONF.command.compress)
+    if CONF.command.output == '-':
+        _write(chunks, _stdio(sys.stdout))
+    else:
+        with open(CONF.command.output, 'wb') as output:
+            _write(chunks, output)
+
+
+def do_import():
+    if CONF.command.input == '-':
+        count = _import(_stdio(sys.stdin))
+    else:
+        with open(CONF.command.input, 'rb') as fileobj:
+            count = _import(fileobj)
+    sys.stderr.write('Imported %d cpu data series\n' % count)
+
+
+def add_command_parsers(subparsers):
+    parser = subparsers.add_parser('export')
+    parser.add_argument('kind', choices=sorted(cpu_data_archive.KINDS))
+    parser.add_argument('--start', help='ISO 8601 UTC time of the first '
+                                        'exported sample')
+    parser.add_argument('--end', help='ISO 8601 UTC time of the last '
+                                      'exported sample')
+    parser.add_argument('--output', default='-')
+    parser.add_argument('--compress', action='store_true')
+    parser.set_defaults(func=do_export)
+
+    parser = subparsers.add_parser('import')
+    parser.add_argument('--input', default='-')
+    parser.set_defaults(func=do_import)
+
+
+command_opt = cfg.SubCommandOpt('command',
+                                title='Commands',
+                                help='Available commands',
+                                handler=add_command_parsers)
+
+
+def main():
+    CONF.register_cli_opt(command_opt)
+    config.parse_args(sys.argv)
+    logging.setup("xdrs")
+    CONF.command.func()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,17 @@
 Handles all requests to Nova.
 """
 
+import collections
+import time
+
 from novaclient import service_catalog
 from novaclient.v1_1 import client as nova_client
 from novaclient.v1_1.contrib import assisted_volume_snapshots
 from oslo.config import cfg
 
+from xdrs import exception
+from xdrs.openstack.common.gettextutils import _
+
 
 nova_opts = [
     cfg.StrOpt('nova_catalog_info',
@@ -34,13 +40,118 @@ nova_opts = [
     cfg.BoolOpt('nova_api_insecure',
                 default=False,
                 help='Allow to perform insecure SSL requests to nova'),
+    cfg.IntOpt('nova_client_cache_ttl',
+               default=300,
+               help='Seconds a nova client, and with it its keep-alive HTTP '
+                    'session, is reused for the same endpoint, project and '
+                    'token; 0 disables the cache'),
+    cfg.IntOpt('nova_client_cache_size',
+               default=64,
+               help='Maximum number of cached nova clients'),
+    cfg.IntOpt('nova_list_page_size',
+               default=1000,
+               help='Number of servers requested per page by the bulk '
+                    'server listing'),
+    cfg.StrOpt('nova_admin_username',
+               default=None,
+               help='User name of the service account used to query nova '
+                    'without a request context (inventory polling)'),
+    cfg.StrOpt('nova_admin_password',
+               default=None,
+               secret=True,
+               help='Password of the nova service account'),
+    cfg.StrOpt('nova_admin_tenant_name',
+               default=None,
+               help='Tenant name of the nova service account'),
+    cfg.StrOpt('nova_admin_auth_url',
+               default=None,
+               help='Keystone URL the nova service account authenticates '
+                    'against, e.g. http://localhost:5000/v2.0'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(nova_opts)
 
 
+# (admin, project_id, user_id, auth_token) -> (expires_at, client)
+_CLIENT_CACHE = collections.OrderedDict()
+
+
+def _cache_key(context, admin):
+    return (admin, context.project_id, context.user_id, context.auth_token)
+
+
+def invalidate_cache(context=None, admin=False):
+    """
+    Drop the cached client of a context, or every cached client.
+    """
+    if context is None:
+        _CLIENT_CACHE.clear()
+    else:
+        _CLIENT_CACHE.pop(_cache_key(context, admin), None)
+
+
 def novaclient(context, admin=False):
+    """
+    Return a nova client for the context.
+
+    Clients are cached per endpoint, project and token for
+    nova_client_cache_ttl seconds, which saves the service catalog
+    lookup and reuses the HTTP session (and its keep-alive
+    connections) of the client.
+    """
+    ttl = CONF.nova_client_cache_ttl
+    if ttl <= 0:
+        return _novaclient(context, admin)
+
+    key = _cache_key(context, admin)
+    now = time.time()
+    entry = _CLIENT_CACHE.pop(key, None)
+    if entry is None or entry[0] <= now:
+        entry = (now + ttl, _novaclient(context, admin))
+    # Keep the most recently used clients at the end
+    _CLIENT_CACHE[key] = entry
+    while len(_CLIENT_CACHE) > max(CONF.nova_client_cache_size, 1):
+        _CLIENT_CACHE.popitem(last=False)
+    return entry[1]
+
+
+# The service account client, created on first use
+_ADMIN_CLIENT = None
+
+
+def admin_novaclient():
+    """
+    Return the nova client of the configured service account.
+
+    Unlike novaclient() this does not need a request context: it
+    authenticates against keystone with the nova_admin_* credentials and
+    reauthenticates by itself when its token expires.
+    """
+    global _ADMIN_CLIENT
+    if _ADMIN_CLIENT is None:
+        if not (CONF.nova_admin_username and CONF.nova_admin_auth_url):
+            raise exception.InvalidInput(
+                reason=_('nova_admin_username and nova_admin_auth_url '
+                         'must be set to query nova without a context'))
+        _ADMIN_CLIENT = nova_client.Client(
+            CONF.nova_admin_username,
+            CONF.nova_admin_password,
+            CONF.nova_admin_tenant_name,
+            auth_url=CONF.nova_admin_auth_url,
+            region_name=CONF.os_region_name,
+            insecure=CONF.nova_api_insecure,
+            cacert=CONF.nova_ca_certificates_file)
+    return _ADMIN_CLIENT
+
+
+def _client(context):
+    if context is None:
+        return admin_novaclient()
+    return novaclient(context)
+
+
+def _novaclient(context, admin=False):
     # FIXME: the novaclient ServiceCatalog object is mis-named.
     #        It actually contains the entire access blob.
     # Only needed parts of the service catalog are passed in, see
@@ -88,4 +199,78 @@ def novaclient(context, admin=False):
     c.client.auth_token = context.auth_token or '%s:%s' % (context.user_id,
                                                            context.project_id)
     c.client.management_url = url
-    return c
\ No newline at end of file
+    return c
+
+
+def list_servers(context, search_opts=None, all_tenants=True,
+                 page_size=None):
+    """
+    List the servers matching search_opts in as few calls as possible.
+
+    A context of None uses the service account, see admin_novaclient().
+
+    The listing is paginated with markers, because nova caps the number
+    of servers returned by one call (osapi_max_limit).  It stops at the
+    first empty page.
+    """
+    search_opts = dict(search_opts or {})
+    if all_tenants:
+        search_opts.setdefault('all_tenants', 1)
+    page_size = page_size or CONF.nova_list_page_size
+
+    client = _client(context)
+    servers = []
+    marker = None
+    while True:
+        page = client.servers.list(detailed=True, search_opts=search_opts,
+                                   marker=marker, limit=page_size)
+        if not page:
+            return servers
+        servers.extend(page)
+        marker = page[-1].id
+
+
+def list_servers_by_host(context, search_opts=None, all_tenants=True):
+    """
+    Return {compute host: [server, ...]} for all the servers.
+    """
+    servers_by_host = collections.defaultdict(list)
+    for server in list_servers(context, search_opts, all_tenants):
+        host = getattr(server, 'OS-EXT-SRV-ATTR:host', None)
+        servers_by_host[host].append(server)
+    return dict(servers_by_host)
+
+
+def list_hypervisors(context):
+    """
+    Return the details of all the hypervisors in one call.
+    """
+    return _client(context).hypervisors.list(detailed=True)
+
+
+def list_hypervisor_hostnames(context):
+    return [hypervisor.hypervisor_hostname
+            for hypervisor in list_hypervisors(context)]
+
+
+def list_hypervisor_hosts(context):
+    """
+    Return the compute service host of every hypervisor.
+
+    This is the service host name (CONF.host of nova-compute), the same
+    key as host_inventory.host_name, not hypervisor_hostname, which is
+    often an FQDN.
+    """
+    hosts = []
+    for hypervisor in list_hypervisors(context):
+        service = getattr(hypervisor, 'service', None) or {}
+        if service.get('host'):
+            hosts.append(service['host'])
+    return hosts
+
+
+def list_compute_services(context):
+    """
+    Return the nova-compute services, with their status and state.
+    """
+    return _client(context).services.list(binary='nova-compute')
@@ -156,9 +156,19 @@ class LocalAPI(object):
     """
     def get_all_host_cpu_data(self, context):
         return self._manager.get_all_host_cpu_data(context)
+
+    def get_hosts_cpu_data_page(self, context, marker=None, limit=None):
+        return self._manager.get_hosts_cpu_data_page(context, marker=marker,
+                                                     limit=limit)
     
     def get_host_cpu_data_by_id(self, context, id):
         return self._manager.get_host_cpu_data_by_id(context, id)
+
+    def get_hosts_cpu_data(self, context, host_ids):
+        return self._manager.get_hosts_cpu_data(context, host_ids)
+
+    def get_hosts_meminfo(self, context, host_ids):
+        return self._manager.get_hosts_meminfo(context, host_ids)
     
     def create_host_cpu_data_temp_by_id(self, context, update_values, host_uuid):
         return self._manager.create_host_cpu_data_temp_by_id(context, update_values, host_uuid)
@@ -214,6 +224,18 @@ class LocalAPI(object):
             
     def get_all_hosts_load_states_sorted_list(self, context):
         return self._manager.get_all_hosts_load_states_sorted_list(context)
+
+    def get_hosts_load_states(self, context, ids):
+        return self._manager.get_hosts_load_states(context, ids)
+
+    def report_host_state(self, context, report):
+        return self._manager.report_host_state(context, report)
+
+    def submit_samples(self, context, batch):
+        return self._manager.submit_samples(context, batch)
+
+    def import_cpu_data(self, context, kind, rows):
+        return self._manager.import_cpu_data(context, kind, rows)
     
     
     
@@ -252,9 +274,16 @@ class LocalAPI(object):
     """
     def get_all_vms_cpu_data(self, context):
         return self._manager.get_all_vms_cpu_data(context)
+
+    def get_vms_cpu_data_page(self, context, marker=None, limit=None):
+        return self._manager.get_vms_cpu_data_page(context, marker=marker,
+                                                   limit=limit)
             
     def get_vm_cpu_data_by_vm_id(self, context, vm_id):
         return self._manager.get_vm_cpu_data_by_vm_id(context, vm_id)
+
+    def get_vms_cpu_data(self, context, vm_ids):
+        return self._manager.get_vms_cpu_data(context, vm_ids)
             
     def delete_vm_cpu_data_by_vm_id(self, context, vm_id):
         return self._manager.delete_vm_cpu_data_by_vm_id(context, vm_id)
@@ -289,6 +318,28 @@ class LocalAPI(object):
     
     def create_vm_metadata(self, context, vm_create_values):
         return self._manager.create_vm_metadata(context, vm_create_values)
+
+    def sync_vms_metadata(self, context, vms, prune=False):
+        return self._manager.sync_vms_metadata(context, vms, prune=prune)
+
+    def get_vms_metadata_by_host(self, context, host_name):
+        return self._manager.get_vms_metadata_by_host(context, host_name)
+    
+    
+    
+    """
+    ******************
+    * host_inventory *
+    ******************
+    """
+    def sync_hosts_inventory(self, context, hosts):
+        return self._manager.sync_hosts_inventory(context, hosts)
+
+    def get_all_hosts_inventory(self, context):
+        return self._manager.get_all_hosts_inventory(context)
+
+    def get_enabled_hosts(self, context):
+        return self._manager.get_enabled_hosts(context)
     
     
     
@@ -299,6 +350,11 @@ class LocalAPI(object):
     """
     def get_all_vms_migration_records(self, context):
         return self._manager.get_all_vms_migration_records(context)
+
+    def get_vms_migration_records_page(self, context, marker=None, limit=None):
+        return self._manager.get_vms_migration_records_page(context,
+                                                            marker=marker,
+                                                            limit=limit)
             
     def get_vm_migration_record_by_id(self, context, id):
         return self._manager.get_vm_migration_record_by_id(context, id)
@@ -2,7 +2,9 @@
 
 from oslo import messaging
 
+from xdrs import cpu_data_codec
 from xdrs import manager
+from xdrs import metrics
 from xdrs.openstack.common import log as logging
 
 
@@ -10,7 +12,7 @@ LOG = logging.getLogger(__name__)
 
 
 class ConductorManager(manager.Manager):
-    target = messaging.Target(version='1.64')
+    target = messaging.Target(version='1.70')
 
     """
     这里需要进行进一步分析；
@@ -18,6 +20,7 @@ class ConductorManager(manager.Manager):
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
                                                *args, **kwargs)
+        self.db = metrics.instrument(self.db, 'xdrs_conductor_db')
         self._compute_api = None
         self.additional_endpoints.append(self.compute_task_mgr)
     
@@ -141,11 +144,26 @@ class ConductorManager(manager.Manager):
     * host_cpu_data *
     *****************
     """
-    def get_all_host_cpu_data(self, context):
-        return self.db.hosts_cpu_data_get_all(context)
-    
-    def get_host_cpu_data_by_id(self, context, id):
-        return self.db.host_cpu_data_get_by_id(context, id)
+    def get_all_host_cpu_data(self, context, cpu_data_encoding=None):
+        result = self.db.hosts_cpu_data_get_all(context)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
+
+    def get_hosts_cpu_data_page(self, context, marker=None, limit=None,
+                                cpu_data_encoding=None):
+        result = self.db.hosts_cpu_data_get_page(context, marker=marker,
+                                                 limit=limit)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
+    
+    def get_host_cpu_data_by_id(self, context, id, cpu_data_encoding=None):
+        result = self.db.host_cpu_data_get_by_id(context, id)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
+
+    def get_hosts_cpu_data(self, context, host_ids, cpu_data_encoding=None):
+        result = self.db.hosts_cpu_data_get_by_ids(context, host_ids)
+        return cpu_data_codec.encode_row_map(result, cpu_data_encoding)
+
+    def get_hosts_meminfo(self, context, host_ids):
+        return self.db.hosts_meminfo_get_by_ids(context, host_ids)
     
     def create_host_cpu_data_temp_by_id(self, context, update_values, host_uuid):
         return self.db.host_cpu_data_temp_create_by_id(context, update_values, host_uuid)
@@ -201,6 +219,18 @@ class ConductorManager(manager.Manager):
             
     def get_all_hosts_load_states_sorted_list(self, context):
         return self.db.hosts_load_states_get_all(context)
+
+    def get_hosts_load_states(self, context, ids):
+        return self.db.hosts_load_states_get_by_ids(context, ids)
+
+    def report_host_state(self, context, report):
+        return self.db.host_state_report(context, report)
+
+    def submit_samples(self, context, batch):
+        return self.db.samples_submit(context, batch)
+
+    def import_cpu_data(self, context, kind, rows):
+        return self.db.cpu_data_import(context, kind, rows)
     
     
     """
@@ -236,17 +266,32 @@ class ConductorManager(manager.Manager):
     * vm_cpu_data *
     ***************
     """
-    def get_all_vms_cpu_data(self, context):
-        return self.db.vms_cpu_data_get_all(context)
+    def get_all_vms_cpu_data(self, context, cpu_data_encoding=None):
+        result = self.db.vms_cpu_data_get_all(context)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
+
+    def get_vms_cpu_data_page(self, context, marker=None, limit=None,
+                              cpu_data_encoding=None):
+        result = self.db.vms_cpu_data_get_page(context, marker=marker,
+                                               limit=limit)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
             
-    def get_vm_cpu_data_by_vm_id(self, context, vm_id):
-        return self.db.vm_cpu_data_get_by_vm_id(context, vm_id)
+    def get_vm_cpu_data_by_vm_id(self, context, vm_id,
+                                 cpu_data_encoding=None):
+        result = self.db.vm_cpu_data_get_by_vm_id(context, vm_id)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
+
+    def get_vms_cpu_data(self, context, vm_ids, cpu_data_encoding=None):
+        result = self.db.vms_cpu_data_get_by_vm_ids(context, vm_ids)
+        return cpu_data_codec.encode_row_map(result, cpu_data_encoding)
             
     def delete_vm_cpu_data_by_vm_id(self, context, vm_id):
         return self.db.vm_cpu_data_delete_by_vm_id(context, vm_id)
     
-    def get_vm_cpu_data_by_host_id(self, context, host_id):
-        return self.db.vm_cpu_data_get_by_host_id(context, host_id)
+    def get_vm_cpu_data_by_host_id(self, context, host_id,
+                                   cpu_data_encoding=None):
+        result = self.db.vm_cpu_data_get_by_host_id(context, host_id)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
     
     def delete_vm_cpu_data_by_host_id(self, context, host_id):
         return self.db.vm_cpu_data_delete_by_host_id(context, host_id)
@@ -276,6 +321,28 @@ class ConductorManager(manager.Manager):
     def create_vm_metadata(self, context, vm_create_values):
         return self.db.vm_metadata_create(context, vm_create_values)
 
+    def sync_vms_metadata(self, context, vms, prune=False):
+        return self.db.vms_metadata_sync(context, vms, prune=prune)
+
+    def get_vms_metadata_by_host(self, context, host_name):
+        return self.db.vms_metadata_get_by_host(context, host_name)
+
+
+
+    """
+    ******************
+    * host_inventory *
+    ******************
+    """
+    def sync_hosts_inventory(self, context, hosts):
+        return self.db.hosts_inventory_sync(context, hosts)
+
+    def get_all_hosts_inventory(self, context):
+        return self.db.hosts_inventory_get_all(context)
+
+    def get_enabled_hosts(self, context):
+        return self.db.hosts_inventory_get_enabled(context)
+
 
 
 
@@ -287,6 +354,10 @@ class ConductorManager(manager.Manager):
     """
     def get_all_vms_migration_records(self, context):
         return self.db.vms_migration_records_get_all(context)
+
+    def get_vms_migration_records_page(self, context, marker=None, limit=None):
+        return self.db.vms_migration_records_get_page(context, marker=marker,
+                                                      limit=limit)
             
     def get_vm_migration_record_by_id(self, context, id):
         return self.db.vm_migration_record_get_by_id(context, id)
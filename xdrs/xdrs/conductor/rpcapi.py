@@ -1,26 +1,167 @@
 """Client side of the conductor RPC API."""
 
+import eventlet
+from eventlet import semaphore
 from oslo.config import cfg
 from oslo import messaging
 
+from xdrs import cpu_data_codec
+from xdrs import deadline
+from xdrs import exception
 from xdrs.objects import base as objects_base
-from xdrs.openstack.common import jsonutils
+from xdrs import primitives
 from xdrs import rpc
 
 CONF = cfg.CONF
 CONF.import_opt('xdrs_conductor_topic', 'xdrs.service')
-CONF.import_opt('upgrade_levels.conductor', 'xdrs.service')
+
+rpcapi_cap_opt = cfg.StrOpt('conductor',
+        help='Set a version cap for messages sent to conductor services')
+CONF.register_opt(rpcapi_cap_opt, 'upgrade_levels')
+
+rpcapi_opts = [
+    cfg.IntOpt('max_in_flight_calls',
+               default=64,
+               help='Maximum number of conductor calls an API process '
+                    'waits on at the same time; further calls queue for at '
+                    'most in_flight_wait seconds and then fail with 503. '
+                    'Other services are not limited. 0 disables the limit'),
+    cfg.FloatOpt('in_flight_wait',
+                 default=1.0,
+                 help='Seconds a conductor call waits for a free in-flight '
+                      'slot before it is shed'),
+]
+CONF.register_opts(rpcapi_opts, 'conductor')
+
+# 进程内所有ConductorAPI共享的信号量，由limit_in_flight_calls创建；
+_in_flight_slots = None
+
+
+def limit_in_flight_calls():
+    """
+    在本进程中启用conductor调用的并发数限制（max_in_flight_calls）；
+    由API服务的ConcurrencyLimiter中间件调用，控制节点和主机上的服务不受限制；
+    """
+    global _in_flight_slots
+    limit = CONF.conductor.max_in_flight_calls
+    if _in_flight_slots is None and limit > 0:
+        _in_flight_slots = semaphore.Semaphore(limit)
+
+
+class _BoundedCallContext(object):
+    """
+    为一次conductor远程调用应用并发数限制和请求截止时间；
+    """
+
+    def __init__(self, client, cctxt):
+        self._client = client
+        self._cctxt = cctxt
+
+    def prepare(self, **kwargs):
+        return _BoundedCallContext(self._client, self._cctxt.prepare(**kwargs))
+
+    def cast(self, ctxt, method, **kwargs):
+        return self._cctxt.cast(ctxt, method, **kwargs)
+
+    def call(self, ctxt, method, **kwargs):
+        remaining = deadline.remaining()
+        if remaining is not None and remaining <= 0:
+            raise exception.RequestDeadlineExceeded(
+                timeout=deadline.timeout())
+
+        slots = _in_flight_slots
+        if slots is not None:
+            wait = CONF.conductor.in_flight_wait
+            if remaining is not None:
+                wait = min(wait, remaining)
+            acquired = False
+            with eventlet.Timeout(wait, False):
+                acquired = slots.acquire()
+            if not acquired:
+                raise exception.ConductorOverloaded(
+                    limit=CONF.conductor.max_in_flight_calls)
+
+        try:
+            cctxt = self._cctxt
+            if remaining is not None:
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    raise exception.RequestDeadlineExceeded(
+                        timeout=deadline.timeout())
+                cctxt = cctxt.prepare(timeout=remaining)
+            try:
+                return cctxt.call(ctxt, method, **kwargs)
+            except messaging.MessagingTimeout:
+                if remaining is None:
+                    raise
+                raise exception.RequestDeadlineExceeded(
+                    timeout=deadline.timeout())
+        finally:
+            if slots is not None:
+                slots.release()
+
+
+class _BoundedClient(object):
+    """
+    RPCClient的包装：API服务中所有call共享一个进程内的信号量（见
+    limit_in_flight_calls），限制同时等待conductor响应的调用数目，
+    conductor变慢时多余的请求很快以503返回，而不是占满API worker的
+    green thread池；
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def can_send_version(self, version):
+        return self._client.can_send_version(version)
+
+    def prepare(self, **kwargs):
+        return _BoundedCallContext(self, self._client.prepare(**kwargs))
 
 
 class ConductorAPI(object):
+    """
+    版本历史：
+    1.64 - 初始版本；
+    1.65 - CPU历史数据的读取方法增加cpu_data_encoding参数，
+           返回结果中的cpu_data可以采用cpu_data_codec进行紧凑编码；
+    1.66 - 增加批量读取方法get_hosts_cpu_data、get_vms_cpu_data、
+           get_hosts_load_states和get_hosts_meminfo；
+    1.67 - 增加nova清单同步方法sync_vms_metadata、get_vms_metadata_by_host、
+           sync_hosts_inventory、get_all_hosts_inventory和get_enabled_hosts；
+    1.68 - 增加report_host_state，合并上报主机的心跳、状态和CPU采样；
+    1.69 - 增加submit_samples，批量提交数据采集的主机和虚拟机实例采样；
+    1.70 - 增加import_cpu_data，批量导入虚拟机实例或者主机的CPU历史数据；
+    """
+
+    VERSION_ALIASES = {
+        'icehouse': '1.64',
+    }
+
     def __init__(self):
         super(ConductorAPI, self).__init__()
         target = messaging.Target(topic=CONF.xdrs_conductor_topic)
-        version_cap = 1.0
+        version_cap = self.VERSION_ALIASES.get(CONF.upgrade_levels.conductor,
+                                               CONF.upgrade_levels.conductor)
         serializer = objects_base.XdrsObjectSerializer()
-        self.client = rpc.get_client(target,
-                                     version_cap=version_cap,
-                                     serializer=serializer)
+        self.client = _BoundedClient(rpc.get_client(target,
+                                                    version_cap=version_cap,
+                                                    serializer=serializer))
+
+    def _call_cpu_data(self, context, method, decode=cpu_data_codec.decode_rows,
+                       version='1.65', **kwargs):
+        """
+        读取CPU历史数据；如果conductor支持1.65版本，则请求紧凑编码的结果，
+        并在本地解码，调用者得到的数据格式不变；
+        """
+        if self.client.can_send_version(version):
+            cctxt = self.client.prepare(version=version)
+            result = cctxt.call(context, method,
+                                cpu_data_encoding=cpu_data_codec.ENCODING,
+                                **kwargs)
+            return decode(result)
+        cctxt = self.client.prepare()
+        return cctxt.call(context, method, **kwargs)
         
     def service_get_all_by(self, context, topic=None, host=None, binary=None):
         cctxt = self.client.prepare()
@@ -110,7 +251,7 @@ class ConductorAPI(object):
     注：这里应该改变配置文件中的参数信息，而不应该是改变数据库中的参数信息；
     """
     def update_overload_algorithm(self, context, id, values):
-        values_p = jsonutils.to_primitive(values)
+        values_p = primitives.to_primitive(values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_overload_algorithm', id=id, values=values_p)
     
@@ -118,7 +259,7 @@ class ConductorAPI(object):
     注：这里应该改变配置文件中的参数信息，而不应该是改变数据库中的参数信息；
     """
     def update_underload_algorithm(self, context, id, values):
-        values_p = jsonutils.to_primitive(values)
+        values_p = primitives.to_primitive(values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_underload_algorithm', id=id, values=values_p)
     
@@ -126,7 +267,7 @@ class ConductorAPI(object):
     注：这里应该改变配置文件中的参数信息，而不应该是改变数据库中的参数信息；
     """
     def update_filter_scheduler_algorithm(self, context, id, values):
-        values_p = jsonutils.to_primitive(values)
+        values_p = primitives.to_primitive(values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_filter_scheduler_algorithm', id=id, values=values_p)
     
@@ -134,7 +275,7 @@ class ConductorAPI(object):
     注：这里应该改变配置文件中的参数信息，而不应该是改变数据库中的参数信息；
     """
     def update_host_scheduler_algorithm(self, context, id, values):
-        values_p = jsonutils.to_primitive(values)
+        values_p = primitives.to_primitive(values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_host_scheduler_algorithm', id=id, values=values_p)
     
@@ -142,32 +283,32 @@ class ConductorAPI(object):
     注：这里应该改变配置文件中的参数信息，而不应该是改变数据库中的参数信息；
     """
     def update_vm_select_algorithm(self, context, id, values):
-        values_p = jsonutils.to_primitive(values)
+        values_p = primitives.to_primitive(values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_vm_select_algorithm', id=id, values=values_p)
     
     def create_underload_algorithm(self, context, algorithm_create_values):
-        algorithm_create_values = jsonutils.to_primitive(algorithm_create_values)
+        algorithm_create_values = primitives.to_primitive(algorithm_create_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_underload_algorithm', algorithm_create_values=algorithm_create_values)
     
     def create_overload_algorithm(self, context, algorithm_create_values):
-        algorithm_create_values = jsonutils.to_primitive(algorithm_create_values)
+        algorithm_create_values = primitives.to_primitive(algorithm_create_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_overload_algorithm', algorithm_create_values=algorithm_create_values)
     
     def create_filter_scheduler_algorithm(self, context, algorithm_create_values):
-        algorithm_create_values = jsonutils.to_primitive(algorithm_create_values)
+        algorithm_create_values = primitives.to_primitive(algorithm_create_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_filter_scheduler_algorithm', algorithm_create_values=algorithm_create_values)
     
     def create_host_scheduler_algorithm(self, context, algorithm_create_values):
-        algorithm_create_values = jsonutils.to_primitive(algorithm_create_values)
+        algorithm_create_values = primitives.to_primitive(algorithm_create_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_host_scheduler_algorithm', algorithm_create_values=algorithm_create_values)
     
     def create_vm_select_algorithm(self, context, algorithm_create_values):
-        algorithm_create_values = jsonutils.to_primitive(algorithm_create_values)
+        algorithm_create_values = primitives.to_primitive(algorithm_create_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_vm_select_algorithm', algorithm_create_values=algorithm_create_values)
     
@@ -197,16 +338,29 @@ class ConductorAPI(object):
     *****************
     """
     def get_all_host_cpu_data(self, context):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'get_all_host_cpu_data')
+        return self._call_cpu_data(context, 'get_all_host_cpu_data')
+
+    def get_hosts_cpu_data_page(self, context, marker=None, limit=None):
+        return self._call_cpu_data(context, 'get_hosts_cpu_data_page',
+                                   marker=marker, limit=limit)
     
     def get_host_cpu_data_by_id(self, context, id):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'get_host_cpu_data_by_id', id=id)
+        return self._call_cpu_data(context, 'get_host_cpu_data_by_id', id=id)
+
+    def get_hosts_cpu_data(self, context, host_ids):
+        return self._call_cpu_data(context, 'get_hosts_cpu_data',
+                                   decode=cpu_data_codec.decode_row_map,
+                                   version='1.66',
+                                   host_ids=list(host_ids))
+
+    def get_hosts_meminfo(self, context, host_ids):
+        cctxt = self.client.prepare(version='1.66')
+        return cctxt.call(context, 'get_hosts_meminfo',
+                          host_ids=list(host_ids))
     
     def create_host_cpu_data_temp_by_id(self, context, update_values, host_uuid):
         cctxt = self.client.prepare()
-        update_value_p = jsonutils.to_primitive(update_values)
+        update_value_p = primitives.to_primitive(update_values)
         return cctxt.call(
                    context, 
                    'create_host_cpu_data_temp_by_id', 
@@ -215,7 +369,7 @@ class ConductorAPI(object):
     
     def update_host_cpu_data_temp_by_id(self, context, update_values, host_uuid):
         cctxt = self.client.prepare()
-        update_value_p = jsonutils.to_primitive(update_values)
+        update_value_p = primitives.to_primitive(update_values)
         return cctxt.call(
                    context, 
                    'update_host_cpu_data_temp_by_id', 
@@ -245,7 +399,7 @@ class ConductorAPI(object):
         return cctxt.call(context, 'delete_host_task_states_by_id', id=id)
             
     def update_host_task_states(self, context, id, update_value):
-        update_value_p = jsonutils.to_primitive(update_value)
+        update_value_p = primitives.to_primitive(update_value)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_host_task_states', id=id, values=update_value_p)
             
@@ -258,7 +412,7 @@ class ConductorAPI(object):
         return cctxt.call(context, 'get_host_running_states_by_id', id=id)
             
     def update_host_running_states(self, context, id, update_value):
-        update_value_p = jsonutils.to_primitive(update_value)
+        update_value_p = primitives.to_primitive(update_value)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_host_running_states', id=id, values=update_value_p)
             
@@ -275,7 +429,7 @@ class ConductorAPI(object):
         return cctxt.call(context, 'get_host_load_states_by_id', id=id)
             
     def update_host_load_states(self, context, id, update_value):
-        update_value_p = jsonutils.to_primitive(update_value)
+        update_value_p = primitives.to_primitive(update_value)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_host_load_states', id=id, values=update_value_p)
             
@@ -286,6 +440,25 @@ class ConductorAPI(object):
     def get_all_hosts_load_states_sorted_list(self, context):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'get_all_hosts_load_states_sorted_list')
+
+    def get_hosts_load_states(self, context, ids):
+        cctxt = self.client.prepare(version='1.66')
+        return cctxt.call(context, 'get_hosts_load_states', ids=list(ids))
+
+    def report_host_state(self, context, report):
+        cctxt = self.client.prepare(version='1.68')
+        return cctxt.call(context, 'report_host_state',
+                          report=primitives.to_primitive(report))
+
+    def submit_samples(self, context, batch):
+        cctxt = self.client.prepare(version='1.69')
+        return cctxt.call(context, 'submit_samples',
+                          batch=primitives.to_primitive(batch))
+
+    def import_cpu_data(self, context, kind, rows):
+        cctxt = self.client.prepare(version='1.70')
+        return cctxt.call(context, 'import_cpu_data', kind=kind,
+                          rows=primitives.to_primitive(rows))
     
     
     
@@ -295,12 +468,12 @@ class ConductorAPI(object):
     ******************
     """
     def create_host_init_data(self, context, update_values):
-        update_values_p = jsonutils.to_primitive(update_values)
+        update_values_p = primitives.to_primitive(update_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_host_init_data', values=update_values_p)
     
     def update_host_init_data(self, context, host_id, update_values):
-        update_values_p = jsonutils.to_primitive(update_values)
+        update_values_p = primitives.to_primitive(update_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_host_init_data', host_id, values=update_values_p)
     
@@ -313,12 +486,12 @@ class ConductorAPI(object):
         return cctxt.call(context, 'get_all_hosts_init_data')
     
     def create_host_init_data_temp(self, context, update_values):
-        update_values_p = jsonutils.to_primitive(update_values)
+        update_values_p = primitives.to_primitive(update_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'create_host_init_data_temp', values=update_values_p)
     
     def update_host_init_data_temp(self, context, host_id, update_values):
-        update_values_p = jsonutils.to_primitive(update_values)
+        update_values_p = primitives.to_primitive(update_values)
         cctxt = self.client.prepare()
         return cctxt.call(context, 'update_host_init_data_temp', host_id, values=update_values_p)
     
@@ -334,20 +507,29 @@ class ConductorAPI(object):
     ***************
     """
     def get_all_vms_cpu_data(self, context):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'get_all_vms_cpu_data')
+        return self._call_cpu_data(context, 'get_all_vms_cpu_data')
+
+    def get_vms_cpu_data_page(self, context, marker=None, limit=None):
+        return self._call_cpu_data(context, 'get_vms_cpu_data_page',
+                                   marker=marker, limit=limit)
             
     def get_vm_cpu_data_by_vm_id(self, context, vm_id):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'get_vm_cpu_data_by_vm_id', vm_id)
+        return self._call_cpu_data(context, 'get_vm_cpu_data_by_vm_id',
+                                   vm_id=vm_id)
+
+    def get_vms_cpu_data(self, context, vm_ids):
+        return self._call_cpu_data(context, 'get_vms_cpu_data',
+                                   decode=cpu_data_codec.decode_row_map,
+                                   version='1.66',
+                                   vm_ids=list(vm_ids))
             
     def delete_vm_cpu_data_by_vm_id(self, context, vm_id):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'delete_vm_cpu_data_by_vm_id', vm_id)
     
     def get_vm_cpu_data_by_host_id(self, context, host_id):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'get_vm_cpu_data_by_host_id', host_id)
+        return self._call_cpu_data(context, 'get_vm_cpu_data_by_host_id',
+                                   host_id=host_id)
     
     def delete_vm_cpu_data_by_host_id(self, context, host_id):
         cctxt = self.client.prepare()
@@ -384,8 +566,38 @@ class ConductorAPI(object):
         注：这个方法需要比较细致地来写；
         """
         cctxt = self.client.prepare()
-        vm_create_values = jsonutils.to_primitive(vm_create_values)
+        vm_create_values = primitives.to_primitive(vm_create_values)
         return cctxt.call(context, 'create_vm_metadata', vm_create_values=vm_create_values)
+
+    def sync_vms_metadata(self, context, vms, prune=False):
+        cctxt = self.client.prepare(version='1.67')
+        return cctxt.call(context, 'sync_vms_metadata',
+                          vms=primitives.to_primitive(vms), prune=prune)
+
+    def get_vms_metadata_by_host(self, context, host_name):
+        cctxt = self.client.prepare(version='1.67')
+        return cctxt.call(context, 'get_vms_metadata_by_host',
+                          host_name=host_name)
+    
+    
+    
+    """
+    ******************
+    * host_inventory *
+    ******************
+    """
+    def sync_hosts_inventory(self, context, hosts):
+        cctxt = self.client.prepare(version='1.67')
+        return cctxt.call(context, 'sync_hosts_inventory',
+                          hosts=primitives.to_primitive(hosts))
+
+    def get_all_hosts_inventory(self, context):
+        cctxt = self.client.prepare(version='1.67')
+        return cctxt.call(context, 'get_all_hosts_inventory')
+
+    def get_enabled_hosts(self, context):
+        cctxt = self.client.prepare(version='1.67')
+        return cctxt.call(context, 'get_enabled_hosts')
     
     
     
@@ -398,6 +610,11 @@ class ConductorAPI(object):
     def get_all_vms_migration_records(self, context):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'get_all_vms_migration_records')
+
+    def get_vms_migration_records_page(self, context, marker=None, limit=None):
+        cctxt = self.client.prepare()
+        return cctxt.call(context, 'get_vms_migration_records_page',
+                          marker=marker, limit=limit)
             
     def get_vm_migration_record_by_id(self, context, id):
         cctxt = self.client.prepare()
@@ -6,10 +6,15 @@ import libvirt
 import random
 
 from xdrs import manager
+from xdrs import metrics
 from xdrs import hosts
 from xdrs import exception
 import xdrs
 from xdrs.compute.nova import novaclient
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+from xdrs.openstack.common import periodic_task
+from xdrs.vms import inventory
 from xdrs.controller import rpcapi as data_collection_rpcapi
 from xdrs.controller import rpcapi as load_detection_rpcapi
 from xdrs.controller import rpcapi as vms_selection_rpcapi
@@ -26,6 +31,9 @@ CONF.import_opt('controller_topic', 'xdrs.service')
 CONF.import_opt('host_scheduler_algorithm_path', 'xdrs.service')
 CONF.import_opt('sleep_command', 'xdrs.service')
 CONF.import_opt('filter_scheduler_algorithm_path', 'xdrs.service')
+CONF.import_opt('nova_inventory_notifications', 'xdrs.vms.inventory')
+
+LOG = logging.getLogger(__name__)
 
 class ControllerManager(manager.Manager):
     def __init__(self, compute_driver=None, *args, **kwargs):
@@ -35,6 +43,8 @@ class ControllerManager(manager.Manager):
         self.vms_selection_rpcapi = vms_selection_rpcapi.VmsSelectionRPCAPI()
         self.vms_migration_rpcapi = vms_migration_rpcapi.VmMigrationRPCAPI()
         self.controller_rpcapi = controller_rpcapi.ControllerRPCAPI()
+        self.nova_inventory = inventory.NovaInventory()
+        self._notification_listener = None
         super(ControllerManager, self).__init__(service_name="xdrs_controller",
                                              *args, **kwargs)
         
@@ -80,6 +90,7 @@ class ControllerManager(manager.Manager):
         return host_state
     
     
+    @metrics.timed('xdrs_controller_round')
     def dynamic_resource_scheduling(self, context):
         controller_topic = CONF.controller_topic
         data_collection_topic = CONF.data_collection_topic
@@ -94,7 +105,8 @@ class ControllerManager(manager.Manager):
         hosts_uuid = dict()
         
         try:
-            hosts_init_data = self.hosts_api.get_all_hosts_init_data(context)
+            with metrics.timer('xdrs_controller_stage', stage='hosts_init_data'):
+                hosts_init_data = self.hosts_api.get_all_hosts_init_data(context)
         except exception.HostInitDataNotFound:
             msg = _('host init data not found')
             raise webob.exc.HTTPBadRequest(explanation=msg)
@@ -110,24 +122,28 @@ class ControllerManager(manager.Manager):
         所有主机本地数据采集；
         """
         try:
-            self.data_collection_rpcapi.hosts_vms_data_collection(context, data_collection_topic)
+            with metrics.timer('xdrs_controller_stage', stage='data_collection'):
+                self.data_collection_rpcapi.hosts_vms_data_collection(context, data_collection_topic)
         except exception.DataCollectionError:
             msg = _('There are some error in hosts and vms data collection operation.')
             raise webob.exc.HTTPBadRequest(explanation=msg)
         
-        time.sleep(CONF.wait_time)
+        with metrics.timer('xdrs_controller_stage', stage='wait'):
+            time.sleep(CONF.wait_time)
         
         
         """
         所有主机本地负载检测；
         """
         try:
-            self.load_detection_rpcapi.hosts_load_detection(context, load_detection_topic)
+            with metrics.timer('xdrs_controller_stage', stage='load_detection'):
+                self.load_detection_rpcapi.hosts_load_detection(context, load_detection_topic)
         except exception.LoadDetectionError:
             msg = _('There are some error in hosts load detection operation.')
             raise webob.exc.HTTPBadRequest(explanation=msg)
         
-        time.sleep(CONF.wait_time)
+        with metrics.timer('xdrs_controller_stage', stage='wait'):
+            time.sleep(CONF.wait_time)
         
         
         """
@@ -135,20 +151,20 @@ class ControllerManager(manager.Manager):
         """
         vms_mrigation_selection = dict()
         underload_hosts_uuid = list()
+        hosts_load_states = self.hosts_api.get_hosts_load_states(context, hosts_uuid)
         for host_uuid in hosts_uuid:
-            try:
-                host_load_states = self.hosts_api.get_host_load_states_by_id(context, host_uuid)
-            except exception.NotFound:
+            if host_uuid not in hosts_load_states:
                 raise exc.HTTPNotFound()
             
-            host_load_state = host_load_states['host_load_state']
+            host_load_state = hosts_load_states[host_uuid]['host_load_state']
             
             if host_load_state == 'underload':
                 underload_hosts_uuid.add(host_uuid)
             
             if host_load_state == 'overload':
                 try:
-                    vm_mrigation_list = self.vms_selection_rpcapi.vms_selection(context, host_uuid, vms_selection_topic)
+                    with metrics.timer('xdrs_controller_stage', stage='vms_selection'):
+                        vm_mrigation_list = self.vms_selection_rpcapi.vms_selection(context, host_uuid, vms_selection_topic)
                 except exception.VmsSelectionError:
                     msg = _('There are some error in vms selection operation.')
                     raise webob.exc.HTTPBadRequest(explanation=msg)
@@ -156,7 +172,8 @@ class ControllerManager(manager.Manager):
                 vms_mrigation_selection[host_uuid] = vm_mrigation_list
            
         
-        time.sleep(CONF.wait_time)
+        with metrics.timer('xdrs_controller_stage', stage='wait'):
+            time.sleep(CONF.wait_time)
         
         """
         针对过载主机的要迁移的虚拟机实例进行迁移目标主机的分配；
@@ -175,16 +192,23 @@ class ControllerManager(manager.Manager):
         的数据，所以这里要对其复制生成临时的数据表HostCpuDataTemp。
         HostCPUDataTemp这里包括主机内存的使用信息，数据表名称有待商榷；
         """
+        with metrics.timer('xdrs_controller_stage', stage='hosts_cpu_data'):
+            hosts_cpu_data = self.hosts_api.get_hosts_cpu_data(context, vms_mrigation_selection.keys())
+        """
+        主机的内存信息见hosts.API.get_hosts_meminfo：读取数据采集上报到HostCpuData
+        的total_ram和free_ram，还没有上报过的主机通过一次scatter-gather并发获取；
+        """
+        with metrics.timer('xdrs_controller_stage', stage='hosts_meminfo'):
+            hosts_meminfo = self.hosts_api.get_hosts_meminfo(
+                context, list(vms_mrigation_selection.keys()))
         for host_uuid, vm_mrigation_list in vms_mrigation_selection:
-            try:
-                cpu_data = self.hosts_api.get_host_cpu_data_by_id(context, host_uuid)
-            except exception.HostCpuDataNotFound:
+            if host_uuid not in hosts_cpu_data:
                 msg = _('host cpu data not found')
                 raise webob.exc.HTTPBadRequest(explanation=msg)
+            cpu_data = hosts_cpu_data[host_uuid]
             
-            try:
-                host_meminfo = self.hosts_api.get_meminfo_by_id(context, host_uuid)
-            except exception.HostMemroyInfoNotFound:
+            host_meminfo = hosts_meminfo.get(host_uuid)
+            if host_meminfo is None:
                 msg = _('host memroy info not found')
                 raise webob.exc.HTTPBadRequest(explanation=msg)
             
@@ -205,10 +229,11 @@ class ControllerManager(manager.Manager):
             """
             @@@@注：及时更新HostLoadState中的信息；
             """
-            vm_host_mapper, vms_hosts_mapper_fales = host_scheduler_algorithm_fuction(
-                                                            vm_mrigation_list, 
-                                                            host_uuid, 
-                                                            available_filter_hosts)
+            with metrics.timer('xdrs_controller_stage', stage='placement', cpu=True):
+                vm_host_mapper, vms_hosts_mapper_fales = host_scheduler_algorithm_fuction(
+                                                                vm_mrigation_list, 
+                                                                host_uuid, 
+                                                                available_filter_hosts)
             """
             vms_hosts_mapper = {host_uuid1:{vm1:host1,vm2:host2,......}, 
                                host_uuid2:{vm3:host1,vm4:host2,......}, 
@@ -222,22 +247,24 @@ class ControllerManager(manager.Manager):
         实现相关虚拟机到目标主机的迁移操作；
         注：如果判断虚拟机迁移是否成功，估计要对nova和novaclient中的相关源码进行改进；
         """
+        nova_client = novaclient(context)
         for host_uuid, vm_host_mapper in vms_hosts_mapper:
             for vm_uuid, host_uuid in vm_host_mapper:
-                novaclient(context).servers.live_migrate(vm_uuid, host_uuid, False, False)
+                with metrics.timer('xdrs_controller_stage', stage='live_migrate'):
+                    nova_client.servers.live_migrate(vm_uuid, host_uuid, False, False)
+                metrics.incr('xdrs_controller_live_migrations')
         
         """
         检测欠载的主机是否仍为欠载状态，将仍为欠载状态的主机上的所有虚拟机实例迁移出去，并设置
         主机为低功耗状态；
         """
         vms_underload_hosts_mapper = dict()
+        hosts_load_states = self.hosts_api.get_hosts_load_states(context, underload_hosts_uuid)
         for host_uuid in underload_hosts_uuid:
-            try:
-                host_load_states = self.hosts_api.get_host_load_states_by_id(context, host_uuid)
-            except exception.NotFound:
+            if host_uuid not in hosts_load_states:
                 raise exc.HTTPNotFound()
             
-            host_load_state = host_load_states['host_load_state']
+            host_load_state = hosts_load_states[host_uuid]['host_load_state']
             if host_load_state == 'underload':
                 available_hosts = self._get_all_available_hosts(context)
                 filter_scheduler_algorithms_fuctions = self._get_filter_scheduler_algorithms_in_use(context)
@@ -249,8 +276,9 @@ class ControllerManager(manager.Manager):
                 vir_connection = libvirt.openReadOnly(host_uuid)
                 vms_current = self._get_current_vms(vir_connection)
                 
-                vm_host_mapper = host_scheduler_algorithm_fuction(vms_current, 
-                                                            available_filter_hosts)
+                with metrics.timer('xdrs_controller_stage', stage='placement', cpu=True):
+                    vm_host_mapper = host_scheduler_algorithm_fuction(vms_current, 
+                                                                available_filter_hosts)
                 vms_underload_hosts_mapper[host_uuid] = vm_host_mapper
         
         
@@ -258,9 +286,12 @@ class ControllerManager(manager.Manager):
         实现相关虚拟机到目标主机的迁移操作；
         注：如果判断虚拟机迁移是否成功，估计要对nova和novaclient中的相关源码进行改进；
         """
+        nova_client = novaclient(context)
         for uuid, vm_host_mapper in vms_underload_hosts_mapper:
             for vm_uuid, host_uuid in vm_host_mapper:
-                novaclient(context).servers.live_migrate(vm_uuid, host_uuid, False, False)
+                with metrics.timer('xdrs_controller_stage', stage='live_migrate'):
+                    nova_client.servers.live_migrate(vm_uuid, host_uuid, False, False)
+                metrics.incr('xdrs_controller_live_migrations')
         
         """
         实现欠载主机的虚拟机迁移操作之后，设置其运行状态为低功耗模式；
@@ -268,27 +299,31 @@ class ControllerManager(manager.Manager):
         sleep_command = CONF.sleep_command
         for uuid, vm_host_mapper in vms_underload_hosts_mapper:
             try:
-                self.controller_rpcapi.switch_host_off(context, sleep_command, uuid, controller_topic)
+                with metrics.timer('xdrs_controller_stage', stage='switch_host_off'):
+                    self.controller_rpcapi.switch_host_off(context, sleep_command, uuid, controller_topic)
             except exception.DataCollectionError:
                 msg = _('There are some error in hosts and vms data collection operation.')
                 raise webob.exc.HTTPBadRequest(explanation=msg)
         
-        time.sleep(CONF.wait_time)
+        with metrics.timer('xdrs_controller_stage', stage='wait'):
+            time.sleep(CONF.wait_time)
     
     
     def _get_all_available_hosts(self, context):
-        hosts_api = hosts.API()
-        hosts = novaclient(context).hosts.index()
+        """
+        nova中可用的计算节点见hosts.API.get_nova_hosts，以计算节点名称
+        （nova-compute服务的host）与主机负载状态进行匹配；
+        """
+        hosts_api = self.hosts_api
+        nova_hosts = set(hosts_api.get_nova_hosts(context))
         hosts_states = hosts_api.get_all_hosts_load_states_sorted_list(context)
         hosts_temp = list()
         
         for uuid, host_load_state in hosts_states:
             if host_load_state == 'normalload' or 'underload':
-                hosts_temp.add(uuid)
+                hosts_temp.append(uuid)
                 
-        for i in hosts_temp:
-            if i not in hosts['id']:
-                del hosts_temp[i]
+        hosts_temp = [uuid for uuid in hosts_temp if uuid in nova_hosts]
         
         available_hosts = hosts_temp
         
@@ -324,6 +359,38 @@ class ControllerManager(manager.Manager):
         
         return vm_uuids
     
+    """
+    ******************
+    * nova_inventory *
+    ******************
+    """
+    @periodic_task.periodic_task
+    def _sync_nova_inventory(self, context):
+        """
+        同步nova虚拟机实例和计算节点清单到本地数据表；
+        注：轮询间隔由nova_inventory_poll_interval在任务内部控制，
+        以便修改配置后不需要重新加载模块；
+        """
+        if not self.nova_inventory.poll_due():
+            return
+        try:
+            self.nova_inventory.poll(context)
+        except Exception as ex:
+            LOG.warn(_('Failed to sync nova inventory: %s'), ex)
+    
+    def pre_start_hook(self):
+        """
+        启用nova_inventory_notifications时，开始监听nova的通知；
+        """
+        if CONF.nova_inventory_notifications:
+            self._notification_listener = inventory.get_notification_listener()
+            self._notification_listener.start()
+    
+    def cleanup_host(self):
+        if self._notification_listener is not None:
+            self._notification_listener.stop()
+            self._notification_listener = None
+    
     def init_host(self):
         """
         调用获取算法API，如果返回值为空，从配置文件读取算法信息，写入数据库；        
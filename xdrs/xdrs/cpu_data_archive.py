@@ -0,0 +1,263 @@
+"""
+CPU历史数据的批量导出和导入格式；
+
+以前要取得一个集群的CPU历史数据（离线分析，或者为新的主机预置数据），只能通过
+vms_cpu_data接口逐页读取JSON；这里定义一种按列保存的二进制格式，API服务
+（api/v1_contrib/cpu_data_archive.py）和命令行工具（cmd/cpu_data.py）以此导出
+和导入虚拟机实例和主机的CPU历史数据：
+  MAGIC，然后是若干块，每块为8字节的长度（大端）加上一个NumPy .npz文件，
+  长度为0表示结束；每块最多包含cpu_data_archive_chunk_size个序列，边读边写，
+  导出和导入都不需要把全部数据放在内存中；
+每块中的数组：
+  kind：vms或者hosts；
+  ids：虚拟机实例的vm_id或者主机的host_id；
+  host_names：所在主机的名称；
+  host_ids、vm_uuids：虚拟机实例所在主机的host_id和虚拟机实例的UUID
+                      （只有vms），未知时为空字符串；
+  offsets：int64，第i个序列的采样为values[offsets[i]:offsets[i + 1]]；
+  values：int32，所有序列的采样（MHz）依次连接；
+  start_times：int64，每个序列第一个采样的时间（UNIX时间，秒），未知时为-1；
+  interval：采样的时间间隔（秒），第j个采样的时间为start_times[i] + j * interval；
+中央数据库中只保存了采样值，采样时间由记录的更新时间和data_collector_interval
+推算（见xdrs.cpu_data_series），时间范围（start、end）的选择同样是近似的；
+
+导入时每cpu_data_import_batch_size个序列由conductor以一次批量insert/update写入
+（见db.cpu_data_import），已经存在的序列被替换为导入的采样；
+记录的更新时间恢复为最后一个采样的时间（start_times未知时为导入的时间），
+虚拟机实例的host_id和vm_uuid同时恢复，导入之后按照时间范围的查询与导出之前相同；
+"""
+
+import calendar
+import io
+import struct
+import zipfile
+
+import numpy
+import six
+
+from oslo.config import cfg
+
+from xdrs import cpu_data_series
+
+
+cpu_data_archive_opts = [
+    cfg.IntOpt('cpu_data_archive_chunk_size',
+               default=1000,
+               help='Number of series read per page and written per chunk '
+                    'when CPU history is exported'),
+    cfg.IntOpt('cpu_data_import_batch_size',
+               default=500,
+               help='Number of series written by one batched database '
+                    'insert when CPU history is imported'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(cpu_data_archive_opts)
+CONF.import_opt('data_collector_interval', 'xdrs.service')
+
+CONTENT_TYPE = 'application/x-xdrs-cpu-data'
+MAGIC = b'XDRSCPU1'
+
+VMS = 'vms'
+HOSTS = 'hosts'
+# 每种序列分页读取和导出使用的标识字段；
+KINDS = {VMS: 'vm_id', HOSTS: 'host_id'}
+
+_LENGTH = struct.Struct('>Q')
+# 单个块的最大长度，防止格式错误的数据耗尽内存；
+_MAX_CHUNK_LENGTH = 1 << 30
+
+
+def _epoch(timestamp):
+    return calendar.timegm(timestamp.utctimetuple())
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_rows(fetch_page, kind, page_size=None):
+    """
+    按照标识字段分页读取一种序列的所有记录；
+    fetch_page(marker=..., limit=...)返回marker之后的记录；
+    第一页立即读取，NotFound等错误在开始输出之前引发，其余的页边输出边读取；
+    """
+    page_size = page_size or CONF.cpu_data_archive_chunk_size
+    page = fetch_page(marker=None, limit=page_size)
+    return _iter_remaining_rows(fetch_page, KINDS[kind], page, page_size)
+
+
+def _iter_remaining_rows(fetch_page, key, page, page_size):
+    while True:
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        page = fetch_page(marker=page[-1][key], limit=page_size)
+
+
+def encode_chunk(kind, rows, start=None, end=None, interval=None,
+                 compress=False):
+    """
+    把一组记录中start、end时间范围内的采样编码为一个.npz块；
+    指定了时间范围而没有采样的序列不被导出，没有序列时返回None；
+    """
+    interval = interval or CONF.data_collector_interval
+    key = KINDS[kind]
+    ids, host_names, start_times, series = [], [], [], []
+    host_ids, vm_uuids = [], []
+    for row in rows:
+        values = cpu_data_series.to_array(row.get('cpu_data'))
+        end_time = cpu_data_series.row_end_time(row)
+        first, last = cpu_data_series.select_range(len(values), end_time,
+                                                   interval, start, end)
+        if first == last and (start is not None or end is not None):
+            continue
+        if end_time is None:
+            start_times.append(-1)
+        else:
+            start_times.append(_epoch(end_time) -
+                               (len(values) - 1 - first) * interval)
+        ids.append(row[key])
+        host_names.append(row.get('host_name') or u'')
+        host_ids.append(row.get('host_id') or u'')
+        vm_uuids.append(row.get('vm_uuid') or u'')
+        series.append(values[first:last])
+    if not ids:
+        return None
+
+    offsets = numpy.cumsum([0] + [len(samples) for samples in series])
+    arrays = dict(
+        kind=numpy.array(six.text_type(kind)),
+        ids=numpy.array(ids),
+        host_names=_text_array(host_names),
+        offsets=offsets.astype(numpy.int64),
+        values=numpy.concatenate(series).astype(numpy.int32),
+        start_times=numpy.array(start_times, dtype=numpy.int64),
+        interval=numpy.array(interval, dtype=numpy.int32))
+    if kind == VMS:
+        arrays.update(host_ids=_text_array(host_ids),
+                      vm_uuids=_text_array(vm_uuids))
+    buf = io.BytesIO()
+    save = numpy.savez_compressed if compress else numpy.savez
+    save(buf, **arrays)
+    return buf.getvalue()
+
+
+def _text_array(items):
+    return numpy.array([six.text_type(item) for item in items])
+
+
+def export(rows, kind, start=None, end=None, chunk_size=None,
+           compress=False):
+    """
+    返回导出数据的迭代器（若干段bytes），rows为一种序列的记录的迭代器；
+    """
+    yield MAGIC
+    for batch in _batches(rows, chunk_size or
+                          CONF.cpu_data_archive_chunk_size):
+        data = encode_chunk(kind, batch, start, end, compress=compress)
+        if data:
+            yield _LENGTH.pack(len(data))
+            yield data
+    yield _LENGTH.pack(0)
+
+
+def _read_exactly(fileobj, size):
+    parts = []
+    while size:
+        data = fileobj.read(size)
+        if not data:
+            raise ValueError('truncated cpu data archive')
+        parts.append(data)
+        size -= len(data)
+    return b''.join(parts)
+
+
+def read_chunks(fileobj):
+    """
+    解析导出数据，依次返回每个块（numpy.load的结果，可以按照数组名称读取）；
+    数据格式错误时引发ValueError；
+    """
+    if _read_exactly(fileobj, len(MAGIC)) != MAGIC:
+        raise ValueError('not a cpu data archive')
+    while True:
+        (length,) = _LENGTH.unpack(_read_exactly(fileobj, _LENGTH.size))
+        if not length:
+            return
+        if length > _MAX_CHUNK_LENGTH:
+            raise ValueError('cpu data archive chunk too large')
+        data = _read_exactly(fileobj, length)
+        try:
+            yield numpy.load(io.BytesIO(data), allow_pickle=False)
+        except (IOError, OSError, zipfile.BadZipfile) as ex:
+            raise ValueError('malformed cpu data archive chunk: %s' % ex)
+
+
+def chunk_rows(chunk, length=None):
+    """
+    把一个块转换为导入的记录，返回(kind, rows)：
+    rows = [{'vm_id'或者'host_id': XXX, 'host_name': XXX,
+             'cpu_data': [XXX, ......],
+             'end_time': XXX（最后一个采样的UNIX时间，未知时为None），
+             'host_id': XXX, 'vm_uuid': XXX（只有vms，未知时为None）}, ......]；
+    length不为空时每个序列只保留最新的length个采样（最后一个采样的时间不变）；
+    """
+    try:
+        kind = six.text_type(chunk['kind'].item())
+        key = KINDS[kind]
+        ids = chunk['ids']
+        host_names = chunk['host_names']
+        offsets = chunk['offsets']
+        values = chunk['values']
+        start_times = chunk['start_times']
+        interval = int(chunk['interval'].item())
+    except KeyError as ex:
+        raise ValueError('malformed cpu data archive chunk: %s' % ex)
+    extra = dict()
+    if kind == VMS:
+        for name, column in (('host_ids', 'host_id'), ('vm_uuids', 'vm_uuid')):
+            if name in chunk.files:
+                extra[column] = chunk[name]
+    if (len(offsets) != len(ids) + 1 or len(host_names) != len(ids) or
+            len(start_times) != len(ids) or
+            any(len(array) != len(ids) for array in extra.values())):
+        raise ValueError('malformed cpu data archive chunk')
+    rows = []
+    for i in range(len(ids)):
+        data = values[offsets[i]:offsets[i + 1]]
+        end_time = None
+        if start_times[i] >= 0:
+            end_time = int(start_times[i]) + (len(data) - 1) * interval
+        if length:
+            data = data[-length:]
+        row = {key: ids[i].item(),
+               'host_name': six.text_type(host_names[i]),
+               'cpu_data': data.tolist(),
+               'end_time': end_time}
+        for column, array in extra.items():
+            row[column] = six.text_type(array[i]) or None
+        rows.append(row)
+    return kind, rows
+
+
+def import_chunks(fileobj, import_rows, length=None, batch_size=None):
+    """
+    导入导出数据，import_rows(kind, rows)写入一批记录；返回导入的序列数；
+    注：已经写入的批次不会因为后面的数据格式错误而回滚；
+    """
+    batch_size = batch_size or CONF.cpu_data_import_batch_size
+    total = 0
+    for chunk in read_chunks(fileobj):
+        kind, rows = chunk_rows(chunk, length)
+        for batch in _batches(rows, batch_size):
+            import_rows(kind, batch)
+            total += len(batch)
+    return total
@@ -0,0 +1,192 @@
+"""
+CPU历史数据的紧凑传输编码；
+
+主机/虚拟机的CPU历史数据（MHz整数列表）在RPC消息中以JSON列表的形式传输，
+每个数值约占5个字节；控制节点在一次调度过程中要为数百台主机拉取这些数据。
+这里采用差分 + zigzag + varint的编码方式，必要时再进行zlib压缩，最后用
+base64封装成字符串，使其可以直接放入JSON消息体中；
+注：编码只在RPC两端协商了支持的版本之后才会启用，见conductor/rpcapi.py和
+hosts/rpcapi.py；
+"""
+
+import base64
+import zlib
+
+import six
+
+from xdrs.openstack.common import jsonutils
+
+
+ENCODING = 'delta-varint-b64'
+
+_ENCODING_KEY = 'xdrs_cpu_data_encoding'
+_FORMAT_LIST = 'list'
+_FORMAT_JSON = 'json'
+
+# 数据过短时封装的开销会超过节省的字节数，此时不进行编码；
+_MIN_LENGTH = 32
+
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value):
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def pack(values):
+    """
+    把整数列表编码为差分varint字节串；
+    """
+    buf = bytearray()
+    previous = 0
+    for value in values:
+        delta = _zigzag(value - previous)
+        previous = value
+        while delta > 0x7f:
+            buf.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        buf.append(delta)
+    return bytes(buf)
+
+
+def unpack(data):
+    """
+    pack的逆过程；
+    """
+    values = []
+    previous = 0
+    shift = 0
+    delta = 0
+    for byte in bytearray(data):
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += _unzigzag(delta)
+        values.append(previous)
+        shift = 0
+        delta = 0
+    return values
+
+
+def _as_int_list(value):
+    """
+    返回可以无损编码的整数列表，否则返回None；
+    cpu_data既可能是整数列表，也可能是数据库中以JSON文本保存的列表；
+    """
+    if isinstance(value, six.string_types):
+        try:
+            value = jsonutils.loads(value)
+        except ValueError:
+            return None, None
+        fmt = _FORMAT_JSON
+    else:
+        fmt = _FORMAT_LIST
+
+    if not isinstance(value, (list, tuple)):
+        return None, None
+    for item in value:
+        if type(item) not in six.integer_types:
+            return None, None
+    return list(value), fmt
+
+
+def is_encoded(value):
+    return isinstance(value, dict) and _ENCODING_KEY in value
+
+
+def encode(value):
+    """
+    对一条CPU历史数据进行编码；无法无损编码的数据原样返回；
+    """
+    values, fmt = _as_int_list(value)
+    if values is None or len(values) < _MIN_LENGTH:
+        return value
+
+    packed = pack(values)
+    compressed = zlib.compress(packed)
+    use_zlib = len(compressed) < len(packed)
+    payload = compressed if use_zlib else packed
+    return {_ENCODING_KEY: ENCODING,
+            'format': fmt,
+            'zlib': use_zlib,
+            'data': base64.b64encode(payload).decode('ascii')}
+
+
+def decode(value):
+    """
+    encode的逆过程；未编码的数据原样返回；
+    """
+    if not is_encoded(value):
+        return value
+    if value[_ENCODING_KEY] != ENCODING:
+        raise ValueError('unknown cpu data encoding %s' %
+                         value[_ENCODING_KEY])
+
+    payload = base64.b64decode(value['data'])
+    if value.get('zlib'):
+        payload = zlib.decompress(payload)
+    values = unpack(payload)
+    if value.get('format') == _FORMAT_JSON:
+        return jsonutils.dumps(values)
+    return values
+
+
+def _row_to_dict(row):
+    if isinstance(row, dict):
+        return dict(row)
+    if hasattr(row, 'iteritems'):
+        return dict(row.iteritems())
+    return dict(row)
+
+
+def encode_rows(rows, encoding, key='cpu_data'):
+    """
+    对数据库记录（单条或列表）中的key字段进行编码；
+    encoding为None（对端未协商编码）时原样返回；
+    """
+    if not encoding or rows is None:
+        return rows
+    if encoding != ENCODING:
+        raise ValueError('unknown cpu data encoding %s' % encoding)
+
+    if isinstance(rows, (list, tuple)):
+        return [encode_rows(row, encoding, key) for row in rows]
+
+    row = _row_to_dict(rows)
+    if key in row:
+        row[key] = encode(row[key])
+    return row
+
+
+def decode_rows(rows, key='cpu_data'):
+    """
+    encode_rows的逆过程；
+    """
+    if isinstance(rows, (list, tuple)):
+        return [decode_rows(row, key) for row in rows]
+    if isinstance(rows, dict) and is_encoded(rows.get(key)):
+        rows = dict(rows)
+        rows[key] = decode(rows[key])
+    return rows
+
+
+def encode_row_map(mapping, encoding, key='cpu_data'):
+    """
+    对批量读取方法返回的{id: 记录}进行编码；
+    """
+    if not encoding or mapping is None:
+        return mapping
+    return dict((k, encode_rows(v, encoding, key))
+                for k, v in six.iteritems(mapping))
+
+
+def decode_row_map(mapping, key='cpu_data'):
+    """
+    encode_row_map的逆过程；
+    """
+    if mapping is None:
+        return mapping
+    return dict((k, decode_rows(v, key)) for k, v in six.iteritems(mapping))
@@ -0,0 +1,248 @@
+"""
+CPU历史数据的服务端降采样和统计；
+
+vms_cpu_data、hosts_cpu_data接口以前返回完整的cpu_data，控制台为了画一条
+很小的曲线或者计算一个平均值也要拉取完整的历史数据；这里由API服务在返回之前
+按照请求的查询参数（见api/openstack/common.py的get_cpu_data_query）处理：
+  start、end：时间范围；中央数据库中只保存了采样值，第i个采样的时间由记录的
+              更新时间和data_collector_interval推算
+              （end_time - (n - 1 - i) * interval），采集周期自适应调整时
+              （见hosts/adaptive_interval.py）是近似值；
+  points：返回的采样个数，downsample=lttb时按照Largest-Triangle-Three-Buckets
+          选取保留曲线形状的采样（cpu_data_index为其在原始数据中的位置），
+          downsample=minmax时把采样分成points个桶，返回每个桶的平均值、
+          最小值和最大值（cpu_data、cpu_data_min、cpu_data_max）；
+  stats：统计值，mean、min、max、std、count、slope（MHz/秒，最小二乘）、
+         pN（N为0-100的分位数）的逗号分隔列表，all表示mean、max、p50、p95、
+         p99和slope；
+统计值由时间范围内的全部采样计算，与降采样无关；
+"""
+
+import numpy
+import six
+
+from oslo.config import cfg
+
+from xdrs.openstack.common import jsonutils
+from xdrs.openstack.common import timeutils
+
+
+CONF = cfg.CONF
+CONF.import_opt('data_collector_interval', 'xdrs.service')
+
+LTTB = 'lttb'
+MINMAX = 'minmax'
+DOWNSAMPLE_METHODS = (LTTB, MINMAX)
+
+SIMPLE_STATS = ('count', 'mean', 'min', 'max', 'std', 'slope')
+DEFAULT_STATS = ('mean', 'max', 'p50', 'p95', 'p99', 'slope')
+
+# query在cpu_data之外增加的字段；
+QUERY_FIELDS = ('cpu_data_index', 'cpu_data_min', 'cpu_data_max', 'cpu_stats')
+
+
+def parse_stats(value):
+    """
+    解析stats参数，返回统计值名称的列表；无法识别的名称引发ValueError；
+    """
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if names == ['all']:
+        return list(DEFAULT_STATS)
+    for name in names:
+        if name in SIMPLE_STATS:
+            continue
+        if name.startswith('p'):
+            try:
+                percentile = float(name[1:])
+            except ValueError:
+                percentile = -1
+            if 0 <= percentile <= 100:
+                continue
+        raise ValueError(name)
+    return names
+
+
+def to_array(cpu_data):
+    """
+    cpu_data既可能是整数列表，也可能是数据库中以JSON文本保存的列表；
+    """
+    if not cpu_data:
+        return numpy.zeros(0)
+    if isinstance(cpu_data, six.string_types):
+        cpu_data = jsonutils.loads(cpu_data)
+    return numpy.asarray(cpu_data, dtype=float)
+
+
+def sample_times(length, interval):
+    """
+    返回length个采样相对于最后一个采样的时间（秒，最后一个采样为0）；
+    """
+    return (numpy.arange(length, dtype=float) - (length - 1)) * interval
+
+
+def select_range(length, end_time, interval, start=None, end=None):
+    """
+    返回start、end（datetime）时间范围内的采样的下标范围(first, last)；
+    """
+    first, last = 0, length
+    if end_time is None:
+        return first, last
+    offsets = sample_times(length, interval)
+    if start is not None:
+        first = int(numpy.searchsorted(
+            offsets, timeutils.delta_seconds(end_time, start), 'left'))
+    if end is not None:
+        last = int(numpy.searchsorted(
+            offsets, timeutils.delta_seconds(end_time, end), 'right'))
+    return first, max(first, last)
+
+
+def lttb(values, points):
+    """
+    Largest-Triangle-Three-Buckets降采样，返回保留的采样的下标；
+    第一个和最后一个采样总是保留，其余每个桶中选取与上一个保留的采样、
+    下一个桶的平均点组成的三角形面积最大的采样；
+    """
+    length = len(values)
+    if points >= length or length <= 2:
+        return numpy.arange(length)
+    if points < 3:
+        return numpy.array([0, length - 1])[:max(points, 1)]
+    every = float(length - 2) / (points - 2)
+    selected = numpy.zeros(points, dtype=int)
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, length)
+        if end >= next_end:
+            avg_x, avg_y = length - 1, values[-1]
+        else:
+            avg_x = (end + next_end - 1) / 2.0
+            avg_y = values[end:next_end].mean()
+        x = numpy.arange(start, end)
+        area = numpy.abs((a - avg_x) * (values[start:end] - values[a]) -
+                         (a - x) * (avg_y - values[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    selected[-1] = length - 1
+    return selected
+
+
+def minmax_buckets(values, points):
+    """
+    把采样分成points个桶，返回(每个桶第一个采样的下标, 平均值, 最小值, 最大值)；
+    """
+    if points >= len(values):
+        index = numpy.arange(len(values))
+        return index, values, values, values
+    buckets = numpy.array_split(values, points)
+    index = numpy.cumsum([0] + [len(bucket) for bucket in buckets[:-1]])
+    return (index,
+            numpy.array([bucket.mean() for bucket in buckets]),
+            numpy.array([bucket.min() for bucket in buckets]),
+            numpy.array([bucket.max() for bucket in buckets]))
+
+
+def statistics(values, names, interval):
+    """
+    计算names中的统计值，返回{name: value}；没有采样时统计值为None；
+    """
+    result = dict()
+    for name in names:
+        if name == 'count':
+            result[name] = len(values)
+        elif not len(values):
+            result[name] = None
+        elif name == 'mean':
+            result[name] = float(values.mean())
+        elif name == 'min':
+            result[name] = float(values.min())
+        elif name == 'max':
+            result[name] = float(values.max())
+        elif name == 'std':
+            result[name] = float(values.std())
+        elif name == 'slope':
+            result[name] = None if len(values) < 2 else float(numpy.polyfit(
+                numpy.arange(len(values)) * float(interval), values, 1)[0])
+        else:
+            result[name] = float(numpy.percentile(values, float(name[1:])))
+    return result
+
+
+def _as_number(value):
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def parse_time(value):
+    """
+    解析ISO 8601格式（UTC）的时间，无法解析时引发ValueError；
+    """
+    for fmt in (timeutils.PERFECT_TIME_FORMAT, '%Y-%m-%dT%H:%M:%S',
+                '%Y-%m-%dT%H:%M:%SZ'):
+        try:
+            return timeutils.parse_strtime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def row_end_time(row):
+    """
+    返回记录中最后一个采样的时间（记录的更新时间），未知时返回None；
+    """
+    end_time = row.get('updated_at') or row.get('created_at')
+    if isinstance(end_time, six.string_types):
+        try:
+            end_time = timeutils.parse_strtime(end_time)
+        except ValueError:
+            end_time = None
+    return end_time
+
+
+def query(cpu_data, start=None, end=None, points=None, downsample=LTTB,
+          stats=None, end_time=None, interval=None):
+    """
+    对一条CPU历史数据进行范围选择、降采样和统计，返回需要更新的字段：
+    {'cpu_data': [......], 'cpu_data_index': [......],
+     'cpu_data_min': [......], 'cpu_data_max': [......],
+     'cpu_stats': {......}}；
+    没有请求的字段不会出现在返回值中；
+    """
+    interval = interval or CONF.data_collector_interval
+    values = to_array(cpu_data)
+    length = len(values)
+    first, last = select_range(length, end_time, interval, start, end)
+    values = values[first:last]
+    result = dict()
+    if points:
+        if downsample == MINMAX:
+            index, avg, low, high = minmax_buckets(values, points)
+            result['cpu_data_min'] = [_as_number(v) for v in low]
+            result['cpu_data_max'] = [_as_number(v) for v in high]
+        else:
+            index = lttb(values, points)
+            avg = values[index]
+        result['cpu_data'] = [_as_number(v) for v in avg]
+        result['cpu_data_index'] = [int(i) + first for i in index]
+    elif (first, last) != (0, length):
+        result['cpu_data'] = [_as_number(v) for v in values]
+        result['cpu_data_index'] = list(range(first, last))
+    if stats:
+        result['cpu_stats'] = statistics(values, stats, interval)
+    return result
+
+
+def apply_query(rows, params):
+    """
+    对数据库记录（单条或列表）应用query，返回更新之后的记录（dict）；
+    params为空时原样返回；
+    """
+    if not params or rows is None:
+        return rows
+    if isinstance(rows, (list, tuple)):
+        return [apply_query(row, params) for row in rows]
+    row = dict(rows) if isinstance(rows, dict) else dict(rows.iteritems())
+    row.update(query(row.get('cpu_data'), end_time=row_end_time(row),
+                     **params))
+    return row
@@ -200,6 +200,15 @@ def vm_select_algorithm_in_used_get(self, context):
 def hosts_cpu_data_get_all(context):
     return IMPL.hosts_cpu_data_get_all(context)
 
+def hosts_cpu_data_get_page(context, marker=None, limit=None):
+    return IMPL.hosts_cpu_data_get_page(context, marker=marker, limit=limit)
+
+def hosts_cpu_data_get_by_ids(context, host_ids):
+    return IMPL.hosts_cpu_data_get_by_ids(context, host_ids)
+
+def hosts_meminfo_get_by_ids(context, host_ids):
+    return IMPL.hosts_meminfo_get_by_ids(context, host_ids)
+
 def host_cpu_data_create(context, values):
     """
     暂未实现调用；
@@ -277,6 +286,18 @@ def host_load_states_delete_by_id(context, id):
 def hosts_load_states_get_all(context):
     return IMPL.hosts_load_states_get_all(context)
 
+def hosts_load_states_get_by_ids(context, ids):
+    return IMPL.hosts_load_states_get_by_ids(context, ids)
+
+def host_state_report(context, report):
+    return IMPL.host_state_report(context, report)
+
+def samples_submit(context, batch):
+    return IMPL.samples_submit(context, batch)
+
+def cpu_data_import(context, kind, rows):
+    return IMPL.cpu_data_import(context, kind, rows)
+
 
 """
 ******************
@@ -313,6 +334,12 @@ def host_init_data_temp_get(self, context, host_uuid_temp):
 """
 def vms_cpu_data_get_all(self, context):
     return IMPL.vms_cpu_data_get_all(context)
+
+def vms_cpu_data_get_page(context, marker=None, limit=None):
+    return IMPL.vms_cpu_data_get_page(context, marker=marker, limit=limit)
+
+def vms_cpu_data_get_by_vm_ids(context, vm_ids):
+    return IMPL.vms_cpu_data_get_by_vm_ids(context, vm_ids)
             
 def vm_cpu_data_get_by_vm_id(self, context, vm_id):
     return IMPL.vm_cpu_data_get_by_vm_id(context, vm_id)
@@ -351,6 +378,28 @@ def vm_metadata_delete_by_id(context, id):
 def vm_metadata_create(self, context, vm_create_values):
     return IMPL.vm_metadata_create(context, vm_create_values)
 
+def vms_metadata_sync(context, vms, prune=False):
+    return IMPL.vms_metadata_sync(context, vms, prune=prune)
+
+def vms_metadata_get_by_host(context, host_name):
+    return IMPL.vms_metadata_get_by_host(context, host_name)
+
+
+
+"""
+******************
+* host_inventory *
+******************
+"""
+def hosts_inventory_sync(context, hosts):
+    return IMPL.hosts_inventory_sync(context, hosts)
+
+def hosts_inventory_get_all(context):
+    return IMPL.hosts_inventory_get_all(context)
+
+def hosts_inventory_get_enabled(context):
+    return IMPL.hosts_inventory_get_enabled(context)
+
 
 
 
@@ -361,6 +410,10 @@ def vm_metadata_create(self, context, vm_create_values):
 """
 def vms_migration_records_get_all(context):
     return IMPL.vms_migration_records_get_all(context)
+
+def vms_migration_records_get_page(context, marker=None, limit=None):
+    return IMPL.vms_migration_records_get_page(context, marker=marker,
+                                               limit=limit)
             
 def vm_migration_record_get_by_id(context, id):
     return IMPL.vm_migration_record_get_by_id(context, id)
@@ -1,9 +1,14 @@
+import datetime
+
 from sqlalchemy import or_
+from sqlalchemy.sql.expression import bindparam
 from oslo.config import cfg
 import xdrs.context
 from xdrs.db.sqlalchemy import models
 from xdrs.openstack.common.db.sqlalchemy import session as db_session
 from xdrs.openstack.common.db import exception as db_exc
+from xdrs.openstack.common import jsonutils
+from xdrs.openstack.common import timeutils
 from xdrs import exception
 
 
@@ -481,6 +486,68 @@ def hosts_cpu_data_get_all(context):
         raise exception.HostCpuDataNotFound()
     return hosts_cpu_data
 
+def _get_page(context, model, sort_key, marker=None, limit=None):
+    """
+    按主键顺序分页获取记录（keyset分页）；
+    注：marker为上一页最后一条记录的sort_key值，这样每次查询只需扫描
+    limit条记录，API层可以逐页流式输出大集合，而不需要一次性加载全表；
+    """
+    sort_column = getattr(model, sort_key)
+    query = model_query(context, model).order_by(sort_column)
+    if marker is not None:
+        query = query.filter(sort_column > marker)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+def hosts_cpu_data_get_page(context, marker=None, limit=None):
+    hosts_cpu_data = _get_page(context, models.HostCpuData, 'host_id',
+                               marker=marker, limit=limit)
+    if not hosts_cpu_data and marker is None:
+        raise exception.HostCpuDataNotFound()
+    return hosts_cpu_data
+
+# IN (...)列表过长时部分数据库的执行计划会退化，这里按批拆分；
+_IN_BATCH_SIZE = 500
+
+def _get_by_ids(context, model, key, ids, session=None, read_deleted=None):
+    """
+    按照key字段批量获取记录，返回{key值: 记录}；
+    注：每_IN_BATCH_SIZE个id执行一次IN (...)查询，不存在的id不出现在结果中；
+    """
+    ids = list(set(ids or []))
+    column = getattr(model, key)
+    result = dict()
+    for start in range(0, len(ids), _IN_BATCH_SIZE):
+        rows = model_query(context, model, session=session,
+                           read_deleted=read_deleted).\
+                    filter(column.in_(ids[start:start + _IN_BATCH_SIZE])).\
+                    all()
+        for row in rows:
+            result[row[key]] = row
+    return result
+
+def hosts_cpu_data_get_by_ids(context, host_ids):
+    return _get_by_ids(context, models.HostCpuData, 'host_id', host_ids)
+
+def hosts_meminfo_get_by_ids(context, host_ids):
+    """
+    从HostCpuData中批量获取主机的内存信息（数据采集上报的total_ram和free_ram，MB），
+    返回{host_id: {'MemTotal': XXX, 'MemFree': XXX}}；
+    注：上报的记录可能只有host_name，按host_id没有找到的主机再按host_name查找；
+    还没有上报过内存信息的主机不出现在结果中；
+    """
+    host_ids = list(set(host_ids or []))
+    rows = _get_by_ids(context, models.HostCpuData, 'host_id', host_ids)
+    missing = [host_id for host_id in host_ids if host_id not in rows]
+    if missing:
+        rows.update(_get_by_ids(context, models.HostCpuData, 'host_name',
+                                missing))
+    return dict((host_id, {'MemTotal': row['total_ram'],
+                           'MemFree': row['free_ram']})
+                for host_id, row in rows.items()
+                if row['total_ram'] is not None)
+
 def host_cpu_data_get_by_id(context, host_id):
     host_cpu_data = model_query(context, models.HostCpuData).\
                         filter_by(host_id = host_id).\
@@ -633,6 +700,214 @@ def hosts_load_states_get_all(context):
         raise exception.HostLoadStateNotFound()
     return hosts_task_states
 
+def hosts_load_states_get_by_ids(context, ids):
+    return _get_by_ids(context, models.HostLoadState, 'id', ids)
+
+# 上报消息中的键 --> (数据表, 字段)；
+_HOST_STATE_COLUMNS = (
+    ('load_state', models.HostLoadState, 'host_load_state'),
+    ('task_state', models.HostTaskState, 'host_task_state'),
+    ('running_state', models.HostRunningState, 'host_running_state'),
+)
+
+# HostCpuData中有<resource>_data字段的资源（见hosts/resource_stats.py）；
+_HOST_RESOURCES = ('ram', 'net', 'disk')
+
+def _host_row_get_or_create(context, model, host_name, session):
+    row = model_query(context, model, session=session).\
+                        filter_by(host_name = host_name).\
+                        first()
+    if row is None:
+        row = model()
+        row.update({'host_name': host_name})
+        session.add(row)
+    return row
+
+def _append_samples(row, column, samples, length):
+    """
+    把samples追加到记录row的column字段（JSON列表）之后，保留最新的length个；
+    """
+    data = jsonutils.loads(row[column] or '[]') + samples
+    return data[-length:]
+
+def _host_samples_append(context, report, session):
+    """
+    把主机的cpu_samples、resource_samples和meminfo写入HostCpuData（见host_state_report）；
+    """
+    columns = dict(('%s_data' % resource, samples) for resource, samples
+                   in report.get('resource_samples', {}).items()
+                   if resource in _HOST_RESOURCES and samples)
+    if report.get('cpu_samples'):
+        columns['cpu_data'] = report['cpu_samples']
+    meminfo = report.get('meminfo')
+    cpu_sketch = report.get('cpu_sketch')
+    if not columns and not meminfo and not cpu_sketch:
+        return
+    row = _host_row_get_or_create(context, models.HostCpuData,
+                                  report['host_name'], session)
+    values = dict()
+    for column, samples in columns.items():
+        data = _append_samples(row, column, samples,
+                               report['cpu_data_length'])
+        values[column] = jsonutils.dumps(data)
+        if column == 'cpu_data':
+            values['data_len'] = len(data)
+    if meminfo:
+        values['total_ram'] = meminfo['MemTotal']
+        values['free_ram'] = meminfo['MemFree']
+    if report.get('host_id') is not None:
+        values['host_id'] = report['host_id']
+    if cpu_sketch:
+        values['cpu_sketch'] = jsonutils.dumps(cpu_sketch)
+    row.update(values)
+
+def host_state_report(context, report):
+    """
+    在一个事务中写入一个主机合并上报的所有状态（见hosts/reporter.py）；
+    report = {'host_name': XXX,
+              'load_state': XXX, 'task_state': XXX, 'running_state': XXX,
+              'cpu_samples': [XXX, ......], 'cpu_data_length': XXX,
+              'resource_samples': {'ram': [XXX, ......], ......},
+              'meminfo': {'MemTotal': XXX, 'MemFree': XXX},
+              'service_ids': [XXX, ......]}
+    除host_name外的键都是可选的；状态记录按照host_name插入或更新，
+    cpu_samples追加到HostCpuData的cpu_data之后并保留最新的cpu_data_length个，
+    resource_samples中的每种采样同样追加到HostCpuData的<resource>_data之后，
+    meminfo写入HostCpuData的total_ram和free_ram，
+    service_ids中的服务记录report_count加1（心跳）；
+    """
+    host_name = report['host_name']
+    session = get_session()
+    with session.begin():
+        for key, model, column in _HOST_STATE_COLUMNS:
+            if key in report:
+                row = _host_row_get_or_create(context, model, host_name,
+                                              session)
+                if row[column] != report[key]:
+                    row.update({column: report[key]})
+
+        _host_samples_append(context, report, session)
+
+        service_ids = report.get('service_ids')
+        if service_ids:
+            model_query(context, models.Service, session=session).\
+                        filter(models.Service.id.in_(service_ids)).\
+                        update({'report_count': models.Service.report_count + 1,
+                                'updated_at': timeutils.utcnow()},
+                               synchronize_session=False)
+
+def _host_id_get_by_name(context, host_name, session):
+    """
+    返回主机初始化数据（HostInitData）中记录的host_id，没有记录时返回None；
+    """
+    row = model_query(context, models.HostInitData, session=session).\
+                        filter_by(host_name = host_name).\
+                        first()
+    return row['host_id'] if row is not None else None
+
+def samples_submit(context, batch):
+    """
+    在一个事务中写入一个主机数据采集的一批采样（见hosts/sample_submitter.py）；
+    batch = {'host_name': XXX, 'cpu_data_length': XXX,
+             'cpu_samples': [XXX, ......],
+             'resource_samples': {'ram': [XXX, ......], ......},
+             'meminfo': {'MemTotal': XXX, 'MemFree': XXX},
+             'cpu_sketch': {......},
+             'vm_samples': {vm_uuid: [XXX, ......], ......},
+             'vm_percentiles': {vm_uuid: {'p50': XXX, ......}, ......}}
+    主机的采样写入HostCpuData（同host_state_report），cpu_sketch写入HostCpuData
+    的cpu_sketch；vm_samples中每个虚拟机实例的采样追加到VmCpuData的cpu_data之后，
+    vm_percentiles写入VmCpuData的cpu_percentiles；
+    虚拟机实例按照vm_uuid匹配记录，记录不存在时创建（vm_id自动生成）；
+    HostCpuData和VmCpuData的host_id取自提交采样的主机的HostInitData；
+    """
+    session = get_session()
+    with session.begin():
+        host_id = _host_id_get_by_name(context, batch['host_name'], session)
+        _host_samples_append(context, dict(batch, host_id=host_id), session)
+
+        vm_samples = batch.get('vm_samples') or dict()
+        vm_percentiles = batch.get('vm_percentiles') or dict()
+        vm_uuids = set(vm_samples) | set(vm_percentiles)
+        if not vm_uuids:
+            return
+        rows = _get_by_ids(context, models.VmCpuData, 'vm_uuid', vm_uuids,
+                           session=session)
+        for vm_uuid in vm_uuids:
+            row = rows.get(vm_uuid)
+            if row is None:
+                row = models.VmCpuData()
+                row.update({'vm_uuid': vm_uuid})
+                session.add(row)
+            values = {'host_name': batch['host_name']}
+            if host_id is not None:
+                values['host_id'] = host_id
+            if vm_uuid in vm_samples:
+                data = _append_samples(row, 'cpu_data', vm_samples[vm_uuid],
+                                       batch['cpu_data_length'])
+                values['cpu_data'] = jsonutils.dumps(data)
+                values['data_len'] = len(data)
+            if vm_uuid in vm_percentiles:
+                values['cpu_percentiles'] = jsonutils.dumps(
+                    vm_percentiles[vm_uuid])
+            row.update(values)
+
+
+# 导入的序列 --> (数据表, 匹配已有记录的字段)；
+_CPU_DATA_IMPORT_TABLES = {
+    'vms': (models.VmCpuData, 'vm_id'),
+    'hosts': (models.HostCpuData, 'host_name'),
+}
+
+def cpu_data_import(context, kind, rows):
+    """
+    在一个事务中批量导入一种CPU历史数据（见xdrs/cpu_data_archive.py）；
+    kind为vms或者hosts；
+    rows = [{'vm_id'或者'host_id': XXX, 'host_name': XXX,
+             'cpu_data': [XXX, ......], 'end_time': XXX,
+             'host_id': XXX, 'vm_uuid': XXX}, ......]
+    虚拟机实例按照vm_id、主机按照host_name匹配已有的记录，已有记录的cpu_data
+    被替换为导入的采样（已经软删除的记录同时被恢复），
+    updated_at设置为end_time（最后一个采样的UNIX时间，未知时为当前时间）；
+    每种写入只执行一次executemany的insert或者update；返回导入的记录数；
+    """
+    model, key = _CPU_DATA_IMPORT_TABLES[kind]
+    table = model.__table__
+    now = timeutils.utcnow()
+    values = []
+    for row in rows:
+        value = dict((column, row[column])
+                     for column in ('vm_id', 'vm_uuid', 'host_id', 'host_name')
+                     if column in row)
+        value['cpu_data'] = jsonutils.dumps(row['cpu_data'])
+        value['data_len'] = len(row['cpu_data'])
+        end_time = row.get('end_time')
+        value['updated_at'] = (now if end_time is None else
+                               datetime.datetime.utcfromtimestamp(end_time))
+        values.append(value)
+
+    session = get_session()
+    with session.begin():
+        existing = _get_by_ids(context, model, key,
+                               [item[key] for item in values],
+                               session=session, read_deleted='yes')
+        inserts = [item for item in values if item[key] not in existing]
+        updates = [dict(('b_%s' % column, data) for column, data
+                        in dict(item, deleted=0, deleted_at=None).items())
+                   for item in values if item[key] in existing]
+        if inserts:
+            session.execute(table.insert(), inserts)
+        if updates:
+            columns = [column for column in updates[0]
+                       if column != 'b_%s' % key]
+            session.execute(
+                table.update().
+                where(table.c[key] == bindparam('b_%s' % key)).
+                values(dict((column[2:], bindparam(column))
+                            for column in columns)),
+                updates)
+    return len(values)
+
 
 
 """
@@ -715,6 +990,16 @@ def vms_cpu_data_get_all(self, context):
     if not vms_cpu_data:
         raise exception.VmCpuDataNotFound()
     return vms_cpu_data
+
+def vms_cpu_data_get_page(context, marker=None, limit=None):
+    vms_cpu_data = _get_page(context, models.VmCpuData, 'vm_id',
+                             marker=marker, limit=limit)
+    if not vms_cpu_data and marker is None:
+        raise exception.VmCpuDataNotFound()
+    return vms_cpu_data
+
+def vms_cpu_data_get_by_vm_ids(context, vm_ids):
+    return _get_by_ids(context, models.VmCpuData, 'vm_id', vm_ids)
             
 def vm_cpu_data_get_by_vm_id(self, context, vm_id):
     vm_cpu_date = model_query(context, models.VmCpuData).\
@@ -800,6 +1085,106 @@ def vm_metadata_create(self, context, vm_create_values):
     vm_metadata.update(vm_state)
     vm_metadata.save()
     return vm_metadata
+
+def vms_metadata_sync(context, vms, prune=False):
+    """
+    按照vm_id把nova中的虚拟机信息同步到vm_metadata中（一个事务）；
+    vms = [{'vm_id': XXX, 'host_name': XXX, 'vm_state': XXX, ......,
+            'deleted': False}, ......]
+    deleted为True的虚拟机删除其记录；prune为True（全量同步）时，
+    删除所有不在vms中的记录；
+    返回{'created': N, 'updated': N, 'deleted': N}；
+    """
+    vms = dict((vm['vm_id'], vm) for vm in vms)
+    counts = {'created': 0, 'updated': 0, 'deleted': 0}
+    now = timeutils.utcnow()
+    session = get_session()
+    with session.begin():
+        existing = dict()
+        if prune:
+            rows = model_query(context, models.VmMetadata,
+                               session=session).all()
+        else:
+            vm_ids = list(vms)
+            rows = []
+            for start in range(0, len(vm_ids), _IN_BATCH_SIZE):
+                rows.extend(model_query(context, models.VmMetadata,
+                                        session=session).
+                            filter(models.VmMetadata.vm_id.in_(
+                                vm_ids[start:start + _IN_BATCH_SIZE])).
+                            all())
+        for row in rows:
+            existing[row['vm_id']] = row
+
+        for vm_id, row in existing.items():
+            vm = vms.get(vm_id)
+            if (vm is None and prune) or (vm is not None and
+                                          vm.get('deleted')):
+                row.update({'deleted': row['id'], 'deleted_at': now})
+                counts['deleted'] += 1
+
+        for vm_id, vm in vms.items():
+            if vm.get('deleted'):
+                continue
+            values = dict((k, v) for k, v in vm.items() if k != 'deleted')
+            row = existing.get(vm_id)
+            if row is None:
+                row = models.VmMetadata()
+                row.update(values)
+                session.add(row)
+                counts['created'] += 1
+            elif any(row[k] != v for k, v in values.items()):
+                row.update(values)
+                counts['updated'] += 1
+    return counts
+
+def vms_metadata_get_by_host(context, host_name):
+    return model_query(context, models.VmMetadata).\
+                        filter_by(host_name = host_name).\
+                        all()
+
+
+
+"""
+******************
+* host_inventory *
+******************
+"""
+def hosts_inventory_sync(context, hosts):
+    """
+    用nova中计算节点的清单替换host_inventory中的记录（一个事务）；
+    hosts = [{'host_name': XXX, 'status': 'enabled', 'state': 'up', ......}, ......]
+    """
+    hosts = dict((host['host_name'], host) for host in hosts)
+    now = timeutils.utcnow()
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, models.HostInventory,
+                           session=session).all()
+        for row in rows:
+            host = hosts.pop(row['host_name'], None)
+            if host is None:
+                row.update({'deleted': row['id'], 'deleted_at': now})
+            elif any(row[k] != v for k, v in host.items()):
+                row.update(host)
+        for host in hosts.values():
+            row = models.HostInventory()
+            row.update(host)
+            session.add(row)
+
+def hosts_inventory_get_all(context):
+    return model_query(context, models.HostInventory).all()
+
+def hosts_inventory_get_enabled(context):
+    """
+    获取nova中可用（服务启用并且在线）的计算节点名称列表；
+    """
+    rows = model_query(context, models.HostInventory.host_name,
+                       base_model=models.HostInventory).\
+                        filter(models.HostInventory.status == 'enabled').\
+                        filter(models.HostInventory.state == 'up').\
+                        all()
+    return [row[0] for row in rows]
  
 
 
@@ -814,6 +1199,13 @@ def vms_migration_records_get_all(context):
     if not vms_migration_records:
         raise exception.VmMigrationRecordNotFound()
     return vms_migration_records
+
+def vms_migration_records_get_page(context, marker=None, limit=None):
+    vms_migration_records = _get_page(context, models.VmMigrationRecord, 'id',
+                                      marker=marker, limit=limit)
+    if not vms_migration_records and marker is None:
+        raise exception.VmMigrationRecordNotFound()
+    return vms_migration_records
             
 def vm_migration_record_get_by_id(context, id):
     vm_migration_record = model_query(context, models.VmMigrationRecord).\
@@ -45,19 +45,51 @@ class Service(BASE, XdrsBase):
     topic = Column(String(255))
     disabled = Column(Boolean, default=False)
     disabled_reason = Column(String(255))
+    report_count = Column(Integer, nullable=False, default=0)
     
     
 class VmMetadata(BASE, XdrsBase):
+    """
+    虚拟机实例的元数据，由vms.inventory与nova保持同步；
+    注：vm_id和host_name上建有索引，用于按虚拟机和按主机的查询；
+    """
     
     __tablename__ = 'vm_metadata'
-    __table_args__ = ()
+    __table_args__ = (
+        schema.Index('vm_metadata_vm_id_idx', 'vm_id'),
+        schema.Index('vm_metadata_host_name_idx', 'host_name'),
+        )
     
     id = Column(Integer, primary_key=True)
+    vm_id = Column(String(36))
     user_id = Column(String(255))
     project_id = Column(String(255))
     vm_state = Column(String(255))
     host_name = Column(String(255))
     host_id = Column(String(255))
+    nova_updated_at = Column(DateTime)
+    
+
+class HostInventory(BASE, XdrsBase):
+    """
+    nova中计算节点的清单（nova-compute服务状态和hypervisor资源），
+    由vms.inventory与nova保持同步；
+    """
+    
+    __tablename__ = 'host_inventory'
+    __table_args__ = (
+        schema.Index('host_inventory_host_name_idx', 'host_name'),
+        )
+    
+    id = Column(Integer, primary_key=True)
+    host_name = Column(String(255))
+    hypervisor_hostname = Column(String(255))
+    hypervisor_id = Column(Integer)
+    status = Column(String(255))
+    state = Column(String(255))
+    vcpus = Column(Integer)
+    memory_mb = Column(Integer)
+    running_vms = Column(Integer)
     
 
 class VmMigrationRecord(BASE, XdrsBase):
@@ -110,10 +142,14 @@ class VmCpuData(BASE, XdrsBase):
     __table_args__ = ()
     
     vm_id = Column(Integer, primary_key=True)
+    # 虚拟机实例的UUID，数据采集提交的采样按照它匹配记录（见db.samples_submit）；
+    vm_uuid = Column(String(36))
     host_id = Column(String(255))
     host_name = Column(String(255))
     data_len = Column(Integer)
     cpu_data = Column(UnicodeText)
+    # 数据采集的分位数草图计算的CPU MHz分位数{'p50', 'p95', 'p99'}（JSON）；
+    cpu_percentiles = Column(UnicodeText)
     delete_reason = Column(UnicodeText)
     
 
@@ -125,6 +161,15 @@ class HostCpuData(BASE, XdrsBase):
     host_id = Column(String(255))
     data_len = Column(Integer)
     cpu_data = Column(UnicodeText)
+    # 与cpu_data长度相同的内存使用（MB）、网络和磁盘I/O速率（KB/s）序列（JSON）；
+    ram_data = Column(UnicodeText)
+    net_data = Column(UnicodeText)
+    disk_data = Column(UnicodeText)
+    # 最近一次上报的主机内存（MB）；
+    total_ram = Column(Integer)
+    free_ram = Column(Integer)
+    # 主机总的CPU MHz的分位数草图（序列化的KLLSketch，JSON），可以合并；
+    cpu_sketch = Column(UnicodeText)
     delete_reason = Column(UnicodeText)
 
 
@@ -210,6 +255,8 @@ class HostInitData(BASE, XdrsBase):
     previous_time = Column(UnicodeText)
     previous_cpu_time = Column(UnicodeText)
     previous_cpu_mhz = Column(UnicodeText)
+    # 上一个周期的内存、网络和磁盘I/O累计值（JSON，见hosts/resource_stats.py）；
+    previous_counters = Column(UnicodeText)
     previous_host_cpu_time_total = Column(UnicodeText)
     previous_host_cpu_time_busy = Column(UnicodeText)
     previous_overload = Column(UnicodeText)
@@ -0,0 +1,74 @@
+"""
+API请求的截止时间（deadline）；
+
+API中间件在请求开始时设置截止时间，处理请求过程中的conductor远程调用
+（见conductor.rpcapi）用剩余时间作为RPC超时时间，超过截止时间的请求不再
+发起新的调用，直接返回503，而不是继续占用worker的green thread；
+
+注：截止时间保存在green thread本地变量中，一个请求由一个green thread处理，
+不需要在各层方法之间传递；
+批量导入、导出这类耗时与数据量成正比的请求用exempt标记，不受截止时间限制，
+其中每个conductor调用仍然使用默认的RPC超时时间；
+"""
+
+import contextlib
+import functools
+import time
+
+from eventlet import corolocal
+
+
+_local = corolocal.local()
+
+
+def set_timeout(timeout):
+    """
+    设置当前green thread的截止时间为timeout秒之后；timeout为None时清除；
+    """
+    if timeout is None:
+        _local.deadline = None
+    else:
+        _local.deadline = (time.time() + timeout, timeout)
+
+
+def clear():
+    _local.deadline = None
+
+
+def remaining():
+    """
+    返回距离截止时间的剩余秒数，没有设置截止时间时返回None；
+    """
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is None:
+        return None
+    return deadline[0] - time.time()
+
+
+def timeout():
+    """
+    返回设置截止时间时使用的超时秒数，没有设置截止时间时返回None；
+    """
+    deadline = getattr(_local, 'deadline', None)
+    return deadline[1] if deadline is not None else None
+
+
+@contextlib.contextmanager
+def deadline(timeout):
+    set_timeout(timeout)
+    try:
+        yield
+    finally:
+        clear()
+
+
+def exempt(func):
+    """
+    标记不受截止时间限制的API方法：调用之前清除当前请求的截止时间；
+    注：分块输出的响应在同一个green thread中迭代，输出期间同样没有截止时间；
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        clear()
+        return func(*args, **kwargs)
+    return wrapper
@@ -200,6 +200,22 @@ class PasteAppNotFound(XdrsException):
     msg_fmt = _("Could not load paste app '%(name)s' from %(path)s")
 
 
+class ServiceUnavailable(XdrsException):
+    msg_fmt = _("The service is overloaded, please retry later.")
+    code = 503
+    headers = {'Retry-After': '1'}
+    safe = True
+
+
+class RequestDeadlineExceeded(ServiceUnavailable):
+    msg_fmt = _("The request could not be completed within %(timeout)s "
+                "seconds.")
+
+
+class ConductorOverloaded(ServiceUnavailable):
+    msg_fmt = _("Too many conductor calls in flight (%(limit)s).")
+
+
 class NodeNotFound(NotFound):
     msg_fmt = _("Node %(node_id)s could not be found.")
 
@@ -0,0 +1,122 @@
+"""
+数据采集周期的自适应调整；
+
+数据采集以前对所有主机使用同一个固定的周期，空闲、平稳的主机和利用率剧烈变化的
+主机采样一样频繁；这里每个主机根据最近的主机CPU利用率在
+[data_collector_min_interval, data_collector_max_interval]之间调整自己的采集周期：
+  volatility：最近data_collector_adaptive_window个利用率的标准差与
+              data_collector_volatility_reference之比；
+  proximity：最新的利用率距离过载阈值不足data_collector_headroom_reference时，
+             按照距离线性地增大到1；
+  urgency = min(1, max(volatility, proximity))，
+  目标周期 = max_interval - urgency * (max_interval - min_interval)；
+目标周期较短时立即缩短周期，较长时每次最多延长为原来的
+data_collector_interval_growth倍，避免偶然平稳的一个采样使周期立即跳到最长；
+
+采样之间的时间间隔不再相同，数据采集把每个主机采样的时间保存在
+<local_data_directory>/host_time中，负载检测据此计算每个采样代表的时间长度
+（time_steps）传给检测算法（见xdrs.algorithms.time_series）；
+data_collector_min_interval为0时不进行调整；
+"""
+
+import collections
+import math
+
+from oslo.config import cfg
+
+
+adaptive_interval_opts = [
+    cfg.IntOpt('data_collector_min_interval',
+               default=0,
+               help='Shortest data collection period in seconds the '
+                    'collector adapts to on volatile or nearly overloaded '
+                    'hosts; 0 disables the adaptation'),
+    cfg.IntOpt('data_collector_max_interval',
+               default=0,
+               help='Longest data collection period in seconds the '
+                    'collector adapts to on quiet hosts; 0 means the '
+                    'configured collection interval'),
+    cfg.IntOpt('data_collector_adaptive_window',
+               default=10,
+               help='Number of recent host utilization samples used to '
+                    'estimate their volatility'),
+    cfg.FloatOpt('data_collector_volatility_reference',
+                 default=0.1,
+                 help='Standard deviation of the host CPU utilization '
+                      '(0-1) at which the collector samples at the '
+                      'shortest period'),
+    cfg.FloatOpt('data_collector_headroom_reference',
+                 default=0.2,
+                 help='Distance of the host CPU utilization to the overload '
+                      'threshold below which the period is shortened'),
+    cfg.FloatOpt('data_collector_interval_growth',
+                 default=1.5,
+                 help='Maximum factor by which the period grows between '
+                      'two collections'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(adaptive_interval_opts)
+CONF.import_opt('data_collector_interval', 'xdrs.service')
+
+
+class AdaptiveInterval(object):
+
+    def __init__(self, interval, min_interval=None, max_interval=None):
+        self.min_interval = CONF.data_collector_min_interval \
+            if min_interval is None else min_interval
+        self.max_interval = (CONF.data_collector_max_interval
+                             if max_interval is None else max_interval) or \
+            interval
+        self.enabled = 0 < self.min_interval < self.max_interval
+        self.interval = interval
+        if self.enabled:
+            self.interval = min(max(interval, self.min_interval),
+                                self.max_interval)
+        self._samples = collections.deque(
+            maxlen=max(2, CONF.data_collector_adaptive_window))
+
+    def urgency(self, threshold):
+        """
+        返回0（平稳、远离过载阈值）到1（剧烈变化或者接近过载阈值）之间的值；
+        """
+        samples = list(self._samples)
+        mean = float(sum(samples)) / len(samples)
+        deviation = math.sqrt(sum((x - mean) ** 2 for x in samples) /
+                              len(samples))
+        volatility = deviation / CONF.data_collector_volatility_reference
+        headroom = threshold - samples[-1]
+        proximity = 1 - headroom / CONF.data_collector_headroom_reference
+        return min(1.0, max(0.0, volatility, proximity))
+
+    def update(self, utilization, threshold):
+        """
+        记录一个主机CPU利用率（0-1）采样，返回下一个采集周期（秒）；
+        threshold：主机的过载阈值；
+        """
+        self._samples.append(utilization)
+        if not self.enabled:
+            return self.interval
+        target = self.max_interval - self.urgency(threshold) * \
+            (self.max_interval - self.min_interval)
+        if target > self.interval:
+            target = min(target,
+                         self.interval * CONF.data_collector_interval_growth)
+        self.interval = int(round(min(max(target, self.min_interval),
+                                      self.max_interval)))
+        return self.interval
+
+
+_CONTROLLER = None
+
+
+def get_controller(interval=None):
+    """
+    返回本进程的采集周期控制器；第一次调用时创建，
+    interval为None时使用data_collector_interval；
+    """
+    global _CONTROLLER
+    if _CONTROLLER is None:
+        _CONTROLLER = AdaptiveInterval(interval or
+                                       CONF.data_collector_interval)
+    return _CONTROLLER
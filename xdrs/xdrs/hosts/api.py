@@ -7,6 +7,7 @@ import functools
 from webob import exc
 
 from oslo.config import cfg
+from xdrs.compute import nova
 from xdrs.hosts import rpcapi as hosts_rpcapi
 from xdrs.hosts import manager as manager
 from xdrs import vms
@@ -21,6 +22,16 @@ wrap_exception = functools.partial(exception.wrap_exception,
                                    get_notifier=get_notifier)
 
 CONF = cfg.CONF
+CONF.import_opt('data_collector_interval', 'xdrs.service')
+
+
+def _meminfo_mb(meminfo):
+    """
+    把get_meminfo_by_id返回的/proc/meminfo字段（如'16314252 kB'）转换为
+    与HostCpuData的total_ram、free_ram相同的单位（MB）；
+    """
+    return dict((key, int(meminfo[key].split()[0]) // 1024)
+                for key in ('MemTotal', 'MemFree'))
 
 
 def check_instance_state(vm_state=None, task_state=(None,),
@@ -352,12 +363,39 @@ class API(base.Base):
             context = context.get_admin_context()
             
         return self.manager.get_all_host_cpu_data(context)
+
+    def get_hosts_cpu_data_page(self, context, marker=None, limit=None):
+        return self.manager.get_hosts_cpu_data_page(context, marker=marker,
+                                                    limit=limit)
     
     def get_host_cpu_data_by_id(self, context=None, id):
         if context is None:
             context = context.get_admin_context()
     
         return self.manager.get_host_cpu_data_by_id(context, id)
+
+    def get_hosts_cpu_data(self, context, host_ids):
+        """
+        批量获取主机的CPU数据，返回{host_id: host_cpu_data}；
+        """
+        return self.manager.get_hosts_cpu_data(context, host_ids)
+
+    def get_hosts_meminfo(self, context, host_ids):
+        """
+        批量获取主机的内存信息，返回{host_id: {'MemTotal': XXX, 'MemFree': XXX}}（MB）；
+        注：内存信息由数据采集上报到HostCpuData的total_ram和free_ram中，
+        还没有上报过的主机通过一次scatter-gather并发读取/proc/meminfo，
+        未能应答的主机不出现在结果中；
+        """
+        hosts_meminfo = self.manager.get_hosts_meminfo(context, host_ids)
+        missing = [host_id for host_id in host_ids
+                   if host_id not in hosts_meminfo]
+        if missing:
+            for host_id, meminfo in self.gather_meminfo(context,
+                                                        missing).items():
+                if not hosts_rpcapi.is_host_call_error(meminfo):
+                    hosts_meminfo[host_id] = _meminfo_mb(meminfo)
+        return hosts_meminfo
     
     def create_host_cpu_data_temp_by_id(self, context=None, update_values, host_uuid):
         if context is None:
@@ -383,6 +421,13 @@ class API(base.Base):
         
         return self.hosts_rpcapi.compute_host_cpu_mhz(context, host_uuid_temp)
     
+    def gather_host_cpu_mhz(self, context, host_uuids, timeout=None):
+        """
+        并发获取多个主机当前的CPU使用数据（MHz）；
+        返回{host_uuid: host_cpu_mhz}，未能应答的主机对应hosts.rpcapi.HostCallError；
+        """
+        return self.hosts_rpcapi.gather_host_cpu_mhz(context, host_uuids, timeout)
+    
     
     
     """
@@ -467,6 +512,36 @@ class API(base.Base):
             context = context.get_admin_context()
         
         return self.manager.get_all_hosts_load_states_sorted_list(context)
+
+    def get_hosts_load_states(self, context, ids):
+        """
+        批量获取主机的负载状态，返回{id: host_load_state}；
+        """
+        return self.manager.get_hosts_load_states(context, ids)
+
+    def get_enabled_hosts(self, context):
+        """
+        从本地清单host_inventory获取nova中可用的计算节点名称列表；
+        """
+        return self.manager.get_enabled_hosts(context)
+
+    def get_nova_hosts(self, context):
+        """
+        返回nova中的计算节点名称（nova-compute服务的host）列表；
+        优先从本地清单host_inventory中获取，本地清单为空（没有同步）时才调用nova API，
+        两种方式返回的都是服务的host，而不是hypervisor_hostname；
+        """
+        return (self.get_enabled_hosts(context) or
+                nova.list_hypervisor_hosts(context))
+
+    def get_schedule_slots(self, context, interval=None):
+        """
+        返回可用的计算节点的数据采集时间点在interval（默认为
+        data_collector_interval）中的分布，见xdrs.hosts.schedule；
+        """
+        if interval is None:
+            interval = CONF.data_collector_interval
+        return self.manager.get_schedule_slots(context, interval)
     
     
     
@@ -529,12 +604,37 @@ class API(base.Base):
             context = context.get_admin_context()
         
         return self.manager.get_all_vms_cpu_data(context)
+
+    def get_vms_cpu_data_page(self, context, marker=None, limit=None):
+        return self.manager.get_vms_cpu_data_page(context, marker=marker,
+                                                  limit=limit)
+
+    def export_cpu_data(self, context, kind, start=None, end=None,
+                        compress=False):
+        """
+        导出一种（vms或者hosts）CPU历史数据，返回bytes的迭代器，
+        格式见xdrs/cpu_data_archive.py；
+        """
+        return self.manager.export_cpu_data(context, kind, start=start,
+                                            end=end, compress=compress)
+
+    def import_cpu_data(self, context, fileobj):
+        """
+        批量导入export_cpu_data导出的CPU历史数据，返回导入的序列数；
+        """
+        return self.manager.import_cpu_data(context, fileobj)
             
     def get_vm_cpu_data_by_vm_id(self, context=None, vm_id):
         if context is None:
             context = context.get_admin_context()
         
         return self.manager.get_vm_cpu_data_by_vm_id(context, vm_id)
+
+    def get_vms_cpu_data(self, context, vm_ids):
+        """
+        批量获取虚拟机的CPU数据，返回{vm_id: vm_cpu_data}；
+        """
+        return self.manager.get_vms_cpu_data(context, vm_ids)
             
     def delete_vm_cpu_data_by_vm_id(self, context=None, vm_id):
         if context is None:
@@ -575,6 +675,13 @@ class API(base.Base):
         
         return self.hosts_rpcapi.get_meminfo_by_id(context, id)
     
+    def gather_meminfo(self, context, host_ids, timeout=None):
+        """
+        并发获取多个主机的/proc/meminfo信息；
+        返回{host_id: meminfo}，未能应答的主机对应hosts.rpcapi.HostCallError；
+        """
+        return self.hosts_rpcapi.gather_meminfo(context, host_ids, timeout)
+    
     
     """
     *******************
@@ -585,7 +692,15 @@ class API(base.Base):
         if context is None:
             context = context.get_admin_context()
         
-        return self.hosts_rpcapi.get_meminfo_by_id(context, vms_list, host_uuid)
+        return self.hosts_rpcapi.get_vms_ram_on_specific(context, vms_list, host_uuid)
+    
+    def gather_vms_ram(self, context, hosts_vms, timeout=None):
+        """
+        并发获取多个主机上虚拟机实例的RAM值；
+        hosts_vms：{host_uuid: vms_list}；
+        返回{host_uuid: vms_ram}，未能应答的主机对应hosts.rpcapi.HostCallError；
+        """
+        return self.hosts_rpcapi.gather_vms_ram(context, hosts_vms, timeout)
     
     
     
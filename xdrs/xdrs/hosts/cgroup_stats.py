@@ -0,0 +1,286 @@
+"""
+直接从cgroup文件系统读取虚拟机实例的CPU和内存使用数据；
+
+libvirt/QEMU为每个虚拟机实例创建一个cgroup：
+  systemd管理的主机：<cgroup_root>/machine.slice/machine-qemu\\x2d<id>\\x2d<name>.scope
+  （较早的libvirt版本为machine-qemu\\x2d<name>.scope）；
+  非systemd的主机：<cgroup_root>/machine/<name>.libvirt-qemu；
+cgroup v1中以上路径分别位于cpuacct（或cpu,cpuacct）和memory控制器的目录下；
+
+数据采集原来对每个虚拟机实例调用lookupByUUIDString和getCPUStats，
+每次调用都是一次到libvirtd的RPC；这里每个周期只列一次machine目录，
+cgroup目录到虚拟机实例UUID的映射只在发现新的cgroup时建立一次
+（通过libvirt按名称查找，或者由调用者提供resolve_uuid），
+之后每个虚拟机实例每个周期只读取一到两个cgroup文件：
+  CPU时间：v2为cpu.stat中的usage_usec，v1为cpuacct.usage（纳秒）；
+  内存使用：v2为memory.current，v1为memory.usage_in_bytes（字节）；
+  块设备读写：v2为io.stat中的rbytes和wbytes，
+  v1为blkio.throttle.io_service_bytes中的Total（字节）；
+cgroup文件不存在或者读取失败的虚拟机实例由调用者回退到libvirt；
+
+cgroup_root可以指向一个伪造的cgroup目录树，用于测试和性能测试
+（见xdrs.benchmarks.cgroup_collector）；
+"""
+
+import os
+
+from oslo.config import cfg
+
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+
+
+cgroup_stats_opts = [
+    cfg.StrOpt('data_collector_backend',
+               default='auto',
+               help='How the data collector reads the CPU and memory usage '
+                    'of the VMs: "cgroup" reads the cgroup files libvirt '
+                    'creates for every VM, "libvirt" asks libvirt for every '
+                    'VM, "auto" uses cgroup when the hierarchy is found. '
+                    'VMs missing from the cgroup hierarchy are always read '
+                    'through libvirt'),
+    cfg.StrOpt('cgroup_root',
+               default='/sys/fs/cgroup',
+               help='Mount point of the cgroup hierarchy'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(cgroup_stats_opts)
+
+LOG = logging.getLogger(__name__)
+
+BACKENDS = ('auto', 'cgroup', 'libvirt')
+
+# machine slice在不同主机上的目录名；
+_MACHINE_DIRS = ('machine.slice', 'machine')
+# cgroup v1中CPU时间所在的控制器目录；
+_CPUACCT_DIRS = ('cpuacct', 'cpu,cpuacct', 'cpuacct,cpu')
+
+_SCOPE_PREFIX = 'machine-qemu-'
+_SCOPE_SUFFIX = '.scope'
+_LIBVIRT_SUFFIX = '.libvirt-qemu'
+
+
+def parse_domain_name(cgroup_name):
+    """
+    由虚拟机实例的cgroup目录名得到libvirt的domain名称；
+    不是QEMU虚拟机实例的cgroup目录返回None；
+    """
+    if cgroup_name.endswith(_LIBVIRT_SUFFIX):
+        return cgroup_name[:-len(_LIBVIRT_SUFFIX)] or None
+    # systemd把名称中的'-'转义为'\x2d'；
+    name = cgroup_name.replace('\\x2d', '-')
+    if not (name.startswith(_SCOPE_PREFIX) and name.endswith(_SCOPE_SUFFIX)):
+        return None
+    name = name[len(_SCOPE_PREFIX):-len(_SCOPE_SUFFIX)]
+    # libvirt 1.3之后在名称前加上了domain的ID；
+    domain_id, sep, rest = name.partition('-')
+    if sep and domain_id.isdigit() and rest:
+        name = rest
+    return name or None
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _first_dir(root, names):
+    for name in names:
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+class CgroupStats(object):
+
+    def __init__(self, root=None):
+        self.root = root or CONF.cgroup_root
+        self.version = None
+        self.cpu_dir = self.memory_dir = self.blkio_dir = None
+        # cgroup目录名 --> 虚拟机实例UUID（None表示无法确定）；
+        self._uuids = dict()
+        self._listing = frozenset()
+        self._probe()
+
+    def _probe(self):
+        self.version = 2 if os.path.exists(
+            os.path.join(self.root, 'cgroup.controllers')) else 1
+        if self.version == 2:
+            self.cpu_dir = self.memory_dir = self.blkio_dir = _first_dir(
+                self.root, _MACHINE_DIRS)
+        else:
+            cpuacct = _first_dir(self.root, _CPUACCT_DIRS)
+            self.cpu_dir = cpuacct and _first_dir(cpuacct, _MACHINE_DIRS)
+            memory = os.path.join(self.root, 'memory')
+            self.memory_dir = _first_dir(memory, _MACHINE_DIRS)
+            blkio = os.path.join(self.root, 'blkio')
+            self.blkio_dir = _first_dir(blkio, _MACHINE_DIRS)
+
+    def available(self):
+        """
+        machine目录在主机上启动第一个虚拟机实例时才会创建，
+        没有找到时每次调用都重新查找；
+        """
+        if self.cpu_dir is None:
+            self._probe()
+        return self.cpu_dir is not None
+
+    def _refresh(self, resolve_uuid):
+        """
+        列出machine目录，只为新出现的cgroup目录建立到UUID的映射；
+        上一次没有找到UUID的cgroup目录（例如虚拟机实例正在启动）再查找一次；
+        """
+        try:
+            listing = frozenset(os.listdir(self.cpu_dir))
+        except OSError as ex:
+            LOG.warn(_('Failed to list %(path)s: %(ex)s'),
+                     {'path': self.cpu_dir, 'ex': ex})
+            listing = frozenset()
+        for cgroup_name in self._listing - listing:
+            self._uuids.pop(cgroup_name, None)
+        unresolved = [cgroup_name for cgroup_name, uuid in self._uuids.items()
+                      if uuid is None]
+        for cgroup_name in list(listing - self._listing) + unresolved:
+            domain_name = parse_domain_name(cgroup_name)
+            if domain_name is None:
+                continue
+            uuid = resolve_uuid(domain_name) if resolve_uuid else None
+            if uuid is None:
+                LOG.debug('No VM found for cgroup %s', cgroup_name)
+            self._uuids[cgroup_name] = uuid
+        self._listing = listing
+
+    def _read_cpu_time(self, cgroup_name):
+        """
+        返回cgroup的CPU时间（纳秒）；
+        """
+        path = os.path.join(self.cpu_dir, cgroup_name)
+        if self.version == 2:
+            data = _read(os.path.join(path, 'cpu.stat'))
+            if data is None:
+                return None
+            for line in data.splitlines():
+                key, _sep, value = line.partition(b' ')
+                if key == b'usage_usec':
+                    return int(value) * 1000
+            return None
+        data = _read(os.path.join(path, 'cpuacct.usage'))
+        return int(data) if data else None
+
+    def _read_memory(self, cgroup_name):
+        """
+        返回cgroup的内存使用（字节）；
+        """
+        if self.memory_dir is None:
+            return None
+        path = os.path.join(self.memory_dir, cgroup_name)
+        if self.version == 2:
+            data = _read(os.path.join(path, 'memory.current'))
+        else:
+            data = _read(os.path.join(path, 'memory.usage_in_bytes'))
+        return int(data) if data else None
+
+    def _read_io_bytes(self, cgroup_name):
+        """
+        返回cgroup所有块设备读写的字节数之和；
+        """
+        if self.blkio_dir is None:
+            return None
+        path = os.path.join(self.blkio_dir, cgroup_name)
+        if self.version == 2:
+            data = _read(os.path.join(path, 'io.stat'))
+            if data is None:
+                return None
+            total = 0
+            for line in data.splitlines():
+                for field in line.split()[1:]:
+                    key, _sep, value = field.partition(b'=')
+                    if key in (b'rbytes', b'wbytes'):
+                        total += int(value)
+            return total
+        data = _read(os.path.join(path, 'blkio.throttle.io_service_bytes'))
+        if data is None:
+            return None
+        for line in data.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0] == b'Total':
+                return int(fields[1])
+        return None
+
+    def _read_all(self, read, resolve_uuid):
+        self._refresh(resolve_uuid)
+        result = dict()
+        for cgroup_name, uuid in self._uuids.items():
+            if uuid is None:
+                continue
+            value = read(cgroup_name)
+            if value is not None:
+                result[uuid] = value
+        return result
+
+    def read_cpu_times(self, resolve_uuid=None):
+        """
+        读取所有虚拟机实例的CPU时间；
+        返回{uuid: cpu_time（纳秒）}，读取失败的虚拟机实例不在返回结果中；
+        resolve_uuid：由domain名称得到虚拟机实例UUID的方法，
+        只对新出现的cgroup目录调用一次；
+        """
+        return self._read_all(self._read_cpu_time, resolve_uuid)
+
+    def read_memory(self, resolve_uuid=None):
+        """
+        读取所有虚拟机实例的内存使用；
+        返回{uuid: memory（字节）}，读取失败的虚拟机实例不在返回结果中；
+        """
+        return self._read_all(self._read_memory, resolve_uuid)
+
+    def read_io_bytes(self, resolve_uuid=None):
+        """
+        读取所有虚拟机实例块设备读写的字节数（累计值）；
+        返回{uuid: bytes}，读取失败的虚拟机实例不在返回结果中；
+        """
+        return self._read_all(self._read_io_bytes, resolve_uuid)
+
+
+def libvirt_uuid_resolver(vir_connection):
+    """
+    返回通过libvirt按domain名称查找虚拟机实例UUID的resolve_uuid方法；
+    """
+    import libvirt
+
+    def resolve_uuid(domain_name):
+        try:
+            return vir_connection.lookupByName(domain_name).UUIDString()
+        except libvirt.libvirtError:
+            return None
+
+    return resolve_uuid
+
+
+_STATS = None
+
+
+def get_stats():
+    """
+    按照data_collector_backend返回本进程的CgroupStats；
+    使用libvirt时返回None；
+    """
+    global _STATS
+    backend = CONF.data_collector_backend
+    if backend not in BACKENDS:
+        LOG.warn(_('Unknown data_collector_backend %s, using libvirt'),
+                 backend)
+        return None
+    if backend == 'libvirt':
+        return None
+    if _STATS is None:
+        _STATS = CgroupStats()
+        if not _STATS.available() and backend == 'cgroup':
+            LOG.warn(_('No VM cgroups found under %s, falling back to '
+                       'libvirt'), _STATS.root)
+    return _STATS if _STATS.available() else None
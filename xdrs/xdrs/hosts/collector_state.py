@@ -0,0 +1,179 @@
+"""
+数据采集的状态（HostInitData）在进程内的保存和本地检查点；
+
+数据采集每个周期都需要上一个周期的状态（previous_time、previous_cpu_time、
+previous_cpu_mhz、previous_host_cpu_time_total等，其中包括每个虚拟机实例的字典），
+以前每个周期开始时从数据库HostInitData读取、结束时写回，每个主机每个周期
+两次数据库往返；
+
+这里把状态保存在进程内存中，每个周期结束时写入本地检查点文件
+<local_data_directory>/collector_state.json（先写临时文件再重命名，
+不会留下写了一半的文件），进程重启时从检查点恢复，检查点不存在或者
+不属于本主机时才从数据库读取；
+状态每隔data_collector_state_sync_interval秒才写回数据库一次（0表示只在
+服务停止时写回），数据采集的数据库访问只剩下采样数据的提交；
+"""
+
+import os
+import time
+
+from oslo.config import cfg
+import six
+
+from xdrs import exception
+from xdrs import hosts
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import jsonutils
+from xdrs.openstack.common import log as logging
+
+
+collector_state_opts = [
+    cfg.IntOpt('data_collector_state_sync_interval',
+               default=3600,
+               help='Seconds between two writes of the in-memory data '
+                    'collector state back to the host_init_data table; '
+                    '0 only writes it when the service stops'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(collector_state_opts)
+CONF.import_opt('local_data_directory', 'xdrs.service')
+
+LOG = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = 'collector_state.json'
+
+# HostInitData中以JSON文本保存的字典字段；
+_DICT_FIELDS = ('previous_cpu_time', 'previous_cpu_mhz', 'previous_counters')
+_FLOAT_FIELDS = ('previous_time', 'previous_host_cpu_time_total',
+                 'previous_host_cpu_time_busy', 'host_cpu_overload_threshold',
+                 'physical_cpu_mhz', 'physical_core_mhz')
+_INT_FIELDS = ('local_cpu_mhz', 'physical_cpus', 'host_ram',
+               'previous_overload')
+
+
+def _from_db(row):
+    """
+    HostInitData记录（字段均为文本）--> 状态字典；
+    """
+    state = dict()
+    for key in _DICT_FIELDS + _FLOAT_FIELDS + _INT_FIELDS + ('host_name',
+                                                            'host_id'):
+        value = row[key]
+        if value is None:
+            continue
+        if key in _DICT_FIELDS:
+            if isinstance(value, six.string_types):
+                value = jsonutils.loads(value)
+        elif key in _FLOAT_FIELDS:
+            value = float(value)
+        elif key in _INT_FIELDS:
+            value = int(float(value))
+        state[key] = value
+    return state
+
+
+def _to_db(state):
+    values = dict(state)
+    for key in _DICT_FIELDS:
+        if key in values:
+            values[key] = jsonutils.dumps(values[key])
+    return values
+
+
+class CollectorState(object):
+
+    def __init__(self, directory=None):
+        self.path = os.path.join(directory or CONF.local_data_directory,
+                                 CHECKPOINT_FILE)
+        self.hosts_api = hosts.API()
+        self.data = None
+        self._dirty = False
+        self._last_sync = time.time()
+
+    def _read_checkpoint(self, host_id):
+        try:
+            with open(self.path) as f:
+                data = jsonutils.loads(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+        if str(data.get('host_id')) != str(host_id):
+            LOG.warn(_('Ignoring data collector checkpoint %(path)s of '
+                       'host %(other)s'),
+                     {'path': self.path, 'other': data.get('host_id')})
+            return None
+        return data
+
+    def _write_checkpoint(self):
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(jsonutils.dumps(self.data, separators=(',', ':')))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
+
+    def load(self, context, host_id):
+        """
+        返回主机host_id的数据采集状态：内存 --> 本地检查点 --> 数据库；
+        """
+        if self.data is not None and str(self.data['host_id']) == \
+                str(host_id):
+            return self.data
+
+        data = self._read_checkpoint(host_id)
+        # 检查点不会比数据库中的记录旧，从检查点恢复时也需要写回数据库；
+        self._dirty = data is not None
+        if data is None:
+            row = self.hosts_api.get_host_init_data(context, host_id)
+            if isinstance(row, list):
+                if not row:
+                    raise exception.HostInitDataNotFound(host_id=host_id)
+                row = row[0]
+            data = _from_db(row)
+        self.data = data
+        return self.data
+
+    def save(self, context, data):
+        """
+        保存一个周期结束时的状态：更新内存、写本地检查点，并按需写回数据库；
+        """
+        self.data = data
+        self._dirty = True
+        try:
+            self._write_checkpoint()
+        except (IOError, OSError) as ex:
+            LOG.warn(_('Failed to write the data collector checkpoint '
+                       '%(path)s: %(ex)s'), {'path': self.path, 'ex': ex})
+            # 没有检查点时不能推迟写回数据库；
+            self.sync(context)
+            return
+        interval = CONF.data_collector_state_sync_interval
+        if interval > 0 and time.time() - self._last_sync >= interval:
+            self.sync(context)
+
+    def sync(self, context):
+        """
+        把内存中的状态写回数据库HostInitData；
+        """
+        if self.data is None or not self._dirty:
+            return
+        self.hosts_api.update_host_init_data(context, self.data['host_id'],
+                                             _to_db(self.data))
+        self._dirty = False
+        self._last_sync = time.time()
+
+
+_STATE = None
+
+
+def get_state():
+    """
+    返回本进程的数据采集状态；
+    """
+    global _STATE
+    if _STATE is None:
+        _STATE = CollectorState()
+    return _STATE
@@ -0,0 +1,41 @@
+"""
+数据采集中与libvirt、oslo.messaging和数据库无关的CPU使用计算；
+
+hosts/data_collection.py在每个周期为每个虚拟机实例调用这里的函数，
+离线的微基准测试（xdrs/benchmarks/hot_paths.py）直接调用这些函数，
+不需要导入数据采集的其他依赖；
+"""
+
+
+def calculate_cpu_mhz(cpu_mhz, previous_time, current_time,
+                      previous_cpu_time, current_cpu_time):
+    """ 
+    Calculate the average CPU utilization in MHz for a period of time.
+    计算某一段时间内的CPU平均利用率数据；
+
+    
+    :param cpu_mhz: The frequency of a core of the physical CPU in MHz.
+     :type cpu_mhz: int
+     physical_core_mhz：物理CPU core的频率（MHz）；
+
+    :param previous_time: The previous time.
+     :type previous_time: float
+     previous_time：上一次的时间戳；
+
+    :param current_time: The current time.
+     :type current_time: float
+     current_time：当前的时间戳；
+
+    :param previous_cpu_time: The previous CPU time of the domain.
+     :type previous_cpu_time: int
+     cpu_time：上一次的虚拟机的CPU时间；
+
+    :param current_cpu_time: The current CPU time of the domain.
+     :type current_cpu_time: int
+     current_cpu_time：当前虚拟机实例的CPU时间；
+
+    :return: The average CPU utilization in MHz.
+     :rtype: int,>=0
+    """
+    return int(cpu_mhz * float(current_cpu_time - previous_cpu_time) / \
+               ((current_time - previous_time) * 1000000000))
@@ -4,15 +4,17 @@
 """
 数据采集服务将作为一个LINUX守护进程运行在后台，将会在每间隔data_collector_interval
 时间采集一次虚拟机实例的数据，当虚拟机实例数据采集方法被调用，该组件将会执行以下步骤：
-1.获取上一次采集数据时，运行在本地主机上的虚拟机实例列表；
-2.访问Nova API实现获取当前运行在本地主机上的虚拟机实例列表；
-3.通过比较新旧虚拟机实例列表来确定最新添加或者删除的虚拟机实例列表；
-4.更新<local_data_directory>/vm路径下的文件，实现删除那些最新删除的虚拟机实例
-  所对应的文件；
+1.获取当前运行在本地主机上的虚拟机实例列表，该列表由libvirt的虚拟机实例
+  生命周期事件增量维护（见vm_inventory）；
+2.取出上一次采集数据以来最新添加或者删除的虚拟机实例列表；
+3.（在事件到达时已经完成）为新添加的虚拟机实例建立<local_data_directory>/vm
+  路径下的文件，删除那些最新删除的虚拟机实例所对应的文件；
+4.清除最新删除的虚拟机实例在数据采集状态中的数据；
   注：采集的虚拟机实例的CPU利用率数据存储在本地主机的指定路径下，每个文件对应于
       一个虚拟机实例，文件以虚拟机实例的UUID来进行命名。
 5.为每个新添加的虚拟机实例从中央数据库获取data_collector_data_length值；
 6.调用Libvirt API来获取运行在本地主机上的每个虚拟机实例的CPU信息；
+  同时采集虚拟机实例和主机的内存、网络和磁盘I/O使用数据（见resource_stats）；
 7.根据本地主机的频率和上一次获取数据的时间间隔情况，转换通过Libvirt API获取的
   虚拟机实例的CPU数据为平均的CPU利用率数据（MHZ）；
   注：这里是一个重点需要研究的地方，分析源码看看是怎么实现的；
@@ -28,10 +30,19 @@ from collections import deque
 import os
 import time
 import libvirt
-from random import random
 from oslo.config import cfg
 from xdrs import hosts
+from xdrs import metrics
 from xdrs import exception
+from xdrs.hosts import adaptive_interval
+from xdrs.hosts import cgroup_stats
+from xdrs.hosts import collector_state
+from xdrs.hosts import cpu_usage
+from xdrs.hosts import resource_stats
+from xdrs.hosts import sample_submitter
+from xdrs.hosts import schedule
+from xdrs.hosts import sketch_store
+from xdrs.hosts import vm_inventory
 
 from xdrs.daemon import Daemon
 
@@ -54,14 +65,18 @@ class DataCollection(Daemon):
 
     def run_forever(self, *args, **kwargs):
         reported = time.time()
-        time.sleep(random() * self.interval)
         init_state()
+        """
+        在本主机的相位对齐的时间点执行采集（见xdrs.hosts.schedule），
+        各个主机的采集均匀地分布在interval中，某一次采集超时时跳过已经错过的时间点；
+        """
+        controller = adaptive_interval.get_controller(self.interval)
+        phase = schedule.PhaseSchedule(controller.interval)
         while True:
-            begin = time()
+            # 采集周期由每次采集的结果自适应调整（见adaptive_interval）；
+            phase.set_interval(controller.interval)
+            phase.wait()
             local_data_collector(reported)
-            elapsed = time() - begin
-            if elapsed < self.interval:
-                time.sleep(self.interval - elapsed)
 
     def run_once(self, *args, **kwargs):
         begin = reported = time.time()
@@ -119,6 +134,7 @@ def init_state():
                  'previous_time': 0.,
                  'previous_cpu_time': dict(),
                  'previous_cpu_mhz': dict(),
+                 'previous_counters': dict(),
                  'previous_host_cpu_time_total': 0.,
                  'previous_host_cpu_time_busy': 0.,
                  'previous_overload': -1,
@@ -144,6 +160,7 @@ def init_state():
     """
     
 
+@metrics.timed('xdrs_host_stage', stage='data_collection', cpu=True)
 def local_data_collector(context):
     """
     注：基本不用大改（除了注的部分），需要对具体算法进行理解总结；
@@ -154,10 +171,14 @@ def local_data_collector(context):
     UUID在组件初始化的过程中实现随机生成；
     """
     host_id = 2;
-    hosts_api = hosts.API()
     
+    """
+    上一个周期的状态保存在进程内存中（见collector_state），只在进程启动时
+    从本地检查点或者数据库读取；
+    """
+    state = collector_state.get_state()
     try:
-        init_data = hosts_api.get_host_init_data(host_id)
+        init_data = state.load(context, host_id)
     except exception.HostInitDataNotFound:
         msg = _('host init data not found')
         raise webob.exc.HTTPBadRequest(explanation=msg)
@@ -174,57 +195,37 @@ def local_data_collector(context):
     
     
     """
-    2.获取指定路径下的虚拟机UUID列表；
+    2.虚拟机实例清单由libvirt的生命周期事件增量维护（见vm_inventory），
+      不再每个周期列出本地数据目录和逐个查找libvirt中的domain；
+    3.一次取出清单和上一个周期以来新增、删除的虚拟机实例，新增的虚拟机实例
+      一定在清单中；新增虚拟机实例的本地数据文件已经建立，删除的虚拟机实例的
+      本地数据文件已经清除；
     """
-    vms_previous = _get_previous_vms(vm_path)
-    
-    """
-    3.通过libvirt获取本地主机的VM的UUID数据统计信息；
-    """
-    vir_connection = libvirt.openReadOnly(None)
-    vms_current = _get_current_vms(vir_connection)
-    
-    """
-    4.通过比较新旧列表来确定新添加的虚拟机实例列表；
-    """
-    vms_added = _get_added_vms(vms_previous, vms_current.keys())
+    vms_current, vms_added, vms_removed = \
+        vm_inventory.get_inventory().snapshot()
+    vms_current = list(vms_current)
+    vms_added = list(vms_added)
     added_vm_data = dict()
+    vir_connection = libvirt.openReadOnly(None)
     
     """
     5.如果本地主机有新添加的虚拟机实例；
-    从中央数据库获取新添加虚拟机实例之前的数据采集信息，
-    因为有可能是迁移过来的虚拟机实例；
     （1）从中央数据库获取新添加虚拟机实例之前的数据采集信息，
          因为有可能是迁移过来的虚拟机实例； 
     （2）保存从中央数据库获取的新添加虚拟机实例的数据到本地存储文件；
     """
     if vms_added:
-        for i, vm in enumerate(vms_added):
-            if vms_current[vm] != libvirt.VIR_DOMAIN_RUNNING:
-                del vms_added[i]
-                del vms_current[vm]
-        _create_new_vms_files(vms_added, vm_path)
         added_vm_data = _fetch_remote_data(data_length, vms_added)
         _write_vm_data_locally(vm_path, added_vm_data, data_length)
     
-    """
-    6.通过比较新旧列表来确定最新删除的虚拟机实例的列表；
-    """
-    vms_removed = _get_removed_vms(vms_previous, vms_current.keys())
-    
     """  
-    7.如果存在最新删除的虚拟机实例；
-      清除对应于已经删除的虚拟机实例的保存在本地的数据信息；
-      同时清除在初始化过程中的相关虚拟机实例的数据信息（这里后续关注数据初始化方法的实现）；
+    7.清除在初始化过程中的已经删除的虚拟机实例的数据信息；
+    注：这里有待探讨，我认为应该加上在数据库中删除所有的vm的init_data数据表信息；
     """
-    if vms_removed:
-        _cleanup_local_vm_data(vm_path, vms_removed)
-        """
-        注：这里有待探讨，我认为应该加上在数据库中删除所有的vm的init_data数据表信息；
-        """
-        for vm in vms_removed:
-            del init_data['previous_cpu_time'][vm]
-            del init_data['previous_cpu_mhz'][vm]
+    for vm in vms_removed:
+        init_data['previous_cpu_time'].pop(vm, None)
+        init_data['previous_cpu_mhz'].pop(vm, None)
+    sketch_store.get_store().forget(vms_removed)
     
     """
     8.开始进行数据采集的正式操作；
@@ -249,10 +250,24 @@ def local_data_collector(context):
                                      init_data['previous_cpu_time'],
                                      init_data['previous_time'],
                                      current_time,
-                                     vms_current.keys(),
+                                     vms_current,
                                      init_data['previous_cpu_mhz'],
                                      added_vm_data)
     
+    """
+    10.在同一个周期中采集虚拟机实例和主机的内存使用、网络和磁盘I/O速率；
+    返回的counters为本周期的累计值，保存到状态中供下一个周期计算速率；
+    """
+    (counters,
+     vm_resources,
+     host_resources,
+     host_meminfo) = _get_resource_usage(vir_connection,
+                                         cpu_time.keys(),
+                                         init_data.get('previous_counters') or
+                                         dict(),
+                                         current_time -
+                                         init_data['previous_time'])
+    
     """
     12.获取本地主机的平均CPU利用率数据（MHz）；
     注：这里是一个重点，需要好好分析；
@@ -278,20 +293,44 @@ def local_data_collector(context):
                 后面分析一下欠载过载的判断标准和过程，看看这里是否有可以改进的地方，即
                 其他数据是否有用武之地；
       （7）提交本地主机hpyervisor的CPU数据到中央数据库之中；
+           内存、网络和磁盘I/O数据同样保存到本地存储文件；
+           虚拟机实例和主机的采样只交给采样提交者（sample_submitter），
+           由其异步提交，采集周期不等待conductor和数据库；
       （8）简单判断本地主机此时是否是过载的；
     """
     if init_data['previous_time'] > 0:
         _append_vm_data_locally(vm_path, cpu_mhz, data_length)
-        _append_vm_data_remotely(cpu_mhz)
         total_vms_cpu_mhz = sum(cpu_mhz.values())
         host_cpu_mhz_hypervisor = host_cpu_mhz - total_vms_cpu_mhz
         if host_cpu_mhz_hypervisor < 0:
             host_cpu_mhz_hypervisor = 0
         total_cpu_mhz = total_vms_cpu_mhz + host_cpu_mhz_hypervisor
         _append_host_data_locally(host_path, host_cpu_mhz_hypervisor, data_length)
+        _append_host_data_locally(
+            _build_local_host_time_path(CONF.local_data_directory),
+            current_time, data_length)
+        _append_resource_data_locally(CONF.local_data_directory,
+                                      vm_resources, host_resources,
+                                      data_length)
+        
+        
+        """
+        更新虚拟机实例和主机CPU使用的分位数草图（见sketch_store），
+        主机的草图和虚拟机实例的分位数随采样一起提交；
+        """
+        sketches = sketch_store.get_store()
+        sketches.update(cpu_mhz, total_cpu_mhz)
         
-        _append_host_data_remotely(init_data['hostname'],
-                                  host_cpu_mhz_hypervisor)
+        submitter = sample_submitter.get_submitter()
+        submitter.submit(
+            vms=cpu_mhz,
+            cpu_mhz=host_cpu_mhz_hypervisor,
+            resources=host_resources,
+            meminfo=host_meminfo)
+        submitter.set_summaries(
+            cpu_sketch=sketches.host_sketch(),
+            vm_percentiles=dict((uuid, sketches.vm_percentiles[uuid])
+                                for uuid in cpu_mhz))
         
         """
         记录此时本地主机是否过载；
@@ -304,19 +343,27 @@ def local_data_collector(context):
             init_data['physical_cpu_mhz'],
             total_cpu_mhz)
         
+        """
+        按照主机CPU利用率的变化和距离过载阈值的远近调整下一个采集周期；
+        """
+        adaptive_interval.get_controller().update(
+            float(total_cpu_mhz) / init_data['physical_cpu_mhz'],
+            init_data['host_cpu_overload_threshold'])
+        
     """
     14.更新若干初始化状态数据：
-    @@@@注：这里可以考虑将这些初始化的状态数据存储到数据库中
-            每次进行数据采集都从数据库中读取；
+    状态保存在内存中并写入本地检查点，按照data_collector_state_sync_interval
+    延迟写回数据库；
     """
     init_data['previous_time'] = current_time
     init_data['previous_cpu_time'] = cpu_time
     init_data['previous_cpu_mhz'] = cpu_mhz
+    init_data['previous_counters'] = counters
     init_data['previous_host_cpu_time_total'] = host_cpu_time_total
     init_data['previous_host_cpu_time_busy'] = host_cpu_time_busy
     
     try:
-        host_init_data = hosts_api.update_host_init_data(init_data, host_id)
+        state.save(context, init_data)
     except exception.HostInitDataNotFound:
         msg = _('host init data not found')
         raise webob.exc.HTTPBadRequest(explanation=msg)
@@ -357,11 +404,12 @@ def _build_local_host_path(local_data_directory):
     """
     return os.path.join(local_data_directory, 'host')
 
-def _get_previous_vms(path):
+def _build_local_host_time_path(local_data_directory):
     """ 
-    获取指定路径下的虚拟机UUID列表；
+    建立存储本地主机数据采样时间的路径，与本地主机数据逐行对应；
     """
-    return os.listdir(path)
+    return os.path.join(local_data_directory, 'host_time')
+
 def _get_current_vms(vir_connection):
     """ 
     通过libvirt获取VM的UUID数据统计信息；
@@ -387,11 +435,6 @@ def _substract_lists(list1, list2):
     """
     return list(set(list1).difference(list2))
 
-def _create_new_vms_files(uuids, path):
-    for uuid in uuids:
-        os.mknod(os.path.join(path, uuid))
-    
-
 def _fetch_remote_data(data_length, uuids):
     """ 
     访问中央数据库获取指定uuid的虚拟机数据；
@@ -429,13 +472,6 @@ def _get_removed_vms(previous_vms, current_vms):
     """
     return _substract_lists(previous_vms, current_vms)
 
-def _cleanup_local_vm_data(path, vms):
-    """ 
-    清除对应于已经删除的虚拟机实例的保存在本地的数据信息；
-    """
-    for vm in vms:
-        os.remove(os.path.join(path, vm))
-        
 def _get_cpu_mhz(vir_connection, physical_core_mhz, previous_cpu_time,
                 previous_time, current_time, current_vms,
                 previous_cpu_mhz, added_vm_data):
@@ -478,6 +514,12 @@ def _get_cpu_mhz(vir_connection, physical_core_mhz, previous_cpu_time,
     for uuid in removed_vms:
         del previous_cpu_time[uuid]
 
+    """
+    一次读取所有虚拟机实例当前的CPU时间（优先从cgroup读取）；
+    """
+    current_cpu_times = _get_cpu_times(vir_connection,
+                                       previous_cpu_time.keys() + added_vms)
+
     """
     针对原有虚拟机实例（去除了最新删除的虚拟机实例）的cpu利用率计算：
     cpu利用率 = 
@@ -485,10 +527,7 @@ def _get_cpu_mhz(vir_connection, physical_core_mhz, previous_cpu_time,
     (当前的时间戳-上一次时间戳)X1000000000
     """
     for uuid, cpu_time in previous_cpu_time.items():
-        """
-        通过libvirt获取指定UUID的虚拟机实例的CPU时间；
-        """
-        current_cpu_time = _get_cpu_time(vir_connection, uuid)
+        current_cpu_time = current_cpu_times[uuid]
         if current_cpu_time < cpu_time:
             cpu_mhz[uuid] = previous_cpu_mhz[uuid]
         else:
@@ -500,9 +539,11 @@ def _get_cpu_mhz(vir_connection, physical_core_mhz, previous_cpu_time,
             cpu_time：上一次的虚拟机的CPU时间；
             current_cpu_time：当前虚拟机实例的CPU时间；
             """
-            cpu_mhz[uuid] = _calculate_cpu_mhz(physical_core_mhz, previous_time,
-                                              current_time, cpu_time,
-                                              current_cpu_time)
+            cpu_mhz[uuid] = cpu_usage.calculate_cpu_mhz(physical_core_mhz,
+                                                        previous_time,
+                                                        current_time,
+                                                        cpu_time,
+                                                        current_cpu_time)
         """
         更新指定uuid虚拟机实例的previous_cpu_time值；
         """
@@ -519,15 +560,35 @@ def _get_cpu_mhz(vir_connection, physical_core_mhz, previous_cpu_time,
     用字典表示，即added_vm_data；
     """
     for uuid in added_vms:
-        if added_vm_data[uuid]:
+        if added_vm_data.get(uuid):
             cpu_mhz[uuid] = added_vm_data[uuid][-1]
-        previous_cpu_time[uuid] = _get_cpu_time(vir_connection, uuid)
+        previous_cpu_time[uuid] = current_cpu_times[uuid]
 
     """
     返回所有虚拟机实例vm的previous_cpu_time和所有虚拟机实例vm的cpu利用率；
     """
     return previous_cpu_time, cpu_mhz
 
+def _get_cpu_times(vir_connection, uuids):
+    """
+    获取指定的虚拟机实例的CPU时间（纳秒），返回{uuid: cpu_time}；
+    data_collector_backend不是libvirt并且找到了虚拟机实例的cgroup时，
+    直接读取cgroup文件（见cgroup_stats），不再对每个虚拟机实例调用libvirt；
+    cgroup中没有的虚拟机实例仍然通过libvirt获取；
+    """
+    cpu_times = dict()
+    stats = cgroup_stats.get_stats()
+    if stats is not None:
+        cgroup_cpu_times = stats.read_cpu_times(
+            cgroup_stats.libvirt_uuid_resolver(vir_connection))
+        for uuid in uuids:
+            if uuid in cgroup_cpu_times:
+                cpu_times[uuid] = cgroup_cpu_times[uuid]
+    for uuid in uuids:
+        if uuid not in cpu_times:
+            cpu_times[uuid] = _get_cpu_time(vir_connection, uuid)
+    return cpu_times
+
 def _get_cpu_time(vir_connection, uuid):
     """ 
     Get the CPU time of a VM specified by the UUID using libvirt.
@@ -548,39 +609,27 @@ def _get_cpu_time(vir_connection, uuid):
     except libvirt.libvirtError:
         return 0
 
-def _calculate_cpu_mhz(cpu_mhz, previous_time, current_time,
-                      previous_cpu_time, current_cpu_time):
-    """ 
-    Calculate the average CPU utilization in MHz for a period of time.
-    计算某一段时间内的CPU平均利用率数据；
-
-    
-    :param cpu_mhz: The frequency of a core of the physical CPU in MHz.
-     :type cpu_mhz: int
-     physical_core_mhz：物理CPU core的频率（MHz）；
-
-    :param previous_time: The previous time.
-     :type previous_time: float
-     previous_time：上一次的时间戳；
-
-    :param current_time: The current time.
-     :type current_time: float
-     current_time：当前的时间戳；
-
-    :param previous_cpu_time: The previous CPU time of the domain.
-     :type previous_cpu_time: int
-     cpu_time：上一次的虚拟机的CPU时间；
+def _get_resource_usage(vir_connection, uuids, previous_counters, elapsed):
+    """
+    采集虚拟机实例和主机的内存、网络和磁盘I/O使用数据；
+    返回(counters, vm_samples, host_samples, host_meminfo)：
+    counters：本周期的累计值，{uuid: {...}, 'host': {...}}；
+    vm_samples：{uuid: {'ram': MB, 'net': KB/s, 'disk': KB/s}}；
+    host_samples：{'ram': MB, 'net': KB/s, 'disk': KB/s}；
+    host_meminfo：{'MemTotal': MB, 'MemFree': MB}；
+    """
+    vm_counters = resource_stats.get_reader().read(vir_connection, uuids)
+    host_counters, host_meminfo = resource_stats.read_host_counters()
+    vm_samples = dict(
+        (uuid, resource_stats.calculate_samples(
+            previous_counters.get(uuid, {}), values, elapsed))
+        for uuid, values in vm_counters.items())
+    host_samples = resource_stats.calculate_samples(
+        previous_counters.get('host', {}), host_counters, elapsed)
+    counters = dict(vm_counters)
+    counters['host'] = host_counters
+    return counters, vm_samples, host_samples, host_meminfo
 
-    :param current_cpu_time: The current CPU time of the domain.
-     :type current_cpu_time: int
-     current_cpu_time：当前虚拟机实例的CPU时间；
-
-    :return: The average CPU utilization in MHz.
-     :rtype: int,>=0
-    """
-    return int(cpu_mhz * float(current_cpu_time - previous_cpu_time) / \
-               ((current_time - previous_time) * 1000000000))
-    
 def _get_host_cpu_mhz(cpu_mhz, previous_cpu_time_total, previous_cpu_time_busy):
     """ 
     Get the average CPU utilization in MHz for a set of VMs.
@@ -668,20 +717,6 @@ def _append_vm_data_locally(path, data, data_length):
                 f.seek(0)
                 f.write('\n'.join([str(x) for x in values]) + '\n')
                 
-def _append_vm_data_remotely(db, data):
-    """ 
-    Submit CPU MHz values to the central database.
-    提交CPU数据到中央数据库中；
-    @@@@注：这里查看nova中数据库操作的具体实现方式；
-
-    :param db: The database object.
-     :type db: Database
-
-    :param data: A map of VM UUIDs onto the corresponing CPU MHz values.
-     :type data: dict(str : int)
-    """
-    db.insert_vm_cpu_mhz(data)
-
 def _append_host_data_locally(path, cpu_mhz, data_length):
     """ 
     保存本地主机的CPU数据到指定的文件中；
@@ -706,21 +741,26 @@ def _append_host_data_locally(path, cpu_mhz, data_length):
             f.seek(0)
             f.write('\n'.join([str(x) for x in values]) + '\n')
             
-def _append_host_data_remotely(db, hostname, host_cpu_mhz):
-    """ 
-    提交本地主机的CPU数据到中心数据库中；
+def _append_resource_data_locally(local_data_directory, vm_samples,
+                                  host_samples, data_length):
+    """
+    保存虚拟机实例和本地主机的内存、网络和磁盘I/O数据到对应的本地文件中，
+    与CPU数据相同，每个文件保留最新的data_length个数值；
+    """
+    for resource in resource_stats.RESOURCES:
+        vm_path = resource_stats.local_vm_path(local_data_directory, resource)
+        if not os.path.isdir(vm_path):
+            os.makedirs(vm_path)
+        _append_vm_data_locally(vm_path,
+                                dict((uuid, samples[resource])
+                                     for uuid, samples in vm_samples.items()
+                                     if resource in samples),
+                                data_length)
+        if resource in host_samples:
+            _append_host_data_locally(
+                resource_stats.local_host_path(local_data_directory, resource),
+                host_samples[resource], data_length)
 
-    :param db: The database object.
-     :type db: Database
-
-    :param hostname: The host name.
-     :type hostname: str
-
-    :param host_cpu_mhz: An average host CPU utilization in MHz.
-     :type host_cpu_mhz: int,>=0
-    """
-    db.insert_host_cpu_mhz(hostname, host_cpu_mhz)
-    
 def _log_host_overload(overload_threshold, hostname, previous_overload,
                       host_total_mhz, host_utilization_mhz):
     """ 
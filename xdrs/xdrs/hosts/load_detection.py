@@ -26,16 +26,21 @@ import time
 import libvirt
 import json
 import numpy
-from random import random
 from oslo.config import cfg
 from xdrs import hosts
+from xdrs import metrics
+from xdrs.algorithms import time_series
 from xdrs.daemon import Daemon
 from xdrs import exception
-from xdrs.compute.nova import novaclient
+from xdrs.hosts import reporter
+from xdrs.hosts import resource_stats
+from xdrs.hosts import schedule
+from xdrs.hosts import sketch_store
 
 CONF = cfg.CONF
 CONF.import_opt('local_data_directory', 'xdrs.service')
 CONF.import_opt('host_cpu_usable_by_vms', 'xdrs.service')
+CONF.import_opt('data_collector_interval', 'xdrs.service')
 CONF.import_opt('network_migration_bandwidth', 'xdrs.service')
 CONF.import_opt('underload_algorithm_path', 'xdrs.service')
 CONF.import_opt('overload_algorithm_path', 'xdrs.service')
@@ -55,13 +60,13 @@ class HostLoadDetection(Daemon):
 
     def run_forever(self, *args, **kwargs):
         reported = time.time()
-        time.sleep(random() * self.interval)
+        """
+        在本主机的相位对齐的时间点执行负载检测（见xdrs.hosts.schedule）；
+        """
+        phase = schedule.PhaseSchedule(self.interval)
         while True:
-            begin = time()
+            phase.wait()
             local_load_detect(reported)
-            elapsed = time() - begin
-            if elapsed < self.interval:
-                time.sleep(self.interval - elapsed)
 
     def run_once(self, *args, **kwargs):
         begin = reported = time.time()
@@ -104,6 +109,7 @@ def init_state(config):
             'hashed_password': sha1(config['os_admin_password']).hexdigest()}
 
 
+@metrics.timed('xdrs_host_stage', stage='load_detection', cpu=True)
 def local_load_detect(context):
            
     hosts_api = hosts.API()
@@ -129,6 +135,12 @@ def local_load_detect(context):
     """
     vm_cpu_mhz = _cleanup_vm_data(vm_cpu_mhz, vm_ram.keys())
     
+    """
+    迁移时间按照虚拟机实例实际使用的内存计算（数据采集保存的ram数据的最新值），
+    没有ram数据的虚拟机实例使用分配给它的最大RAM值；
+    """
+    vm_ram_usage = _get_ram_usage(vm_ram)
+    
     """
     5.如果没有获取到vm_cpu_mhz数据，说明当前的主机是处于闲置状态，
       即其上没有虚拟机实例在运行，所以直接返回；
@@ -146,6 +158,15 @@ def local_load_detect(context):
     """
     host_cpu_mhz = _get_local_host_data(host_path)
     
+    """
+    采集周期可以自适应调整，采样之间的时间间隔不同；
+    host_time_steps：每个主机采样代表的时间长度，传给检测算法；
+    """
+    host_time_steps = time_series.time_steps(
+        _get_local_host_times(_build_local_host_time_path(
+            CONF.local_data_directory)),
+        CONF.data_collector_interval)
+    
     """
     8.由历史虚拟机CPU利用率数据和历史主机CPU使用数据，共同来计算主机的CPU利用率百分比；
       @@@@注：这里需要重点看一下，虚拟机CPU利用率和主机CPU利用率的关系；
@@ -172,6 +193,15 @@ def local_load_detect(context):
     if not host_cpu_utilization:
         return False
     
+    """
+    host_cpu_percentiles：数据采集维护的主机CPU使用分位数草图给出的p50、p95、p99
+    （MHz，见hosts/sketch_store.py），换算为CPU利用率后传给检测算法，
+    基于分位数的检测算法不需要再从历史数据计算；
+    """
+    host_cpu_percentiles = _mhz_percentiles_to_utilization(
+        sketch_store.read_host_percentiles(CONF.local_data_directory),
+        physical_cpu_mhz_total)
+    
     
     """
     9.根据虚拟机实例的RAM使用率数据和配置文件中定义的虚拟机实例迁移所允许的网络带宽
@@ -180,7 +210,7 @@ def local_load_detect(context):
       @@@@注：这里计算的是所有虚拟机实例中每一个虚拟机实例平均的迁移时间；
     """
     migration_time = _calculate_migration_time(
-                        vm_ram, 
+                        vm_ram_usage, 
                         float(CONF.network_migration_bandwidth)
                     )
     
@@ -218,13 +248,28 @@ def local_load_detect(context):
     13.调用确定的欠载检测算法进行本地主机的欠载检测；
     """
     underload, underload_detection_state = underload_algorithm_fuction(host_cpu_utilization, 
-                                                                      underload_algorithm_fuction_params)
+                                                                      underload_algorithm_fuction_params,
+                                                                      time_steps=host_time_steps,
+                                                                      percentiles=host_cpu_percentiles)
     
     """ 
     14.调用确定的过载检测算法进行本地主机的过载检测；
     """
     overload, overload_detection_state = overload_algorithm_fuction(host_cpu_utilization, 
-                                                                   overload_algorithm_fuction_params)
+                                                                   overload_algorithm_fuction_params,
+                                                                   time_steps=host_time_steps,
+                                                                   percentiles=host_cpu_percentiles)
+    
+    """
+    15.CPU没有过载时，由数据采集保存的内存、网络和磁盘I/O数据计算各自的利用率，
+       任何一种资源的利用率超过其阈值时，主机同样是过载的；
+    """
+    if not overload:
+        host_resource_utilization = resource_stats.host_utilization(
+            CONF.local_data_directory,
+            _host_ram(vir_connection))
+        if resource_stats.overloaded_resources(host_resource_utilization):
+            overload = True
     
     
     """
@@ -240,12 +285,9 @@ def local_load_detect(context):
         host_load_state = 'normalload'
         
     """
-    更新数据表HostLoadState中的负载状态信息；
+    负载状态交给主机状态上报者，与心跳等其他状态合并写入数据表HostLoadState；
     """
-    try:
-        host_load_state = hosts_api.update_host_load_states(context, host_id, host_load_state)
-    except exception.HostLoadStateNotFound as ex:
-        raise webob.exc.HTTPNotFound(explanation=ex.format_message())
+    reporter.get_reporter().report(load_state=host_load_state)
     
     return 0
 
@@ -292,6 +334,19 @@ def _get_max_ram(vir_connection, uuid):
     except libvirt.libvirtError:
         return None
 
+def _get_ram_usage(vms_ram):
+    """
+    返回虚拟机实例实际使用的内存（MB）：本地保存的ram数据的最新值，
+    没有ram数据的虚拟机实例使用vms_ram中的最大RAM值；
+    """
+    vms_ram_usage = dict(vms_ram)
+    ram_data = resource_stats.read_local_vm_data(CONF.local_data_directory,
+                                                 'ram')
+    for uuid in vms_ram:
+        if ram_data.get(uuid):
+            vms_ram_usage[uuid] = ram_data[uuid][-1]
+    return vms_ram_usage
+
 def _cleanup_vm_data(vm_data, uuids):
     """ 
     删除在UUID列表中没有出现的虚拟机实例的记录信息；
@@ -307,6 +362,21 @@ def _build_local_host_path(local_data_directory):
     """
     return os.path.join(local_data_directory, 'host')
 
+def _build_local_host_time_path(local_data_directory):
+    """ 
+    建立存储本地主机数据采样时间的路径；
+    """
+    return os.path.join(local_data_directory, 'host_time')
+
+def _get_local_host_times(path):
+    """ 
+    从本地存储路径读取本地主机数据的采样时间；
+    """
+    if not os.access(path, os.F_OK):
+        return []
+    with open(path, 'r') as f:
+        return [float(x) for x in f.read().strip().splitlines()]
+
 def _get_local_host_data(path):
     """ 
     从本地存储路径读取本地主机的采集数据；
@@ -317,6 +387,17 @@ def _get_local_host_data(path):
         result = [int(x) for x in f.read().strip().splitlines()]
     return result
 
+def _mhz_percentiles_to_utilization(percentiles, physical_cpu_mhz):
+    """
+    把主机CPU使用的分位数（MHz）换算为CPU利用率；没有分位数时返回None；
+    """
+    if not percentiles or not physical_cpu_mhz:
+        return None
+    return dict((key, None if value is None
+                 else float(value) / physical_cpu_mhz)
+                for key, value in percentiles.items())
+
+
 def _vm_mhz_to_percentage(vm_mhz_history, host_mhz_history, physical_cpu_mhz):
     """ 
     转换虚拟机的CPU利用率到主机的CPU利用率；
@@ -333,7 +414,6 @@ def _vm_mhz_to_percentage(vm_mhz_history, host_mhz_history, physical_cpu_mhz):
     max_len = max(len(x) for x in vm_mhz_history)
     if len(host_mhz_history) > max_len:
         host_mhz_history = host_mhz_history[-max_len:]
-    print host_mhz_history
     
     """
     vm_mhz_history = [[0, 1, 2, 3, 4], [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [0, 1, 2, 3, 4, 5, 6], [0, 1, 2, 3, 4, 5]]
@@ -442,6 +522,12 @@ def _call_function_by_name(name, args):
     m = __import__(module, fromlist=fromlist)
     return getattr(m, function)(*args)
 
+def _host_ram(vir_connection):
+    """ 
+    通过libvirt获取本地主机的RAM（MB）；
+    """
+    return vir_connection.getInfo()[1]
+
 def _physical_cpu_mhz_total(vir_connection):
     """ 
     通过libvirt获取所有CPU核频率之和（MHz）；
@@ -462,18 +548,19 @@ def _physical_cpu_mhz(vir_connection):
     return vir_connection.getInfo()[3]
 
 def _get_all_available_hosts(context):
+    """
+    nova中可用的计算节点见hosts.API.get_nova_hosts（本地清单优先）；
+    """
     hosts_api = hosts.API()
-    hosts = novaclient(context).hosts.index()
+    nova_hosts = set(hosts_api.get_nova_hosts(context))
     hosts_states = hosts_api.get_all_hosts_load_states_sorted_list(context)
     hosts_temp = list()
     
     for uuid, host_load_state in hosts_states:
         if host_load_state == 'normalload':
-            hosts_temp.add(uuid)
+            hosts_temp.append(uuid)
             
-    for i in hosts_temp:
-        if i not in hosts['id']:
-            del hosts_temp[i]
+    hosts_temp = [uuid for uuid in hosts_temp if uuid in nova_hosts]
             
     available_hosts = hosts_temp
     
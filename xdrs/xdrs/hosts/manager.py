@@ -1,10 +1,14 @@
+import functools
 import os
 import webob
 from webob import exc
 import subprocess
 from oslo.config import cfg
+from oslo import messaging
 import libvirt
 
+from xdrs import cpu_data_archive
+from xdrs import cpu_data_codec
 from xdrs import manager
 from xdrs.hosts import rpcapi as hosts_rpcapi
 from xdrs import conductor
@@ -12,8 +16,12 @@ from xdrs import hosts
 from xdrs import exception
 from xdrs import states
 import xdrs
+from xdrs.hosts import collector_state
 from xdrs.hosts import data_collection
 from xdrs.hosts import load_detection
+from xdrs.hosts import sample_submitter
+from xdrs.hosts import schedule
+from xdrs.hosts import vm_inventory
 from xdrs.hosts import vms_selection
 
 from __future__ import print_function
@@ -21,8 +29,11 @@ from collections import OrderedDict
 
 CONF = cfg.CONF
 CONF.import_opt('local_data_directory', 'xdrs.service')
+CONF.import_opt('data_collector_data_length', 'xdrs.service')
 
 class HostManager(manager.Manager):
+    target = messaging.Target(version='1.2')
+
     def __init__(self, compute_driver=None, *args, **kwargs):
         """Load configuration options and connect to the hypervisor."""
         self._last_host_check = 0
@@ -157,9 +168,20 @@ class HostManager(manager.Manager):
     """
     def get_all_host_cpu_data(self, context):
         return self.conductor_api.get_all_host_cpu_data(context)
+
+    def get_hosts_cpu_data_page(self, context, marker=None, limit=None):
+        return self.conductor_api.get_hosts_cpu_data_page(context,
+                                                          marker=marker,
+                                                          limit=limit)
     
     def get_host_cpu_data_by_id(self, context, id):
         return self.conductor_api.get_host_cpu_data_by_id(context, id)
+
+    def get_hosts_cpu_data(self, context, host_ids):
+        return self.conductor_api.get_hosts_cpu_data(context, host_ids)
+
+    def get_hosts_meminfo(self, context, host_ids):
+        return self.conductor_api.get_hosts_meminfo(context, host_ids)
     
     def create_host_cpu_data_temp_by_id(self, context, update_values, host_uuid):
         return self.conductor_api.create_host_cpu_data_temp_by_id(context, update_values, host_uuid)
@@ -215,6 +237,19 @@ class HostManager(manager.Manager):
             
     def get_all_hosts_load_states_sorted_list(self, context):
         return self.conductor_api.get_all_hosts_load_states_sorted_list(context)
+
+    def get_hosts_load_states(self, context, ids):
+        return self.conductor_api.get_hosts_load_states(context, ids)
+
+    def get_enabled_hosts(self, context):
+        return self.conductor_api.get_enabled_hosts(context)
+
+    def get_schedule_slots(self, context, interval):
+        """
+        返回可用的计算节点的周期任务在interval中的相位：[(相位, 主机名称), ...]；
+        主机名称即各个主机默认的schedule_host_key；
+        """
+        return schedule.slot_map(self.get_enabled_hosts(context), interval)
     
     
     
@@ -251,9 +286,43 @@ class HostManager(manager.Manager):
     """
     def get_all_vms_cpu_data(self, context):
         return self.conductor_api.get_all_vms_cpu_data(context)
+
+    def get_vms_cpu_data_page(self, context, marker=None, limit=None):
+        return self.conductor_api.get_vms_cpu_data_page(context,
+                                                        marker=marker,
+                                                        limit=limit)
             
-    def get_vm_cpu_data_by_vm_id(self, context, vm_id):
-        return self.conductor_api.get_vm_cpu_data_by_vm_id(context, vm_id)
+    def export_cpu_data(self, context, kind, start=None, end=None,
+                        compress=False):
+        """
+        导出一种（vms或者hosts）CPU历史数据中start、end时间范围内的采样
+        （见xdrs/cpu_data_archive.py），返回bytes的迭代器；
+        """
+        fetch_page = {
+            cpu_data_archive.VMS: self.get_vms_cpu_data_page,
+            cpu_data_archive.HOSTS: self.get_hosts_cpu_data_page,
+        }[kind]
+        rows = cpu_data_archive.iter_rows(
+            functools.partial(fetch_page, context), kind)
+        return cpu_data_archive.export(rows, kind, start, end,
+                                       compress=compress)
+
+    def import_cpu_data(self, context, fileobj):
+        """
+        从fileobj读取导出的CPU历史数据，分批交给conductor写入，
+        返回导入的序列数；
+        """
+        return cpu_data_archive.import_chunks(
+            fileobj,
+            functools.partial(self.conductor_api.import_cpu_data, context),
+            length=int(CONF.data_collector_data_length))
+
+    def get_vm_cpu_data_by_vm_id(self, context, vm_id, cpu_data_encoding=None):
+        result = self.conductor_api.get_vm_cpu_data_by_vm_id(context, vm_id)
+        return cpu_data_codec.encode_rows(result, cpu_data_encoding)
+
+    def get_vms_cpu_data(self, context, vm_ids):
+        return self.conductor_api.get_vms_cpu_data(context, vm_ids)
             
     def delete_vm_cpu_data_by_vm_id(self, context, vm_id):
         vm_path = CONF.local_data_directory + '/' + vm_id
@@ -413,6 +482,8 @@ class HostManager(manager.Manager):
          host_cpu_mhz) = self._get_host_cpu_mhz(physical_cpu_mhz,
                                           previous_host_cpu_time_total,
                                           previous_host_cpu_time_busy)
+        
+        return host_cpu_mhz
          
          
          
@@ -521,6 +592,22 @@ class DataCollectionManager(manager.Manager):
             raise webob.exc.HTTPBadRequest(explanation=msg)
         
         return hosts_vms_data_collection
+
+    def pre_start_hook(self):
+        """
+        启动采样的定时异步提交，上次停止时spool中积压的采样在第一次提交时重放；
+        """
+        sample_submitter.get_submitter().start()
+
+    def cleanup_host(self):
+        """
+        服务停止时提交（或保存到spool）剩余的采样，
+        并把内存中的数据采集状态写回数据库；
+        """
+        context = xdrs.context.get_admin_context()
+        sample_submitter.get_submitter().stop()
+        vm_inventory.get_inventory().stop()
+        collector_state.get_state().sync(context)
     
 
 
@@ -0,0 +1,122 @@
+"""
+主机状态的合并上报；
+
+同一主机上的各个子系统（服务心跳、负载检测、数据采集等）不再各自调用
+update_host_load_states/update_host_task_states/update_host_running_states
+等单行更新方法，而是把状态交给本进程唯一的HostStateReporter；
+每隔report_interval秒，上报者把这段时间内的心跳、负载状态、任务状态和
+运行状态合并为一条消息发送给conductor，由conductor在一个事务中完成所有的写入
+（见db.host_state_report）；
+这样每个主机的数据库写入频率是固定的，与上报状态的子系统的数目无关；
+数据采集的CPU、内存、网络和磁盘I/O采样由sample_submitter异步提交；
+
+注：同一状态在一个周期内多次上报时只保留最后一次的值；
+report_interval为0时每次上报立即发送；
+"""
+
+from oslo.config import cfg
+
+from xdrs import conductor
+import xdrs.context
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+from xdrs.openstack.common import loopingcall
+
+# 注：report_interval在xdrs.service中注册，
+# xdrs.service导入了这个模块，这里不能再使用CONF.import_opt；
+CONF = cfg.CONF
+
+LOG = logging.getLogger(__name__)
+
+# 可以合并上报的状态（上报消息中的键）；
+STATES = ('load_state', 'task_state', 'running_state')
+
+
+class HostStateReporter(object):
+
+    def __init__(self, host=None, conductor_api=None):
+        self.host = host or CONF.host
+        self.conductor_api = conductor_api or conductor.API()
+        self._service_ids = set()
+        self._states = dict()
+        self._timer = None
+
+    def add_service(self, service_id):
+        """
+        在每次上报中为服务service_id附带心跳（report_count加1）；
+        """
+        self._service_ids.add(service_id)
+
+    def remove_service(self, service_id):
+        self._service_ids.discard(service_id)
+
+    def report(self, load_state=None, task_state=None, running_state=None):
+        """
+        记录主机的状态，在下一次上报时发送；
+        """
+        for key, value in zip(STATES, (load_state, task_state,
+                                       running_state)):
+            if value is not None:
+                self._states[key] = value
+        if CONF.report_interval <= 0:
+            self.flush()
+
+    def _take(self):
+        """
+        取出待上报的内容；
+        注：取出和清空之间没有让出green thread，并发的report不会丢失；
+        """
+        states, self._states = self._states, dict()
+        report = dict(states)
+        report['host_name'] = self.host
+        if self._service_ids:
+            report['service_ids'] = sorted(self._service_ids)
+        return report
+
+    def _restore(self, report):
+        """
+        上报失败时，把没有被新值覆盖的状态放回，在下一次上报时重试；
+        心跳不需要重试；
+        """
+        for key in STATES:
+            if key in report:
+                self._states.setdefault(key, report[key])
+
+    def flush(self, context=None):
+        report = self._take()
+        if len(report) == 1:
+            return
+        context = context or xdrs.context.get_admin_context()
+        try:
+            self.conductor_api.report_host_state(context, report)
+        except Exception as ex:
+            LOG.warn(_('Failed to report the state of host %(host)s: '
+                       '%(ex)s'), {'host': self.host, 'ex': ex})
+            self._restore(report)
+
+    def start(self):
+        if self._timer is not None or CONF.report_interval <= 0:
+            return
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.flush)
+        self._timer.start(interval=CONF.report_interval,
+                          initial_delay=CONF.report_interval)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+        self.flush()
+
+
+_REPORTER = None
+
+
+def get_reporter(conductor_api=None):
+    """
+    返回本进程的主机状态上报者；第一次调用时创建，
+    conductor_api为None时使用conductor.API()；
+    """
+    global _REPORTER
+    if _REPORTER is None:
+        _REPORTER = HostStateReporter(conductor_api=conductor_api)
+    return _REPORTER
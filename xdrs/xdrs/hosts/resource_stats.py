@@ -0,0 +1,373 @@
+"""
+虚拟机实例和主机的内存、网络和磁盘I/O使用数据的采集；
+
+数据采集在计算CPU利用率（MHz）的同一个周期中调用这里的方法，采集以下数据：
+  ram：内存使用（MB）；虚拟机实例为QEMU进程的内存使用（cgroup的memory.current
+       或memory.usage_in_bytes，回退到libvirt memoryStats中的rss），
+       主机为MemTotal - MemAvailable；
+  net：网络收发速率（KB/s）；虚拟机实例为其tap设备的rx_bytes + tx_bytes
+       （直接读取/sys/class/net，回退到libvirt interfaceStats），
+       主机为所有物理网卡的收发字节数之和（/proc/net/dev）；
+  disk：块设备读写速率（KB/s）；虚拟机实例为cgroup的io.stat或
+        blkio.throttle.io_service_bytes（回退到libvirt blockStats），
+        主机为所有物理磁盘读写扇区数之和（/proc/diskstats）；
+net和disk是累计值，由相邻两个周期的差值计算速率，上一个周期的累计值保存在
+数据采集的状态previous_counters中（见collector_state）；
+
+每种数据与CPU数据一样保存在本地的环形缓冲文件中：
+  <local_data_directory>/vms_<resource>/<uuid>，<local_data_directory>/host_<resource>；
+主机数据同时由HostStateReporter上报，写入HostCpuData的<resource>_data字段，
+主机的MemTotal/MemFree写入HostCpuData的total_ram/free_ram字段（MB），
+控制节点不需要再通过RPC到每个主机读取/proc/meminfo；
+"""
+
+import os
+from xml.etree import ElementTree
+
+import libvirt
+from oslo.config import cfg
+
+from xdrs.hosts import cgroup_stats
+from xdrs.openstack.common import log as logging
+
+
+resource_stats_opts = [
+    cfg.FloatOpt('host_ram_overload_threshold',
+                 default=0.9,
+                 help='Fraction of the host RAM in use above which the host '
+                      'is overloaded'),
+    cfg.FloatOpt('host_net_overload_threshold',
+                 default=0.8,
+                 help='Fraction of host_net_capacity in use above which the '
+                      'host is overloaded'),
+    cfg.FloatOpt('host_disk_overload_threshold',
+                 default=0.8,
+                 help='Fraction of host_disk_capacity in use above which the '
+                      'host is overloaded'),
+    cfg.IntOpt('host_net_capacity',
+               default=125000,
+               help='Network throughput of the host in KB/s (rx + tx)'),
+    cfg.IntOpt('host_disk_capacity',
+               default=200000,
+               help='Block I/O throughput of the host in KB/s (read + write)'),
+    cfg.IntOpt('host_resource_overload_window',
+               default=3,
+               help='Number of the latest RAM, network and disk samples '
+                    'averaged by the overload detection'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(resource_stats_opts)
+
+LOG = logging.getLogger(__name__)
+
+RESOURCES = ('ram', 'net', 'disk')
+# 累计值，需要计算速率的数据；
+COUNTERS = ('net', 'disk')
+
+# 不计入主机磁盘I/O的块设备（虚拟设备，或者是其他块设备的组合）；
+_VIRTUAL_DISK_PREFIXES = ('loop', 'ram', 'zram', 'dm-', 'md', 'nbd')
+
+
+def local_vm_path(local_data_directory, resource):
+    """
+    建立存储本地虚拟机实例resource数据的路径；
+    """
+    return os.path.join(local_data_directory, 'vms_' + resource)
+
+
+def local_host_path(local_data_directory, resource):
+    """
+    建立存储本地主机resource数据的路径；
+    """
+    return os.path.join(local_data_directory, 'host_' + resource)
+
+
+def _read_values(path):
+    with open(path, 'r') as f:
+        return [int(x) for x in f.read().strip().splitlines()]
+
+
+def read_local_vm_data(local_data_directory, resource):
+    """
+    从本地存储文件读取所有虚拟机实例的resource数据，返回{uuid: [数值, ......]}；
+    """
+    path = local_vm_path(local_data_directory, resource)
+    if not os.path.isdir(path):
+        return dict()
+    result = dict()
+    for uuid in os.listdir(path):
+        result[uuid] = _read_values(os.path.join(path, uuid))
+    return result
+
+
+def read_local_host_data(local_data_directory, resource):
+    """
+    从本地存储文件读取本地主机的resource数据；
+    """
+    path = local_host_path(local_data_directory, resource)
+    if not os.access(path, os.F_OK):
+        return []
+    return _read_values(path)
+
+
+"""
+********
+* host *
+********
+"""
+def _read_meminfo(proc_root):
+    meminfo = dict()
+    with open(os.path.join(proc_root, 'meminfo')) as f:
+        for line in f:
+            key, _sep, value = line.partition(':')
+            fields = value.split()
+            if fields:
+                meminfo[key] = int(fields[0])
+    return meminfo
+
+
+def _is_physical_nic(sys_root, name):
+    return os.path.exists(os.path.join(sys_root, 'class', 'net', name,
+                                       'device'))
+
+
+def _read_host_net_bytes(proc_root, sys_root):
+    """
+    主机所有物理网卡收发的字节数之和；
+    注：虚拟机实例的流量还会经过tap设备和网桥，只统计物理网卡以免重复计算；
+    """
+    total = 0
+    with open(os.path.join(proc_root, 'net', 'dev')) as f:
+        for line in f.readlines()[2:]:
+            name, _sep, data = line.partition(':')
+            name = name.strip()
+            if name == 'lo' or not _is_physical_nic(sys_root, name):
+                continue
+            fields = data.split()
+            total += int(fields[0]) + int(fields[8])
+    return total
+
+
+def _read_host_disk_bytes(proc_root, sys_root):
+    """
+    主机所有物理磁盘读写的字节数之和（不包括分区和虚拟块设备）；
+    """
+    try:
+        disks = set(name for name in os.listdir(os.path.join(sys_root,
+                                                             'block'))
+                    if not name.startswith(_VIRTUAL_DISK_PREFIXES))
+    except OSError:
+        disks = None
+    total = 0
+    with open(os.path.join(proc_root, 'diskstats')) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            if disks is not None and fields[2] not in disks:
+                continue
+            total += (int(fields[5]) + int(fields[9])) * 512
+    return total
+
+
+def read_host_counters(proc_root='/proc', sys_root='/sys'):
+    """
+    读取主机的内存使用（字节）和网络、磁盘的累计字节数，
+    返回(counters, meminfo)，meminfo = {'MemTotal': MB, 'MemFree': MB}；
+    """
+    meminfo = _read_meminfo(proc_root)
+    total = meminfo.get('MemTotal', 0)
+    available = meminfo.get('MemAvailable')
+    if available is None:
+        available = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + \
+            meminfo.get('Cached', 0)
+    counters = {'ram': (total - available) * 1024,
+                'net': _read_host_net_bytes(proc_root, sys_root),
+                'disk': _read_host_disk_bytes(proc_root, sys_root)}
+    return counters, {'MemTotal': total // 1024, 'MemFree': available // 1024}
+
+
+"""
+******
+* vm *
+******
+"""
+def _parse_devices(xml):
+    """
+    从domain的XML描述中获取网络接口和磁盘的设备名称；
+    """
+    devices = ElementTree.fromstring(xml).find('devices')
+    if devices is None:
+        return (), ()
+    interfaces = tuple(target.get('dev')
+                       for target in devices.findall('interface/target')
+                       if target.get('dev'))
+    disks = tuple(target.get('dev')
+                  for target in devices.findall('disk/target')
+                  if target.get('dev'))
+    return interfaces, disks
+
+
+class VmResourceReader(object):
+    """
+    读取虚拟机实例的内存使用和网络、磁盘的累计字节数；
+    每个虚拟机实例的网络接口和磁盘设备名称只在第一次读取时从domain的XML
+    描述中解析一次；
+    """
+
+    def __init__(self, sys_root='/sys'):
+        self.sys_root = sys_root
+        # uuid --> (网络接口设备名称, 磁盘设备名称)；
+        self._devices = dict()
+
+    def _lookup(self, vir_connection, uuid, domains):
+        if uuid not in domains:
+            try:
+                domains[uuid] = vir_connection.lookupByUUIDString(uuid)
+            except libvirt.libvirtError:
+                domains[uuid] = None
+        return domains[uuid]
+
+    def _get_devices(self, vir_connection, uuid, domains):
+        devices = self._devices.get(uuid)
+        if devices is None:
+            domain = self._lookup(vir_connection, uuid, domains)
+            if domain is None:
+                return (), ()
+            try:
+                devices = _parse_devices(domain.XMLDesc(0))
+            except (libvirt.libvirtError, ElementTree.ParseError):
+                return (), ()
+            self._devices[uuid] = devices
+        return devices
+
+    def _read_sysfs_net_bytes(self, interfaces):
+        total = 0
+        for dev in interfaces:
+            path = os.path.join(self.sys_root, 'class', 'net', dev,
+                                'statistics')
+            try:
+                for name in ('rx_bytes', 'tx_bytes'):
+                    with open(os.path.join(path, name)) as f:
+                        total += int(f.read())
+            except (IOError, OSError, ValueError):
+                return None
+        return total
+
+    def _read_libvirt(self, domain, key, interfaces, disks):
+        try:
+            if key == 'ram':
+                stats = domain.memoryStats()
+                return stats['rss'] * 1024 if 'rss' in stats else None
+            if key == 'net':
+                return sum(stats[0] + stats[4] for stats in
+                           (domain.interfaceStats(dev) for dev in interfaces))
+            return sum(stats[1] + stats[3] for stats in
+                       (domain.blockStats(dev) for dev in disks))
+        except libvirt.libvirtError:
+            return None
+
+    def read(self, vir_connection, uuids):
+        """
+        返回{uuid: {'ram': 字节, 'net': 累计字节, 'disk': 累计字节}}；
+        优先从cgroup和sysfs读取，读取不到的数据通过libvirt获取；
+        """
+        uuids = set(uuids)
+        for uuid in list(self._devices):
+            if uuid not in uuids:
+                del self._devices[uuid]
+
+        cgroup_values = {'ram': dict(), 'disk': dict()}
+        stats = cgroup_stats.get_stats()
+        if stats is not None:
+            resolve_uuid = cgroup_stats.libvirt_uuid_resolver(vir_connection)
+            cgroup_values['ram'] = stats.read_memory(resolve_uuid)
+            cgroup_values['disk'] = stats.read_io_bytes(resolve_uuid)
+
+        domains = dict()
+        result = dict()
+        for uuid in uuids:
+            interfaces, disks = self._get_devices(vir_connection, uuid,
+                                                  domains)
+            values = {'ram': cgroup_values['ram'].get(uuid),
+                      'net': self._read_sysfs_net_bytes(interfaces),
+                      'disk': cgroup_values['disk'].get(uuid)}
+            for key in RESOURCES:
+                if values[key] is None:
+                    domain = self._lookup(vir_connection, uuid, domains)
+                    if domain is not None:
+                        values[key] = self._read_libvirt(domain, key,
+                                                         interfaces, disks)
+            result[uuid] = dict((key, value) for key, value in values.items()
+                                if value is not None)
+        return result
+
+
+def calculate_samples(previous, current, elapsed):
+    """
+    由上一个周期和当前周期的读取结果计算一个采样：
+    ram为内存使用（MB），net和disk为速率（KB/s）；
+    累计值变小（例如虚拟机实例重启）或者没有上一个周期的值时不计算速率；
+    """
+    samples = dict()
+    if 'ram' in current:
+        samples['ram'] = int(current['ram'] // 1048576)
+    for key in COUNTERS:
+        if key in current and key in previous and elapsed > 0 and \
+                current[key] >= previous[key]:
+            samples[key] = int((current[key] - previous[key]) /
+                               (1024.0 * elapsed))
+    return samples
+
+
+"""
+******************
+* load detection *
+******************
+"""
+def host_utilization(local_data_directory, host_ram):
+    """
+    由本地保存的主机数据计算每种资源的利用率序列，
+    返回{resource: [利用率, ......]}；host_ram：主机的内存（MB）；
+    """
+    capacity = {'ram': host_ram,
+                'net': CONF.host_net_capacity,
+                'disk': CONF.host_disk_capacity}
+    result = dict()
+    for resource in RESOURCES:
+        if not capacity[resource]:
+            continue
+        result[resource] = [float(x) / capacity[resource] for x in
+                            read_local_host_data(local_data_directory,
+                                                 resource)]
+    return result
+
+
+def overloaded_resources(utilization):
+    """
+    返回最近host_resource_overload_window个采样的平均利用率超过阈值的资源；
+    """
+    thresholds = {'ram': CONF.host_ram_overload_threshold,
+                  'net': CONF.host_net_overload_threshold,
+                  'disk': CONF.host_disk_overload_threshold}
+    window = max(1, CONF.host_resource_overload_window)
+    overloaded = []
+    for resource in RESOURCES:
+        values = utilization.get(resource, [])[-window:]
+        if values and sum(values) / len(values) > thresholds[resource]:
+            overloaded.append(resource)
+    return overloaded
+
+
+_READER = None
+
+
+def get_reader():
+    """
+    返回本进程的VmResourceReader（保存了虚拟机实例设备名称的缓存）；
+    """
+    global _READER
+    if _READER is None:
+        _READER = VmResourceReader()
+    return _READER
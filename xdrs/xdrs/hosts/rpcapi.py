@@ -1,7 +1,11 @@
+import eventlet
 from oslo.config import cfg
 from oslo import messaging
 
+from xdrs import cpu_data_codec
 from xdrs.objects import base as objects_base
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
 from xdrs import rpc
 
 
@@ -9,8 +13,61 @@ CONF = cfg.CONF
 CONF.import_opt('xdrs_host_topic', 'xdrs.service')
 CONF.import_opt('xdrs_global_topic', 'xdrs.service')
 
+rpcapi_cap_opt = cfg.StrOpt('hosts',
+        help='Set a version cap for messages sent to host services')
+CONF.register_opt(rpcapi_cap_opt, 'upgrade_levels')
+
+host_gather_opts = [
+    cfg.IntOpt('host_rpc_gather_timeout',
+               default=10,
+               help='Per-host timeout in seconds for scatter-gather calls '
+                    'to host services'),
+    cfg.IntOpt('host_rpc_gather_pool_size',
+               default=0,
+               help='Maximum number of host services called concurrently '
+                    'by one scatter-gather request; 0 calls every host at '
+                    'once. With a positive limit N hosts take up to '
+                    'ceil(N / limit) timeout windows'),
+]
+CONF.register_opts(host_gather_opts)
+
+LOG = logging.getLogger(__name__)
+
+
+class HostCallError(object):
+    """
+    scatter-gather结果中的错误标记；
+    某一主机调用超时或者出错时，结果字典中该主机对应的值为此对象，
+    其余主机的结果不受影响；
+    """
+
+    def __init__(self, host, error):
+        self.host = host
+        self.error = error
+        self.timeout = isinstance(error, messaging.MessagingTimeout)
+
+    def __repr__(self):
+        return '<HostCallError host=%s timeout=%s error=%r>' % (
+            self.host, self.timeout, self.error)
+
+
+def is_host_call_error(value):
+    return isinstance(value, HostCallError)
+
 
 class HostRPCAPI(object):
+    """
+    版本历史：
+    1.0 - 初始版本；
+    1.1 - get_vm_cpu_data_by_vm_id改为call，并增加cpu_data_encoding参数；
+    1.2 - compute_host_cpu_mhz返回主机CPU使用数据；
+          get_meminfo_by_id/get_vms_ram_on_specific/compute_host_cpu_mhz改为call；
+    """
+
+    VERSION_ALIASES = {
+        'icehouse': '1.0',
+    }
+
     def __init__(self):
         super(HostRPCAPI, self).__init__()
         target = messaging.Target(topic=CONF.xdrs_host_topic)
@@ -22,37 +79,104 @@ class HostRPCAPI(object):
 
     # Cells overrides this
     def get_client(self, target, serializer):
+        version_cap = self.VERSION_ALIASES.get(CONF.upgrade_levels.hosts,
+                                               CONF.upgrade_levels.hosts)
         return rpc.get_client(target,
+                              version_cap=version_cap,
                               serializer=serializer)
     
+    """
+    ******************
+    * scatter-gather *
+    ******************
+    """
+    def gather(self, context, method, hosts_kwargs, version=None,
+               timeout=None):
+        """
+        并发地向多个主机发送同一RPC调用；
+        host_rpc_gather_pool_size为0时每个主机一个绿色线程，所有主机共用一个超时窗口；
+        hosts_kwargs：{host: 该主机调用的参数字典}；
+        返回{host: 调用结果}，超时或者出错的主机对应HostCallError；
+        """
+        if timeout is None:
+            timeout = CONF.host_rpc_gather_timeout
+
+        def _call(host):
+            cctxt = self.client.prepare(server=host, version=version,
+                                        timeout=timeout)
+            try:
+                return host, cctxt.call(context, method,
+                                        **hosts_kwargs[host])
+            except Exception as ex:
+                LOG.warn(_('Host %(host)s failed to answer %(method)s: '
+                           '%(error)s'),
+                         {'host': host, 'method': method, 'error': ex})
+                return host, HostCallError(host, ex)
+
+        pool_size = len(hosts_kwargs)
+        if CONF.host_rpc_gather_pool_size > 0:
+            pool_size = min(CONF.host_rpc_gather_pool_size, pool_size)
+        pool_size = max(1, pool_size)
+        pool = eventlet.GreenPool(pool_size)
+        return dict(pool.imap(_call, list(hosts_kwargs)))
+
     def get_vm_cpu_data_by_vm_id(self, context, vm_id, host_name):
-        cctxt = self.client.prepare(server = host_name)
-        cctxt.cast(context, 'get_vm_cpu_data_by_vm_id', vm_id=vm_id)
-    
+        if self.client.can_send_version('1.1'):
+            cctxt = self.client.prepare(server=host_name, version='1.1')
+            result = cctxt.call(context, 'get_vm_cpu_data_by_vm_id',
+                                vm_id=vm_id,
+                                cpu_data_encoding=cpu_data_codec.ENCODING)
+            return cpu_data_codec.decode_rows(result)
+        cctxt = self.client.prepare(server=host_name)
+        return cctxt.call(context, 'get_vm_cpu_data_by_vm_id', vm_id=vm_id)
+
     """
     ****************
     * host_meminfo *
     ****************
     """
     def get_meminfo_by_id(self, context, host_id):
-        cctxt = self.client.prepare(server = host_id)
-        cctxt.cast(context, 'get_meminfo_by_id')
-        
-    
+        cctxt = self.client.prepare(server=host_id)
+        return cctxt.call(context, 'get_meminfo_by_id')
+
+    def gather_meminfo(self, context, hosts, timeout=None):
+        return self.gather(context, 'get_meminfo_by_id',
+                           dict((host, {}) for host in hosts),
+                           timeout=timeout)
+
     """
     *******************
     * vms on host ram *
     *******************
     """
     def get_vms_ram_on_specific(self, context, vms_list, host_uuid):
-        cctxt = self.client.prepare(server = host_uuid)
-        cctxt.cast(context, 'get_vms_ram_on_specific', vms_list=vms_list)
-    
+        cctxt = self.client.prepare(server=host_uuid)
+        return cctxt.call(context, 'get_vms_ram_on_specific',
+                          vms_list=vms_list)
+
+    def gather_vms_ram(self, context, hosts_vms, timeout=None):
+        """
+        hosts_vms：{host: vms_list}；
+        """
+        return self.gather(context, 'get_vms_ram_on_specific',
+                           dict((host, {'vms_list': list(vms_list)})
+                                for host, vms_list in hosts_vms.items()),
+                           timeout=timeout)
+
     def compute_host_cpu_mhz(self, context, host_uuid_temp):
-        cctxt = self.client.prepare(server = host_uuid_temp)
-        cctxt.cast(context, 'compute_host_cpu_mhz', host_uuid_temp=host_uuid_temp)
-    
-    
+        version = '1.2' if self.client.can_send_version('1.2') else None
+        cctxt = self.client.prepare(server=host_uuid_temp, version=version)
+        return cctxt.call(context, 'compute_host_cpu_mhz',
+                          host_uuid_temp=host_uuid_temp)
+
+    def gather_host_cpu_mhz(self, context, hosts, timeout=None):
+        version = '1.2' if self.client.can_send_version('1.2') else None
+        return self.gather(context, 'compute_host_cpu_mhz',
+                           dict((host, {'host_uuid_temp': host})
+                                for host in hosts),
+                           version=version, timeout=timeout)
+
+
 class HostToGlobalRPCAPI(object):
     def __init__(self):
         super(HostToGlobalRPCAPI, self).__init__()
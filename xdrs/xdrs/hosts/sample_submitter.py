@@ -0,0 +1,382 @@
+"""
+数据采集采样的异步提交；
+
+数据采集每个周期只把采样交给本进程唯一的SampleSubmitter（只是追加到内存队列），
+不再等待conductor和数据库，采集周期不会因为conductor缓慢或者不可用而延长；
+提交者每隔sample_submit_interval秒把队列中的采样合并为一次submit_samples调用：
+  1.本地spool为空时直接提交内存队列中的采样，提交失败时把这些采样写入spool；
+  2.spool不为空时先把内存队列写入spool（一次写入、一次fsync），
+    再从spool中按顺序读出采样，每sample_submit_batch_size个合并为一次调用，
+    提交成功后才推进spool的读取位置；
+conductor恢复之后，积压的采样按照采集的顺序重放，每个虚拟机实例/主机的采样
+在一批中合并为一个列表，由conductor在一个事务中写入（见db.samples_submit）；
+
+spool是<local_data_directory>/spool下的一组段文件（每行一个JSON格式的采样），
+写满sample_spool_segment_size字节后换下一个段文件，读取位置保存在cursor文件中，
+已经读完的段文件被删除；spool总大小超过sample_spool_max_size时丢弃最旧的段文件；
+注：内存队列中还没有写入spool的采样（最多一个提交周期）在进程崩溃时会丢失；
+"""
+
+import collections
+import os
+import time
+
+from oslo.config import cfg
+
+from xdrs import conductor
+import xdrs.context
+from xdrs.hosts import schedule
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import jsonutils
+from xdrs.openstack.common import log as logging
+from xdrs.openstack.common import loopingcall
+
+
+sample_submitter_opts = [
+    cfg.IntOpt('sample_submit_interval',
+               default=5,
+               help='Seconds between two submissions of the collected '
+                    'samples to the conductor; 0 submits every sample '
+                    'immediately'),
+    cfg.IntOpt('sample_queue_size',
+               default=1000,
+               help='Number of samples kept in memory before they are '
+                    'written to the local spool'),
+    cfg.IntOpt('sample_submit_batch_size',
+               default=100,
+               help='Maximum number of samples merged into one conductor '
+                    'call'),
+    cfg.IntOpt('sample_spool_segment_size',
+               default=1048576,
+               help='Size in bytes of a spool segment file'),
+    cfg.IntOpt('sample_spool_max_size',
+               default=67108864,
+               help='Maximum size in bytes of the local sample spool; the '
+                    'oldest segments are dropped beyond it, 0 means no '
+                    'limit'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(sample_submitter_opts)
+CONF.import_opt('local_data_directory', 'xdrs.service')
+CONF.import_opt('data_collector_data_length', 'xdrs.service')
+
+LOG = logging.getLogger(__name__)
+
+SPOOL_DIRECTORY = 'spool'
+_SEGMENT_SUFFIX = '.seg'
+_CURSOR_FILE = 'cursor'
+
+
+class Spool(object):
+    """
+    按顺序保存采样的本地段文件；
+    读取位置cursor = (段序号, 段内偏移)，序号小于cursor的段文件已经读完并被删除；
+    """
+
+    def __init__(self, directory, segment_size=None, max_size=None):
+        self.directory = directory
+        self.segment_size = segment_size or CONF.sample_spool_segment_size
+        self.max_size = CONF.sample_spool_max_size if max_size is None \
+            else max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._file = None
+        segments = self._segments()
+        cursor = self._read_cursor()
+        # 不在已有的段文件之后追加，其中可能有进程崩溃时没有写完的行；
+        self._write_seq = segments[-1] + 1 if segments else cursor[0]
+        if cursor[0] not in segments:
+            cursor = (segments[0], 0) if segments else (self._write_seq, 0)
+        self._cursor = cursor
+
+    def _path(self, seq):
+        return os.path.join(self.directory, '%012d%s' % (seq, _SEGMENT_SUFFIX))
+
+    def _segments(self):
+        return sorted(int(name[:-len(_SEGMENT_SUFFIX)])
+                      for name in os.listdir(self.directory)
+                      if name.endswith(_SEGMENT_SUFFIX))
+
+    def _read_cursor(self):
+        try:
+            with open(os.path.join(self.directory, _CURSOR_FILE)) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except (IOError, OSError, ValueError):
+            return 0, 0
+
+    def _write_cursor(self):
+        path = os.path.join(self.directory, _CURSOR_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('%d %d\n' % self._cursor)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, path)
+
+    @property
+    def cursor(self):
+        return self._cursor
+
+    def empty(self):
+        segments = self._segments()
+        if not segments:
+            return True
+        if segments[-1] > self._cursor[0]:
+            return False
+        return os.path.getsize(self._path(self._cursor[0])) <= \
+            self._cursor[1]
+
+    def write(self, records):
+        """
+        把records追加到当前的段文件，只进行一次fsync；
+        """
+        if not records:
+            return
+        if self._file is None:
+            self._file = open(self._path(self._write_seq), 'ab')
+        self._file.write(''.join(jsonutils.dumps(record) + '\n'
+                                 for record in records).encode('utf-8'))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._file.tell() >= self.segment_size:
+            self._file.close()
+            self._file = None
+            self._write_seq += 1
+        self._trim()
+
+    def _trim(self):
+        if not self.max_size:
+            return
+        segments = self._segments()
+        sizes = dict((seq, os.path.getsize(self._path(seq)))
+                     for seq in segments)
+        total = sum(sizes.values())
+        for seq in segments[:-1]:
+            if total <= self.max_size:
+                break
+            LOG.warn(_('Sample spool %(directory)s exceeds %(max_size)d '
+                       'bytes, dropping segment %(seq)d'),
+                     {'directory': self.directory,
+                      'max_size': self.max_size, 'seq': seq})
+            os.remove(self._path(seq))
+            total -= sizes[seq]
+            if self._cursor[0] <= seq:
+                self._cursor = (seq + 1, 0)
+                self._write_cursor()
+
+    def read(self, max_records):
+        """
+        从读取位置开始按顺序读取最多max_records个采样，
+        返回(records, cursor)，提交成功后调用commit(cursor)；
+        """
+        records = []
+        seq, offset = self._cursor
+        for segment in self._segments():
+            if segment < seq:
+                continue
+            if segment > seq:
+                seq, offset = segment, 0
+            with open(self._path(segment), 'rb') as f:
+                f.seek(offset)
+                while len(records) < max_records:
+                    line = f.readline()
+                    # 没有换行符的是进程崩溃时没有写完的行；
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    try:
+                        records.append(jsonutils.loads(line.decode('utf-8')))
+                    except ValueError:
+                        LOG.warn(_('Skipping a corrupt sample in %s'),
+                                 self._path(segment))
+            if len(records) >= max_records or segment >= self._write_seq:
+                break
+        return records, (seq, offset)
+
+    def commit(self, cursor):
+        """
+        推进读取位置，删除已经读完的段文件；
+        """
+        self._cursor = cursor
+        self._write_cursor()
+        for segment in self._segments():
+            if segment >= cursor[0]:
+                break
+            os.remove(self._path(segment))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SampleSubmitter(object):
+
+    def __init__(self, host=None, conductor_api=None, spool=None):
+        self.host = host or CONF.host
+        self.conductor_api = conductor_api or conductor.API()
+        self.spool = spool or Spool(os.path.join(CONF.local_data_directory,
+                                                 SPOOL_DIRECTORY))
+        self._queue = collections.deque()
+        self._summaries = dict()
+        self._in_flight = False
+        self._timer = None
+
+    def submit(self, vms=None, cpu_mhz=None, resources=None, meminfo=None):
+        """
+        记录一个采集周期的采样，在下一次提交时发送；不会阻塞；
+        vms：{uuid: cpu_mhz}；cpu_mhz、resources、meminfo：主机的采样，
+        同HostStateReporter.report；
+        """
+        record = {'time': time.time()}
+        for key, value in (('vms', vms), ('cpu_mhz', cpu_mhz),
+                           ('resources', resources), ('meminfo', meminfo)):
+            if value is not None:
+                record[key] = value
+        self._queue.append(record)
+        # 正在提交时内存队列中的采样可能要先于新的采样写入spool，
+        # 此时队列可以暂时超过sample_queue_size；
+        if len(self._queue) >= CONF.sample_queue_size and \
+                not self._in_flight:
+            self._spill()
+        if CONF.sample_submit_interval <= 0:
+            self.flush()
+
+    def set_summaries(self, cpu_sketch=None, vm_percentiles=None):
+        """
+        记录主机最新的CPU分位数草图和虚拟机实例最新的分位数（见sketch_store），
+        随下一次提交的采样一起发送；它们是最新的状态而不是历史，
+        只保留最新的值，不写入spool；
+        """
+        # 不修改正在发送的字典，发送成功后只清除已经发送的值；
+        summaries = dict(self._summaries)
+        if cpu_sketch is not None:
+            summaries['cpu_sketch'] = cpu_sketch
+        if vm_percentiles:
+            vms = dict(summaries.get('vm_percentiles', {}))
+            vms.update(vm_percentiles)
+            summaries['vm_percentiles'] = vms
+        self._summaries = summaries
+
+    def _spill(self, records=None):
+        records = list(records or []) + list(self._queue)
+        self._queue.clear()
+        try:
+            self.spool.write(records)
+        except (IOError, OSError) as ex:
+            LOG.error(_('Failed to spool %(count)d samples: %(ex)s'),
+                      {'count': len(records), 'ex': ex})
+
+    def _coalesce(self, records):
+        """
+        把多个采样合并为一次submit_samples调用的参数；
+        """
+        length = int(CONF.data_collector_data_length)
+        cpu_samples = []
+        resource_samples = dict()
+        vm_samples = dict()
+        batch = {'host_name': self.host, 'cpu_data_length': length}
+        for record in records:
+            if record.get('cpu_mhz') is not None:
+                cpu_samples.append(record['cpu_mhz'])
+            for resource, value in record.get('resources', {}).items():
+                resource_samples.setdefault(resource, []).append(value)
+            for uuid, value in record.get('vms', {}).items():
+                vm_samples.setdefault(uuid, []).append(value)
+            if record.get('meminfo'):
+                batch['meminfo'] = record['meminfo']
+        if cpu_samples:
+            batch['cpu_samples'] = cpu_samples[-length:]
+        if resource_samples:
+            batch['resource_samples'] = dict(
+                (resource, samples[-length:])
+                for resource, samples in resource_samples.items())
+        if vm_samples:
+            batch['vm_samples'] = dict(
+                (uuid, samples[-length:])
+                for uuid, samples in vm_samples.items())
+        return batch
+
+    def _send(self, context, records):
+        self._in_flight = True
+        summaries = self._summaries
+        batch = self._coalesce(records)
+        batch.update(summaries)
+        try:
+            self.conductor_api.submit_samples(context, batch)
+            if self._summaries is summaries:
+                self._summaries = dict()
+            return True
+        except Exception as ex:
+            LOG.warn(_('Failed to submit %(count)d samples of host '
+                       '%(host)s: %(ex)s'),
+                     {'count': len(records), 'host': self.host, 'ex': ex})
+            return False
+        finally:
+            self._in_flight = False
+
+    def flush(self, context=None):
+        if self._in_flight:
+            return
+        context = context or xdrs.context.get_admin_context()
+        batch_size = max(1, CONF.sample_submit_batch_size)
+
+        if self.spool.empty():
+            while self._queue or self._summaries:
+                records = [self._queue.popleft() for _i in
+                           range(min(batch_size, len(self._queue)))]
+                if not self._send(context, records):
+                    self._spill(records)
+                    return
+            return
+
+        self._spill()
+        while True:
+            records, cursor = self.spool.read(batch_size)
+            if not records:
+                # 跳过了已经读完的段文件时，同样需要删除这些段文件；
+                if cursor != self.spool.cursor:
+                    self.spool.commit(cursor)
+                if self._summaries:
+                    self._send(context, [])
+                return
+            if not self._send(context, records):
+                return
+            self.spool.commit(cursor)
+
+    def start(self):
+        if self._timer is not None or CONF.sample_submit_interval <= 0:
+            return
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.flush)
+        # 各个主机按照各自的相位提交，而不是在同时重启之后一起提交；
+        phase = schedule.PhaseSchedule(CONF.sample_submit_interval)
+        self._timer.start(interval=CONF.sample_submit_interval,
+                          initial_delay=phase.delay())
+
+    def stop(self):
+        """
+        停止定时提交，尝试提交剩余的采样，提交失败的采样保存在spool中；
+        """
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+        self.flush()
+        if self._queue and not self._in_flight:
+            self._spill()
+        self.spool.close()
+
+
+_SUBMITTER = None
+
+
+def get_submitter(conductor_api=None):
+    """
+    返回本进程的采样提交者；第一次调用时创建，
+    conductor_api为None时使用conductor.API()；
+    """
+    global _SUBMITTER
+    if _SUBMITTER is None:
+        _SUBMITTER = SampleSubmitter(conductor_api=conductor_api)
+    return _SUBMITTER
@@ -0,0 +1,100 @@
+"""
+主机周期任务（数据采集、负载检测、采样提交）的错开调度；
+
+以前每个主机的周期任务启动时随机等待一段时间，之后按照固定的间隔循环执行，
+每次执行的耗时使执行时间点逐渐漂移，所有主机同时重启之后又会聚集在一起，
+conductor和数据库在同一时刻收到所有主机的请求；
+
+这里每个主机在interval中有一个固定的相位（phase）：
+  phase = hash(主机标识) % interval（毫秒精度），
+第n次执行的时间点是墙上时钟的n * interval + phase（从UNIX纪元起算），
+每次都按照当前时间重新计算下一个时间点，执行耗时不会累积为漂移，
+执行超时时跳过已经错过的时间点；重启后的主机仍然回到原来的相位，
+所有主机的执行时间点均匀地分布在interval中；
+slot_map返回一组主机的相位，用于查看和检查主机的分布；
+"""
+
+import hashlib
+import time
+
+from oslo.config import cfg
+
+
+schedule_opts = [
+    cfg.StrOpt('schedule_host_key',
+               help='Identifier of this host hashed into the phase of its '
+                    'periodic tasks within the interval; defaults to the '
+                    'service host (the host option). Hosts with the same '
+                    'key run at the same time'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(schedule_opts)
+
+
+def host_key():
+    """
+    返回本主机的标识：schedule_host_key，没有配置时为服务的主机名称CONF.host，
+    与get_schedule_slots列出的服务主机名称一致（见hosts/manager.py）；
+    """
+    return CONF.schedule_host_key or CONF.host
+
+
+def phase_offset(key, interval):
+    """
+    返回主机标识key在interval（秒）中的相位（秒）；
+    使用md5而不是hash()，保证不同进程、不同主机计算的结果相同；
+    """
+    if interval <= 0:
+        return 0.0
+    digest = int(hashlib.md5(key.encode('utf-8')).hexdigest()[:15], 16)
+    return digest % int(interval * 1000) / 1000.0
+
+
+def next_run(interval, offset, now):
+    """
+    返回now之后（不含now）第一个n * interval + offset的时间点；
+    """
+    return now - (now - offset) % interval + interval
+
+
+def slot_map(keys, interval):
+    """
+    返回一组主机的相位：[(相位, 主机标识), ...]，按照相位排序；
+    """
+    return sorted((phase_offset(key, interval), key) for key in keys)
+
+
+class PhaseSchedule(object):
+    """
+    按照本主机的相位，在墙上时钟对齐的时间点执行周期任务；
+    """
+
+    def __init__(self, interval, key=None):
+        self.interval = interval
+        self.key = key or host_key()
+        self.offset = phase_offset(self.key, interval)
+
+    def set_interval(self, interval):
+        """
+        周期改变时（见xdrs.hosts.adaptive_interval）按照新的周期重新计算相位；
+        """
+        if interval != self.interval:
+            self.interval = interval
+            self.offset = phase_offset(self.key, interval)
+
+    def delay(self, now=None):
+        """
+        返回距离下一个执行时间点的秒数；
+        """
+        now = time.time() if now is None else now
+        return next_run(self.interval, self.offset, now) - now
+
+    def wait(self):
+        """
+        等待到下一个执行时间点，返回该时间点；
+        """
+        now = time.time()
+        scheduled = next_run(self.interval, self.offset, now)
+        time.sleep(scheduled - now)
+        return scheduled
@@ -0,0 +1,169 @@
+"""
+数据采集维护的虚拟机实例和主机CPU使用的分位数草图（见xdrs.quantile_sketch）；
+
+数据采集每个周期把每个虚拟机实例的CPU MHz和主机总的CPU MHz加入各自的草图，
+草图保存在进程内存中，并与本地数据文件放在一起：
+  <local_data_directory>/vms_sketch/<uuid>、<local_data_directory>/host_sketch，
+文件中同时保存计算好的p50、p95、p99，负载检测和虚拟机选取读取分位数时
+不需要读取历史数据，也不需要计算（read_percentiles）；
+主机的草图和虚拟机实例的分位数随采样提交到中央数据库
+（HostCpuData.cpu_sketch、VmCpuData.cpu_percentiles），
+API在主机和虚拟机实例CPU数据的详细信息中返回它们（cpu_percentiles）；
+分位数覆盖最近quantile_sketch_window到2 * quantile_sketch_window个采样，
+与检测算法的last_n无关；
+"""
+
+import os
+
+from oslo.config import cfg
+
+from xdrs.hosts import resource_stats
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import jsonutils
+from xdrs.openstack.common import log as logging
+from xdrs import quantile_sketch
+
+
+sketch_store_opts = [
+    cfg.IntOpt('quantile_sketch_k',
+               default=quantile_sketch.DEFAULT_K,
+               help='Size parameter of the CPU usage quantile sketches; '
+                    'the rank error is about 1.7 / k'),
+    cfg.IntOpt('quantile_sketch_window',
+               default=1000,
+               help='Number of samples after which a quantile sketch '
+                    'starts a new window; percentiles cover the last one '
+                    'to two windows, so with the default of 1000 a "p95" '
+                    'is taken over the last 1000 to 2000 samples rather '
+                    'than over the last_n samples of the detectors. Set '
+                    'it to about half of the detectors\' last_n to make '
+                    'the sketch percentiles cover a similar history'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(sketch_store_opts)
+CONF.import_opt('local_data_directory', 'xdrs.service')
+
+LOG = logging.getLogger(__name__)
+
+SKETCH = 'sketch'
+
+
+def local_vm_path(local_data_directory):
+    return resource_stats.local_vm_path(local_data_directory, SKETCH)
+
+
+def local_host_path(local_data_directory):
+    return resource_stats.local_host_path(local_data_directory, SKETCH)
+
+
+def read_percentiles(path):
+    """
+    读取草图文件中保存的分位数{'p50': XXX, 'p95': XXX, 'p99': XXX}，
+    文件不存在时返回None；
+    """
+    try:
+        with open(path) as f:
+            return jsonutils.loads(f.read())['percentiles']
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+
+def read_vm_percentiles(local_data_directory, uuids):
+    path = local_vm_path(local_data_directory)
+    result = dict()
+    for uuid in uuids:
+        value = read_percentiles(os.path.join(path, uuid))
+        if value is not None:
+            result[uuid] = value
+    return result
+
+
+def read_host_percentiles(local_data_directory):
+    return read_percentiles(local_host_path(local_data_directory))
+
+
+class SketchStore(object):
+
+    def __init__(self, local_data_directory=None):
+        self.directory = local_data_directory or CONF.local_data_directory
+        self.vm_path = local_vm_path(self.directory)
+        self.host_path = local_host_path(self.directory)
+        self._vms = dict()
+        self._host = None
+        self.vm_percentiles = dict()
+        self.host_percentiles = None
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                return quantile_sketch.WindowedSketch.from_dict(
+                    jsonutils.loads(f.read())['sketch'])
+        except (IOError, OSError, ValueError, KeyError):
+            return quantile_sketch.WindowedSketch(CONF.quantile_sketch_window,
+                                                  CONF.quantile_sketch_k)
+
+    def _save(self, path, sketch, percentiles):
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(jsonutils.dumps({'sketch': sketch.to_dict(),
+                                         'percentiles': percentiles},
+                                        separators=(',', ':')))
+            os.rename(tmp_path, path)
+        except (IOError, OSError) as ex:
+            LOG.warn(_('Failed to write the quantile sketch %(path)s: '
+                       '%(ex)s'), {'path': path, 'ex': ex})
+
+    def update(self, vm_samples, host_sample):
+        """
+        把一个周期的采样加入草图：vm_samples为{uuid: cpu_mhz}，
+        host_sample为主机总的CPU MHz；更新并保存各自的分位数；
+        """
+        if not os.path.isdir(self.vm_path):
+            os.makedirs(self.vm_path)
+        for uuid, value in vm_samples.items():
+            path = os.path.join(self.vm_path, uuid)
+            sketch = self._vms.get(uuid)
+            if sketch is None:
+                sketch = self._vms[uuid] = self._load(path)
+            sketch.update(value)
+            percentiles = quantile_sketch.percentiles(sketch.merged())
+            self.vm_percentiles[uuid] = percentiles
+            self._save(path, sketch, percentiles)
+        if self._host is None:
+            self._host = self._load(self.host_path)
+        self._host.update(host_sample)
+        self.host_percentiles = quantile_sketch.percentiles(
+            self._host.merged())
+        self._save(self.host_path, self._host, self.host_percentiles)
+
+    def host_sketch(self):
+        """
+        返回主机的草图（覆盖当前和上一个窗口，序列化的KLLSketch），
+        用于提交到中央数据库；
+        """
+        if self._host is None:
+            return None
+        return self._host.merged().to_dict()
+
+    def forget(self, uuids):
+        """
+        丢弃已经删除的虚拟机实例的草图（本地文件由vm_inventory清除）；
+        """
+        for uuid in uuids:
+            self._vms.pop(uuid, None)
+            self.vm_percentiles.pop(uuid, None)
+
+
+_STORE = None
+
+
+def get_store():
+    """
+    返回本进程的草图存储；
+    """
+    global _STORE
+    if _STORE is None:
+        _STORE = SketchStore()
+    return _STORE
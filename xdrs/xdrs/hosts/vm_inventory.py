@@ -0,0 +1,298 @@
+"""
+由libvirt虚拟机实例生命周期事件维护的本地主机虚拟机实例清单；
+
+数据采集以前每个周期列出<local_data_directory>/vms目录（上一个周期的虚拟机实例），
+再通过libvirt列出并逐个查找所有运行中的domain（当前的虚拟机实例），比较两个列表
+得到新增和删除的虚拟机实例；
+
+这里订阅libvirt的domain生命周期事件，增量地维护运行中的虚拟机实例集合：
+  STARTED（启动、恢复快照、迁移进入本主机）、RESUMED：加入清单；
+  STOPPED（关机、销毁、迁移离开本主机）、UNDEFINED：移出清单；
+事件回调运行在libvirt事件循环的原生线程中，只在锁内更新集合；数据采集每个周期
+在一次持有锁的过程中取出清单和上一个周期以来新增、删除的虚拟机实例（snapshot），
+新增的虚拟机实例一定在清单中，删除的虚拟机实例一定不在清单中；
+新增虚拟机实例的本地数据文件的建立和删除的虚拟机实例的本地数据文件（包括内存、
+网络和磁盘I/O数据文件和分位数草图）的清除也在snapshot中进行，即都在数据采集的
+线程中，与数据采集写入本地数据文件不会交错；
+
+只在启动和事件连接断开之后进行一次全量扫描（sync），纠正断开期间丢失的事件；
+事件源可以替换为FakeEventSource，用于测试和性能测试；
+"""
+
+import os
+
+try:
+    from eventlet import patcher
+except ImportError:
+    patcher = None
+
+from oslo.config import cfg
+
+from xdrs.hosts import resource_stats
+from xdrs.hosts import sketch_store
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+
+# libvirt的事件循环运行在原生线程中，不能使用被eventlet替换的threading；
+if patcher is not None:
+    _threading = patcher.original('threading')
+else:
+    import threading as _threading
+
+
+CONF = cfg.CONF
+CONF.import_opt('local_data_directory', 'xdrs.service')
+
+LOG = logging.getLogger(__name__)
+
+# libvirt的virDomainEventType；
+EVENT_DEFINED = 0
+EVENT_UNDEFINED = 1
+EVENT_STARTED = 2
+EVENT_SUSPENDED = 3
+EVENT_RESUMED = 4
+EVENT_STOPPED = 5
+EVENT_SHUTDOWN = 6
+
+_ADD_EVENTS = frozenset([EVENT_STARTED, EVENT_RESUMED])
+_REMOVE_EVENTS = frozenset([EVENT_STOPPED, EVENT_UNDEFINED])
+
+
+class LibvirtEventSource(object):
+    """
+    通过libvirt的默认事件循环订阅domain生命周期事件；
+    """
+
+    _event_loop = None
+
+    def __init__(self, uri=None):
+        self.uri = uri
+        self._connection = None
+        self._closed = True
+
+    @classmethod
+    def _start_event_loop(cls):
+        import libvirt
+
+        if cls._event_loop is not None:
+            return
+        # 必须在打开连接之前注册默认的事件循环实现；
+        libvirt.virEventRegisterDefaultImpl()
+
+        def run():
+            while True:
+                libvirt.virEventRunDefaultImpl()
+
+        cls._event_loop = _threading.Thread(target=run,
+                                            name='libvirt-events')
+        cls._event_loop.daemon = True
+        cls._event_loop.start()
+
+    def start(self, callback):
+        """
+        订阅生命周期事件，每个事件调用callback(uuid, event)，
+        callback在libvirt事件循环的线程中调用；
+        """
+        import libvirt
+
+        self._start_event_loop()
+        self._connection = libvirt.openReadOnly(self.uri)
+        if self._connection is None:
+            raise OSError('Failed to open a connection to the hypervisor')
+
+        def lifecycle(_connection, domain, event, _detail, _opaque):
+            callback(domain.UUIDString(), event)
+
+        def closed(_connection, reason, _opaque):
+            LOG.warn(_('libvirt event connection closed (reason %d), VM '
+                       'inventory will be rescanned'), reason)
+            self._closed = True
+
+        self._connection.domainEventRegisterAny(
+            None, libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE, lifecycle, None)
+        self._connection.registerCloseCallback(closed, None)
+        self._closed = False
+
+    def alive(self):
+        return not self._closed and self._connection is not None and \
+            self._connection.isAlive() == 1
+
+    def list_domains(self):
+        """
+        全量扫描：返回(活动的domain的UUID集合, 运行中的domain的UUID集合)；
+        """
+        import libvirt
+
+        active = self._connection.listAllDomains(
+            libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE)
+        running = self._connection.listAllDomains(
+            libvirt.VIR_CONNECT_LIST_DOMAINS_RUNNING)
+        return (set(domain.UUIDString() for domain in active),
+                set(domain.UUIDString() for domain in running))
+
+    def stop(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+        self._connection = None
+        self._closed = True
+
+
+class FakeEventSource(object):
+    """
+    用于测试的事件源：domains为{uuid: 是否运行中}，emit模拟一个生命周期事件；
+    """
+
+    def __init__(self, domains=None):
+        self.domains = dict(domains or {})
+        self._callback = None
+        self.connected = False
+
+    def start(self, callback):
+        self._callback = callback
+        self.connected = True
+
+    def alive(self):
+        return self.connected
+
+    def list_domains(self):
+        return (set(self.domains),
+                set(uuid for uuid, running in self.domains.items()
+                    if running))
+
+    def emit(self, uuid, event):
+        if event in (EVENT_STARTED, EVENT_RESUMED):
+            self.domains[uuid] = True
+        elif event == EVENT_SUSPENDED:
+            self.domains[uuid] = False
+        elif event in (EVENT_STOPPED, EVENT_UNDEFINED):
+            self.domains.pop(uuid, None)
+        if self.connected and self._callback is not None:
+            self._callback(uuid, event)
+
+    def stop(self):
+        self.connected = False
+
+
+class VmInventory(object):
+
+    def __init__(self, source, local_data_directory=None):
+        self.source = source
+        self.directory = local_data_directory or CONF.local_data_directory
+        self.vm_path = os.path.join(self.directory, 'vms')
+        self._lock = _threading.Lock()
+        self._vms = set()
+        self._added = set()
+        self._removed = set()
+        self._started = False
+
+    def start(self):
+        """
+        订阅事件，再进行一次全量扫描；
+        """
+        if not os.path.isdir(self.vm_path):
+            os.makedirs(self.vm_path)
+        self.source.start(self._handle_event)
+        self._started = True
+        self.sync()
+
+    def sync(self):
+        """
+        全量扫描：本地数据文件中有、但是已经不活动的虚拟机实例移出清单，
+        运行中、但是不在清单中的虚拟机实例加入清单；
+        """
+        active, running = self.source.list_domains()
+        with self._lock:
+            known = self._vms | set(os.listdir(self.vm_path))
+            for uuid in known - active:
+                self._remove(uuid)
+            # 已经有本地数据文件的虚拟机实例（例如进程重启之前的）不是新增的；
+            # 暂停的新虚拟机实例在恢复运行之前不加入清单；
+            self._vms.update(known & active)
+            for uuid in running - self._vms:
+                self._add(uuid)
+
+    def _handle_event(self, uuid, event):
+        with self._lock:
+            if event in _ADD_EVENTS:
+                self._add(uuid)
+            elif event in _REMOVE_EVENTS:
+                self._remove(uuid)
+
+    def _add(self, uuid):
+        if uuid in self._vms:
+            return
+        self._vms.add(uuid)
+        self._added.add(uuid)
+        self._removed.discard(uuid)
+
+    def _remove(self, uuid):
+        self._vms.discard(uuid)
+        self._added.discard(uuid)
+        self._removed.add(uuid)
+
+    def _create_files(self, uuids):
+        for uuid in uuids:
+            try:
+                open(os.path.join(self.vm_path, uuid), 'a').close()
+            except (IOError, OSError) as ex:
+                LOG.warn(_('Failed to create the local data file of VM '
+                           '%(uuid)s: %(ex)s'), {'uuid': uuid, 'ex': ex})
+
+    def _delete_files(self, uuids):
+        for uuid in uuids:
+            paths = [os.path.join(self.vm_path, uuid)]
+            paths.extend(
+                os.path.join(resource_stats.local_vm_path(self.directory,
+                                                          resource),
+                             uuid)
+                for resource in resource_stats.RESOURCES)
+            paths.append(os.path.join(
+                sketch_store.local_vm_path(self.directory), uuid))
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def snapshot(self):
+        """
+        返回(current, added, removed)：当前运行中的虚拟机实例UUID集合，
+        上一次调用以来新增和删除的虚拟机实例；三者在一次持有锁的过程中取出，
+        added是current的子集，removed与current不相交；
+        同时清除删除的虚拟机实例的本地数据文件，新增的虚拟机实例（包括在两次调用
+        之间停止又启动的）清除残留的数据文件之后建立新的本地数据文件；
+        事件连接断开时重新订阅并进行一次全量扫描；
+        """
+        if not self._started:
+            self.start()
+        elif not self.source.alive():
+            self.source.stop()
+            self.start()
+        with self._lock:
+            current = set(self._vms)
+            added, removed = self._added, self._removed
+            self._added, self._removed = set(), set()
+        self._delete_files(removed | added)
+        self._create_files(added)
+        return current, added, removed
+
+    def stop(self):
+        self.source.stop()
+        self._started = False
+
+
+_INVENTORY = None
+
+
+def get_inventory(source=None):
+    """
+    返回本进程的虚拟机实例清单；第一次调用时创建，
+    source为None时使用LibvirtEventSource；
+    """
+    global _INVENTORY
+    if _INVENTORY is None:
+        _INVENTORY = VmInventory(source or LibvirtEventSource())
+    return _INVENTORY
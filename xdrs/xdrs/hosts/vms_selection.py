@@ -3,6 +3,8 @@ import libvirt
 import numpy
 from oslo.config import cfg
 from xdrs import hosts
+from xdrs.hosts import sketch_store
+from xdrs import metrics
 
 CONF = cfg.CONF
 CONF.import_opt('local_data_directory', 'xdrs.service')
@@ -11,6 +13,7 @@ CONF.import_opt('vm_select_algorithm_path', 'xdrs.service')
 CONF.import_opt('overload_algorithm_path', 'xdrs.service')
 CONF.import_opt('host_cpu_usable_by_vms', 'xdrs.service')
 
+@metrics.timed('xdrs_host_stage', stage='vms_selection', cpu=True)
 def local_vms_select(context):         
     hosts_api = hosts.API()
     context = context.get_admin_context()
@@ -40,6 +43,14 @@ def local_vms_select(context):
     overload_algorithm_fuction_params = [overload_algorithm_params,
                                         migration_time]
     
+    """
+    vms_percentiles：数据采集维护的虚拟机实例CPU使用分位数草图给出的p50、p95、p99
+    （MHz，见hosts/sketch_store.py），基于分位数的选取算法直接使用，
+    不需要再从历史数据计算；
+    """
+    vms_percentiles = sketch_store.read_vm_percentiles(CONF.local_data_directory,
+                                                       vm_uuids_temp)
+    
     host_load_state_temp = 'overload'
     vm_mrigation_list = list()
         
@@ -51,7 +62,8 @@ def local_vms_select(context):
         """
         physical_cpu_mhz_total = int(_physical_cpu_mhz_total(vir_connection) *float(CONF.host_cpu_usable_by_vms))
         
-        vms_uuid = vm_select_algorithm_fuction(vm_select_algorithm_fuction_params)
+        vms_uuid = vm_select_algorithm_fuction(vm_select_algorithm_fuction_params,
+                                               vms_percentiles=vms_percentiles)
         del vm_uuids_temp[vms_uuid]
             
         host_cpu_utilization_temp = _vm_mhz_to_percentage(
@@ -116,7 +128,6 @@ def _vm_mhz_to_percentage(vm_mhz_history, host_mhz_history, physical_cpu_mhz):
     max_len = max(len(x) for x in vm_mhz_history)
     if len(host_mhz_history) > max_len:
         host_mhz_history = host_mhz_history[-max_len:]
-    print host_mhz_history
     
     mhz_history = [[0] * (max_len - len(x)) + x
                    for x in vm_mhz_history + [host_mhz_history]]
@@ -0,0 +1,367 @@
+"""
+轻量级的计时/统计接口（计时器、计数器、直方图）；
+
+用于观察一次调度过程（dynamic_resource_scheduling）的时间花费在哪里：
+RPC扇出、等待（wait_time）、数据库读取、算法计算还是live_migrate调用；
+
+使用方式：
+    with metrics.timer('xdrs_controller_stage', stage='load_detection'):
+        ...
+
+    @metrics.timed('xdrs_host_stage', stage='data_collection', cpu=True)
+    def local_data_collector(context):
+        ...
+
+    metrics.incr('xdrs_controller_live_migrations')
+
+统计结果按照metrics_backend导出：
+prometheus：定期把Prometheus文本格式的统计结果原子地写入metrics_file，
+            可以由node_exporter的textfile collector读取；
+statsd：每次记录时通过UDP发送到metrics_statsd_host:metrics_statsd_port；
+
+注：metrics_enabled为False（默认）时setup不创建统计对象，所有接口直接返回，
+timer返回共享的空上下文管理器，instrument原样返回被包装的对象，开销可以忽略；
+cpu=True时额外记录进程CPU时间，eventlet服务中包含了同一时段其他green thread
+消耗的CPU时间，只适合用于计算密集的同步阶段（例如算法计算）；
+"""
+
+import bisect
+import functools
+import os
+import socket
+import threading
+import time
+
+from oslo.config import cfg
+
+from xdrs import exception
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+from xdrs import paths
+
+
+metrics_opts = [
+    cfg.BoolOpt('metrics_enabled',
+                default=False,
+                help='Collect timers, counters and histograms for the '
+                     'scheduling stages'),
+    cfg.StrOpt('metrics_backend',
+               default='prometheus',
+               help='Metrics export backend: prometheus (text file) or '
+                    'statsd'),
+    cfg.StrOpt('metrics_file',
+               default=paths.state_path_def('metrics', '%(binary)s.prom'),
+               help='Prometheus text file written by the prometheus '
+                    'backend; %(binary)s is replaced by the service name'),
+    cfg.IntOpt('metrics_flush_interval',
+               default=15,
+               help='Seconds between two writes of metrics_file'),
+    cfg.StrOpt('metrics_statsd_host',
+               default='127.0.0.1',
+               help='StatsD host used by the statsd backend'),
+    cfg.IntOpt('metrics_statsd_port',
+               default=8125,
+               help='StatsD port used by the statsd backend'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(metrics_opts)
+
+LOG = logging.getLogger(__name__)
+
+_cpu_time = getattr(time, 'process_time', None) or time.clock
+
+# 直方图的默认分桶（秒），覆盖从数据库读取到wait_time等待的范围；
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+# None表示统计功能没有启用；
+_REGISTRY = None
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class PrometheusFileExporter(object):
+    """
+    以Prometheus文本格式导出统计结果；
+    先写临时文件再重命名，读取者不会读到写了一半的文件；
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def record(self, kind, name, labels, value):
+        pass
+
+    def flush(self, registry):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(registry.render_prometheus())
+        os.rename(tmp_path, self.path)
+
+
+class StatsdExporter(object):
+    """
+    以StatsD协议通过UDP发送每一条记录；
+    标签的值按照标签名排序后依次追加到指标名称之后；
+    """
+
+    _TYPES = {'counter': 'c', 'timing': 'ms', 'histogram': 'h'}
+
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def record(self, kind, name, labels, value):
+        if kind == 'timing':
+            value *= 1000.0
+        name = '.'.join([name] + [str(v) for k, v in sorted(labels.items())])
+        try:
+            self.sock.sendto(('%s:%g|%s' % (name, value, self._TYPES[kind])
+                              ).encode('utf-8'),
+                             self.address)
+        except socket.error:
+            pass
+
+    def flush(self, registry):
+        pass
+
+
+class Registry(object):
+
+    def __init__(self, binary, exporter, flush_interval=15,
+                 buckets=DEFAULT_BUCKETS):
+        self.binary = binary
+        self.exporter = exporter
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+
+    def incr(self, name, labels, value=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.exporter.record('counter', name, labels, value)
+        self._maybe_flush()
+
+    def observe(self, name, labels, value, kind='histogram'):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+        self.exporter.record(kind, name, labels, value)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.time()
+        try:
+            self.exporter.flush(self)
+        except (IOError, OSError) as e:
+            LOG.warn(_('Failed to export metrics: %s'), e)
+
+    def _format_labels(self, labels, extra=None):
+        items = [('service', self.binary)] + list(labels)
+        if extra:
+            items.append(extra)
+        return '{%s}' % ','.join('%s="%s"' % (k, str(v).replace('"', '\\"'))
+                                 for k, v in items)
+
+    def render_prometheus(self):
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count))
+                for key, h in self.histograms.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = name + '_total'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE %s counter' % metric)
+            lines.append('%s%s %s' % (metric, self._format_labels(labels),
+                                      value))
+
+        for (name, labels), (counts, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE %s histogram' % name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append('%s_bucket%s %d' % (
+                    name, self._format_labels(labels, ('le', bound)),
+                    cumulative))
+            lines.append('%s_sum%s %r' % (name, self._format_labels(labels),
+                                          total))
+            lines.append('%s_count%s %d' % (name,
+                                            self._format_labels(labels),
+                                            count))
+        return '\n'.join(lines) + '\n'
+
+
+def setup(binary):
+    """
+    按照配置创建统计对象，由服务在创建manager之前调用；
+    """
+    global _REGISTRY
+    if not CONF.metrics_enabled:
+        _REGISTRY = None
+        return
+
+    if CONF.metrics_backend == 'prometheus':
+        exporter = PrometheusFileExporter(
+            CONF.metrics_file % {'binary': binary})
+    elif CONF.metrics_backend == 'statsd':
+        exporter = StatsdExporter(CONF.metrics_statsd_host,
+                                  CONF.metrics_statsd_port)
+    else:
+        raise exception.InvalidInput(
+            reason=_('Unknown metrics_backend %s') % CONF.metrics_backend)
+    _REGISTRY = Registry(binary, exporter, CONF.metrics_flush_interval)
+
+
+def enabled():
+    return _REGISTRY is not None
+
+
+def flush():
+    if _REGISTRY is not None:
+        _REGISTRY.flush()
+
+
+def incr(name, value=1, **labels):
+    if _REGISTRY is not None:
+        _REGISTRY.incr(name, labels, value)
+
+
+def observe(name, value, **labels):
+    if _REGISTRY is not None:
+        _REGISTRY.observe(name, labels, value)
+
+
+class _NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    """
+    记录墙钟时间到<name>_seconds，cpu为True时记录CPU时间到<name>_cpu_seconds；
+    出现异常时额外增加标签error="1"，以区分失败的调用；
+    """
+
+    def __init__(self, registry, name, labels, cpu):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.cpu = cpu
+
+    def __enter__(self):
+        self._start = time.time()
+        if self.cpu:
+            self._cpu_start = _cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        labels = self.labels
+        if exc_type is not None:
+            labels = dict(labels, error='1')
+        self.registry.observe(self.name + '_seconds', labels,
+                              time.time() - self._start, kind='timing')
+        if self.cpu:
+            self.registry.observe(self.name + '_cpu_seconds', labels,
+                                  _cpu_time() - self._cpu_start,
+                                  kind='timing')
+        return False
+
+
+def timer(name, cpu=False, **labels):
+    if _REGISTRY is None:
+        return _NULL_TIMER
+    return _Timer(_REGISTRY, name, labels, cpu)
+
+
+def timed(name, cpu=False, **labels):
+    """
+    计时装饰器；
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _REGISTRY is None:
+                return func(*args, **kwargs)
+            with _Timer(_REGISTRY, name, labels, cpu):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _InstrumentedProxy(object):
+    """
+    为被包装对象的每个方法调用计时，标签method为方法名；
+    """
+
+    def __init__(self, target, name):
+        self._target = target
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return value
+
+        name = self._name
+
+        def wrapper(*args, **kwargs):
+            with timer(name, method=attr):
+                return value(*args, **kwargs)
+
+        # NOTE: 只在第一次访问时构造wrapper，之后直接从实例字典中获取；
+        self.__dict__[attr] = wrapper
+        return wrapper
+
+
+def instrument(target, name):
+    """
+    返回为target的所有方法调用计时的代理对象；没有启用统计时原样返回target；
+    """
+    if _REGISTRY is None:
+        return target
+    return _InstrumentedProxy(target, name)
@@ -2,6 +2,7 @@
 Openstack logging handler.
 """
 
+import atexit
 import inspect
 import itertools
 import logging.config
@@ -20,6 +21,20 @@ from xdrs.openstack.common import importutils
 from xdrs.openstack.common import jsonutils
 from xdrs.openstack.common import local
 
+try:
+    from eventlet import patcher
+except ImportError:
+    patcher = None
+
+# NOTE: the asynchronous handler writes from a native thread, which must
+#       not use the monkey-patched (green) threading and queue modules
+if patcher is not None:
+    _threading = patcher.original('threading')
+    _queue = patcher.original('Queue' if six.PY2 else 'queue')
+else:
+    import threading as _threading
+    from six.moves import queue as _queue
+
 
 _DEFAULT_LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
@@ -159,6 +174,20 @@ log_opts = [
                default='[instance: %(uuid)s] ',
                help='If an instance UUID is passed with the log message, '
                     'format it like this'),
+    cfg.BoolOpt('log_async',
+                default=False,
+                help='Write log records from a background thread, so that '
+                     'file, syslog and stream I/O does not block the caller'),
+    cfg.IntOpt('log_async_queue_size',
+               default=10000,
+               help='Maximum number of log records waiting to be written '
+                    'when log_async is set; records are dropped when the '
+                    'queue is full'),
+    cfg.ListOpt('audit_log_sampling',
+                default=[],
+                help='list of logger=N pairs: only one out of every N audit '
+                     'messages of the logger and of its children is '
+                     'written, e.g. xdrs.api.v1_contrib=100'),
 ]
 
 CONF = cfg.CONF
@@ -196,6 +225,51 @@ def _dictify_context(context):
     return context
 
 
+def _expand_record_context(record):
+    """
+    Expand the context and instance stored by ContextAdapter.process()
+    into the record attributes used by the format strings.
+
+    This is deferred until the record is formatted, so that messages
+    below the logger level never pay for rendering the context.
+    """
+    deferred = record.__dict__.pop('_deferred_context', None)
+    if deferred is None:
+        return
+
+    context, instance, instance_uuid, extra = deferred
+    if context:
+        extra.update(_dictify_context(context))
+
+    instance_uuid = instance_uuid or extra.get('instance_uuid', None)
+    instance_extra = ''
+    if instance:
+        instance_extra = CONF.instance_format % instance
+    elif instance_uuid:
+        instance_extra = (CONF.instance_uuid_format
+                          % {'uuid': instance_uuid})
+    extra.update({'instance': instance_extra})
+
+    extra.update({"project": record.__dict__.get('project')})
+    extra.update({"version": record.__dict__.get('version')})
+    record.__dict__.update(extra)
+    record.extra = extra.copy()
+
+
+def _parse_audit_log_sampling():
+    rates = {}
+    for pair in CONF.audit_log_sampling:
+        name, _sep, every = pair.partition('=')
+        try:
+            every = int(every)
+        except ValueError:
+            raise LogConfigError('audit_log_sampling',
+                                 _('%s is not a logger=N pair') % pair)
+        if every > 1:
+            rates[name.strip()] = every
+    return rates
+
+
 def _get_binary_name():
     return os.path.basename(inspect.stack()[-1][1])
 
@@ -278,6 +352,36 @@ class ContextAdapter(BaseLoggerAdapter):
         self.logger = logger
         self.project = project_name
         self.version = version_string
+        self._audit_every = None
+        self._audit_count = 0
+
+    def _get_audit_every(self):
+        if self._audit_every is None:
+            rates = _parse_audit_log_sampling()
+            every = 1
+            name = self.logger.name or ''
+            # The longest matching logger name wins
+            while name:
+                if name in rates:
+                    every = rates[name]
+                    break
+                name = name.rpartition('.')[0]
+            self._audit_every = every
+        return self._audit_every
+
+    def audit(self, msg, *args, **kwargs):
+        # NOTE: Check the level first, so that a disabled audit level
+        #       costs neither process() nor a log record.
+        if not self.logger.isEnabledFor(logging.AUDIT):
+            return
+
+        every = self._get_audit_every()
+        if every > 1:
+            self._audit_count += 1
+            if self._audit_count % every != 1:
+                return
+
+        self.log(logging.AUDIT, msg, *args, **kwargs)
 
     @property
     def handlers(self):
@@ -306,23 +410,17 @@ class ContextAdapter(BaseLoggerAdapter):
         context = kwargs.pop('context', None)
         if not context:
             context = getattr(local.store, 'context', None)
-        if context:
-            extra.update(_dictify_context(context))
 
         instance = kwargs.pop('instance', None)
         instance_uuid = (extra.get('instance_uuid', None) or
                          kwargs.pop('instance_uuid', None))
-        instance_extra = ''
-        if instance:
-            instance_extra = CONF.instance_format % instance
-        elif instance_uuid:
-            instance_extra = (CONF.instance_uuid_format
-                              % {'uuid': instance_uuid})
-        extra.update({'instance': instance_extra})
 
+        # NOTE: The context and the instance are rendered by
+        #       _expand_record_context() when the record is formatted.
+        extra['_deferred_context'] = (context, instance, instance_uuid,
+                                      dict(extra))
         extra.update({"project": self.project})
         extra.update({"version": self.version})
-        extra['extra'] = extra.copy()
         return msg, kwargs
 
 
@@ -342,6 +440,7 @@ class JSONFormatter(logging.Formatter):
         return lines
 
     def format(self, record):
+        _expand_record_context(record)
         message = {'message': record.getMessage(),
                    'asctime': self.formatTime(record, self.datefmt),
                    'name': record.name,
@@ -506,6 +605,14 @@ def _setup_logging_from_conf():
         else:
             handler.setFormatter(ContextFormatter(datefmt=datefmt))
 
+    if CONF.log_async:
+        handlers = list(log_root.handlers)
+        for handler in handlers:
+            log_root.removeHandler(handler)
+        async_handler = AsyncHandler(handlers, CONF.log_async_queue_size)
+        log_root.addHandler(async_handler)
+        atexit.register(async_handler.close)
+
     if CONF.debug:
         log_root.setLevel(logging.DEBUG)
     elif CONF.verbose:
@@ -519,6 +626,10 @@ def _setup_logging_from_conf():
         logger = logging.getLogger(mod)
         logger.setLevel(level)
 
+    # audit_log_sampling may have changed
+    for adapter in _loggers.values():
+        adapter._audit_every = None
+
 _loggers = {}
 
 
@@ -571,6 +682,8 @@ class ContextFormatter(logging.Formatter):
         """
         Uses contextstring if request_id is set, otherwise default.
         """
+        _expand_record_context(record)
+
         # NOTE(sdague): default the fancier formatting params
         # to an empty string so we don't throw an exception if
         # they get used
@@ -616,6 +729,63 @@ class ContextFormatter(logging.Formatter):
         return '\n'.join(formatted_lines)
 
 
+class AsyncHandler(logging.Handler):
+    """
+    Hands log records to a background thread which emits them through
+    the wrapped handlers, so that file, syslog and stream I/O is moved
+    off the request and collector threads.
+
+    Records are rendered before they are queued, because the objects
+    they reference may change before they are written.  When the queue
+    is full, records are dropped rather than blocking the caller; the
+    number of dropped records is kept in ``dropped``.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        logging.Handler.__init__(self)
+        self.handlers = handlers
+        self.dropped = 0
+        self._queue = _queue.Queue(queue_size)
+        self._thread = _threading.Thread(target=self._run,
+                                         name='AsyncLogHandler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def prepare(self, record):
+        _expand_record_context(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        try:
+            self._queue.put_nowait(self.prepare(record))
+        except _queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def close(self, timeout=5):
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except _queue.Full:
+                pass
+            self._thread.join(timeout)
+        for handler in self.handlers:
+            handler.close()
+        logging.Handler.close(self)
+
+
 class ColorHandler(logging.StreamHandler):
     LEVEL_COLORS = {
         logging.DEBUG: '\033[00;32m',  # GREEN
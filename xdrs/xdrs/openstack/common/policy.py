@@ -1,6 +1,8 @@
 import abc
 import re
 
+import six
+
 from xdrs.openstack.common import jsonutils
 
 
@@ -33,6 +35,59 @@ class Rules(dict):
 
         super(Rules, self).__init__(rules or {})
         self.default_rule = default_rule
+        self._compiled = {}
+
+    def __setitem__(self, key, value):
+        self._compiled = {}
+        super(Rules, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._compiled = {}
+        super(Rules, self).__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self._compiled = {}
+        super(Rules, self).update(*args, **kwargs)
+
+    def compiled(self, key):
+        """
+        Return the compiled closure of a rule, compiling it on first
+        use.  Implements the default rule handling like __missing__.
+        """
+
+        try:
+            func = self._compiled[key]
+        except KeyError:
+            if key not in self:
+                if not self.default_rule or self.default_rule not in self:
+                    raise KeyError(key)
+                return self.compiled(self.default_rule)
+
+            # Mark the rule so that a rule referencing itself fails closed
+            # instead of recursing forever
+            self._compiled[key] = _COMPILING
+            try:
+                func = self[key].compile(self)
+            except Exception:
+                del self._compiled[key]
+                raise
+            self._compiled[key] = func
+
+        if func is _COMPILING:
+            return _false
+        return func
+
+    def compile(self):
+        """
+        Compile every rule into a flat closure taking (target, cred).
+        Referenced rules are inlined, so evaluating a compiled rule
+        does not walk the Check tree nor look up _rules.
+        """
+
+        self._compiled = {}
+        for key in self:
+            self.compiled(key)
+        return self
 
     def __missing__(self, key):
         """
@@ -72,6 +127,8 @@ def set_rules(rules):
 
     global _rules
 
+    if isinstance(rules, Rules):
+        rules.compile()
     _rules = rules
 
 
@@ -111,7 +168,10 @@ def check(rule, target, creds, exc=None, *args, **kwargs):
     else:
         try:
             # Evaluate the rule
-            result = _rules[rule](target, creds)
+            if isinstance(_rules, Rules):
+                result = _rules.compiled(rule)(target, creds)
+            else:
+                result = _rules[rule](target, creds)
             """
             _rules就是文件/etc/xdrs/policy.json中的内容，这个文件中规定了API中各个操作方法的执行者权限；
             从而得到：
@@ -157,6 +217,41 @@ class BaseCheck(object):
 
         pass
 
+    def compile(self, rules):
+        """
+        Compile the Check tree rooted at this node into a closure
+        taking (target, cred).  Rule references are resolved against
+        rules.  Checks without their own compile() are called as is.
+        """
+
+        return self.__call__
+
+
+def _false(target, cred):
+    return False
+
+
+def _true(target, cred):
+    return True
+
+
+# Marks a rule whose compilation is in progress
+_COMPILING = object()
+
+
+def _flatten(check, cls):
+    """
+    Yield the operands of nested checks of the same boolean operator,
+    so that "a and (b and c)" compiles to a single and over a, b, c.
+    """
+
+    if isinstance(check, cls):
+        for rule in check.rules:
+            for leaf in _flatten(rule, cls):
+                yield leaf
+    else:
+        yield check
+
 
 class FalseCheck(BaseCheck):
     """
@@ -177,6 +272,9 @@ class FalseCheck(BaseCheck):
 
         return False
 
+    def compile(self, rules):
+        return _false
+
 
 class TrueCheck(BaseCheck):
     """
@@ -197,6 +295,9 @@ class TrueCheck(BaseCheck):
 
         return True
 
+    def compile(self, rules):
+        return _true
+
 
 class Check(BaseCheck):
     """
@@ -252,6 +353,17 @@ class NotCheck(BaseCheck):
 
         return not self.rule(target, cred)
 
+    def compile(self, rules):
+        func = self.rule.compile(rules)
+        if func is _true:
+            return _false
+        if func is _false:
+            return _true
+
+        def not_check(target, cred):
+            return not func(target, cred)
+        return not_check
+
 
 class AndCheck(BaseCheck):
     """
@@ -286,6 +398,29 @@ class AndCheck(BaseCheck):
 
         return True
 
+    def compile(self, rules):
+        funcs = []
+        for rule in _flatten(self, AndCheck):
+            func = rule.compile(rules)
+            if func is _false:
+                return _false
+            if func is not _true:
+                funcs.append(func)
+
+        if not funcs:
+            return _true
+        if len(funcs) == 1:
+            return funcs[0]
+
+        funcs = tuple(funcs)
+
+        def and_check(target, cred):
+            for func in funcs:
+                if not func(target, cred):
+                    return False
+            return True
+        return and_check
+
     def add_check(self, rule):
         """
         Allows addition of another rule to the list of rules that will
@@ -329,6 +464,29 @@ class OrCheck(BaseCheck):
 
         return False
 
+    def compile(self, rules):
+        funcs = []
+        for rule in _flatten(self, OrCheck):
+            func = rule.compile(rules)
+            if func is _true:
+                return _true
+            if func is not _false:
+                funcs.append(func)
+
+        if not funcs:
+            return _false
+        if len(funcs) == 1:
+            return funcs[0]
+
+        funcs = tuple(funcs)
+
+        def or_check(target, cred):
+            for func in funcs:
+                if func(target, cred):
+                    return True
+            return False
+        return or_check
+
     def add_check(self, rule):
         """
         Allows addition of another rule to the list of rules that will
@@ -655,4 +813,115 @@ def parse_rule(rule):
     # If the rule is a string, it's in the policy language
     if isinstance(rule, basestring):
         return _parse_text_rule(rule)
-    return _parse_list_rule(rule)
\ No newline at end of file
+    return _parse_list_rule(rule)
+
+def register(name, func=None):
+    """
+    Register a function or Check class as a policy check.
+
+    :param name: Gives the name of the check type, e.g., 'rule',
+                 'role', etc.  If name is None, a default check type
+                 will be registered.
+    :param func: If given, provides the function or class to register.
+                 If not given, returns a function taking one argument
+                 to specify the function or class to register,
+                 allowing use as a decorator.
+    """
+
+    # Perform the actual decoration by registering the function or
+    # class.  Returns the function or class for compliance with the
+    # decorator interface.
+    def decorator(func):
+        _checks[name] = func
+        return func
+
+    # If the function or class is given, do the registration
+    if func:
+        return decorator(func)
+
+    return decorator
+
+
+@register("rule")
+class RuleCheck(Check):
+    def __call__(self, target, creds):
+        """
+        Recursively checks credentials based on the defined rules.
+        """
+
+        try:
+            return _rules[self.match](target, creds)
+        except KeyError:
+            # We don't have any matching rule; fail closed
+            return False
+
+    def compile(self, rules):
+        # Inline the referenced rule instead of looking it up on each call
+        try:
+            return rules.compiled(self.match)
+        except (AttributeError, KeyError):
+            return _false
+
+
+@register("role")
+class RoleCheck(Check):
+    def __call__(self, target, creds):
+        """
+        Check that there is a matching role in the cred dict.
+        """
+
+        return self.match.lower() in [x.lower() for x in creds['roles']]
+
+    def compile(self, rules):
+        match = self.match.lower()
+
+        def role_check(target, creds):
+            return match in [x.lower() for x in creds['roles']]
+        return role_check
+
+
+@register(None)
+class GenericCheck(Check):
+    def __call__(self, target, creds):
+        """
+        Check an individual match.
+
+        Matches look like:
+
+            tenant:%(tenant_id)s
+            role:compute:admin
+        """
+
+        try:
+            match = self.match % target
+        except KeyError:
+            # While doing GenericCheck if key not
+            # present in Target return false
+            return False
+
+        if self.kind in creds:
+            return match == six.text_type(creds[self.kind])
+        return False
+
+    def compile(self, rules):
+        kind = self.kind
+        match = self.match
+
+        if '%' not in match:
+            # A constant match needs no substitution from the target
+            def generic_check(target, creds):
+                if kind in creds:
+                    return match == six.text_type(creds[kind])
+                return False
+            return generic_check
+
+        def generic_check(target, creds):
+            try:
+                value = match % target
+            except KeyError:
+                return False
+
+            if kind in creds:
+                return value == six.text_type(creds[kind])
+            return False
+        return generic_check
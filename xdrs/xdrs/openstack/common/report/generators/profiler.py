@@ -0,0 +1,202 @@
+"""
+Provides a statistical sampling profiler generator
+"""
+
+import collections
+import gc
+import os
+import sys
+import weakref
+
+from eventlet import patcher
+import greenlet
+from oslo.config import cfg
+
+import xdrs.openstack.common.report.models.profiler as pm
+
+# the profiler samples from a native thread while the green threads keep
+# running in the main thread, so it must not use the monkey-patched modules
+_thread = patcher.original('thread' if sys.version_info[0] == 2
+                           else '_thread')
+_time = patcher.original('time')
+
+profiler_opts = [
+    cfg.IntOpt('gmr_profile_duration',
+               default=30,
+               help='Seconds the sampling profiler of the Guru Meditation '
+                    'report runs for'),
+    cfg.FloatOpt('gmr_profile_interval',
+                 default=0.01,
+                 help='Seconds between two stack samples of the sampling '
+                      'profiler'),
+    cfg.StrOpt('gmr_profile_dir',
+               default='/tmp',
+               help='Directory the sampling profiler writes collapsed '
+                    'stack files (flame graph input) to'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(profiler_opts)
+
+# how often (in seconds) the list of green threads is refreshed
+_GREENLET_REFRESH = 1.0
+
+THREADS = 'threads'
+GREEN_THREADS = 'green threads'
+
+
+def _frame_key(frame):
+    code = frame.f_code
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def _frame_label(key):
+    filename, lineno, name = key
+    return '%s (%s:%d)' % (name, os.path.basename(filename), lineno)
+
+
+class SamplingProfiler(object):
+    """
+    A Statistical Sampling Profiler
+
+    Every interval seconds this records the stack of each native
+    thread (except its own) and of each suspended green thread.
+    Native thread samples show where the code runs, green thread
+    samples show where the green threads are parked.
+
+    :param float duration: how long to sample for, in seconds
+    :param float interval: the delay between two samples, in seconds
+    """
+
+    def __init__(self, duration, interval):
+        self.duration = duration
+        self.interval = interval
+        self.samples = 0
+        self.stacks = collections.defaultdict(int)
+        self._greenlets = []
+        self._greenlets_refreshed = 0
+
+    def _refresh_greenlets(self, now):
+        if now - self._greenlets_refreshed < _GREENLET_REFRESH:
+            return
+        self._greenlets_refreshed = now
+        self._greenlets = [weakref.ref(gr) for gr in gc.get_objects()
+                           if isinstance(gr, greenlet.greenlet)]
+
+    def _record(self, kind, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_key(frame))
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[(kind, tuple(stack))] += 1
+
+    def sample(self):
+        own_id = _thread.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own_id:
+                self._record(THREADS, frame)
+
+        self._refresh_greenlets(_time.time())
+        for ref in self._greenlets:
+            gr = ref()
+            # gr_frame is None for the running and for dead green threads
+            if gr is not None and gr.gr_frame is not None:
+                self._record(GREEN_THREADS, gr.gr_frame)
+        self.samples += 1
+
+    def run(self):
+        deadline = _time.time() + self.duration
+        while _time.time() < deadline:
+            self.sample()
+            _time.sleep(self.interval)
+        return self
+
+    def stack_count(self, kind):
+        """
+        Count the stacks of one kind recorded over all samples
+
+        Each sample records one stack per thread, so this is the
+        denominator of the per function shares, not the sample count.
+        """
+
+        return sum(count for (stack_kind, stack), count
+                   in self.stacks.items() if stack_kind == kind)
+
+    def hot_functions(self, kind, limit=None):
+        """
+        Aggregate the samples of one kind per function
+
+        :returns: a list of (function, self samples, total samples)
+                  sorted by self samples, then by total samples
+        """
+
+        own = collections.defaultdict(int)
+        total = collections.defaultdict(int)
+        for (stack_kind, stack), count in self.stacks.items():
+            if stack_kind != kind or not stack:
+                continue
+            own[stack[-1]] += count
+            for key in set(stack):
+                total[key] += count
+        rows = sorted(((_frame_label(key), own[key], total[key])
+                       for key in total),
+                      key=lambda row: (-row[1], -row[2], row[0]))
+        return rows[:limit] if limit else rows
+
+    def collapsed(self):
+        """
+        Render the samples in the collapsed stack format
+
+        Each line holds the semicolon separated frames of a stack,
+        rooted at its kind, followed by the number of samples, which
+        is the input format of flamegraph.pl and speedscope.
+        """
+
+        lines = []
+        for (kind, stack), count in sorted(self.stacks.items()):
+            frames = [kind] + [_frame_label(key).replace(';', ':')
+                               for key in stack]
+            lines.append('%s %d' % (';'.join(frames), count))
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfilerReportGenerator(object):
+    """
+    A Sampling Profiler Data Generator
+
+    This blocks for the whole duration of the profile, so it must be
+    called from a native thread (see
+    :meth:`GuruMeditation.handle_profile_signal`), otherwise the green
+    threads would not run while they are sampled.
+    """
+
+    def __init__(self, duration=None, interval=None, output_dir=None,
+                 limit=25):
+        self.duration = duration or CONF.gmr_profile_duration
+        self.interval = interval or CONF.gmr_profile_interval
+        self.output_dir = output_dir or CONF.gmr_profile_dir
+        self.limit = limit
+
+    def _write_collapsed(self, profiler):
+        path = os.path.join(self.output_dir, 'gmr-profile-%d-%d.collapsed'
+                            % (os.getpid(), int(_time.time())))
+        try:
+            with open(path, 'w') as f:
+                f.write(profiler.collapsed())
+        except (IOError, OSError) as e:
+            return 'unable to write %s: %s' % (path, e)
+        return path
+
+    def __call__(self):
+        profiler = SamplingProfiler(self.duration, self.interval).run()
+        return pm.ProfileModel(
+            duration=self.duration,
+            interval=self.interval,
+            samples=profiler.samples,
+            collapsed_file=self._write_collapsed(profiler),
+            stacks=dict((kind, profiler.stack_count(kind))
+                        for kind in (THREADS, GREEN_THREADS)),
+            functions=dict(
+                (kind, profiler.hot_functions(kind, self.limit))
+                for kind in (THREADS, GREEN_THREADS)))
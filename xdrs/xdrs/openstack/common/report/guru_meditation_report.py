@@ -3,11 +3,16 @@ from __future__ import print_function
 import signal
 import sys
 
+from eventlet import patcher
+
 from xdrs.openstack.common.report.generators import conf as cgen
+from xdrs.openstack.common.report.generators import profiler as prgen
 from xdrs.openstack.common.report.generators import threading as tgen
 from xdrs.openstack.common.report.generators import version as pgen
 from xdrs.openstack.common.report import report
 
+_threading = patcher.original('threading')
+
 
 class GuruMeditation(object):
     """
@@ -16,6 +21,7 @@ class GuruMeditation(object):
 
     def __init__(self, version_obj, *args, **kwargs):
         self.version_obj = version_obj
+        self.instance_sections = []
 
         super(GuruMeditation, self).__init__(*args, **kwargs)
         self.start_section_index = len(self.sections)
@@ -31,10 +37,20 @@ class GuruMeditation(object):
         except AttributeError:
             cls.persistent_sections = [[section_title, generator]]
     
+    def add_instance_section(self, section_title, generator):
+        """
+        Add a Section to This Report Only
+        """
+
+        self.instance_sections.append([section_title, generator])
+
     @classmethod
-    def setup_autorun(cls, version, signum=None):
+    def setup_autorun(cls, version, signum=None, profile_signum=None):
         """
         Set Up Auto-Run
+
+        signum triggers the regular report, profile_signum triggers
+        a report that also runs the sampling profiler.
         """
 
         if not signum and hasattr(signal, 'SIGUSR1'):
@@ -45,6 +61,14 @@ class GuruMeditation(object):
             signal.signal(signum,
                           lambda *args: cls.handle_signal(version, *args))
 
+        if not profile_signum and hasattr(signal, 'SIGUSR2'):
+            profile_signum = signal.SIGUSR2
+
+        if profile_signum:
+            signal.signal(profile_signum,
+                          lambda *args: cls.handle_profile_signal(version,
+                                                                  *args))
+
     @classmethod
     def handle_signal(cls, version, *args):
         """
@@ -59,6 +83,48 @@ class GuruMeditation(object):
         else:
             print(res, file=sys.stderr)
 
+    _profile_lock = _threading.Lock()
+
+    @classmethod
+    def handle_profile_signal(cls, version, *args):
+        """
+        The Profiling Signal Handler
+
+        The profiler samples for a while, so it runs in a native thread:
+        the green threads of the main thread keep running (and can be
+        observed) in the meantime.  A signal received while a profile is
+        running is ignored.
+        """
+
+        if not cls._profile_lock.acquire(False):
+            print("A Guru Meditation profile is already running",
+                  file=sys.stderr)
+            return
+
+        thread = _threading.Thread(target=cls._run_profile, args=(version,))
+        thread.daemon = True
+        try:
+            thread.start()
+        except Exception:
+            cls._profile_lock.release()
+            raise
+
+    @classmethod
+    def _run_profile(cls, version):
+        try:
+            gmr = cls(version)
+            gmr.add_instance_section(
+                'Sampling Profiler',
+                prgen.SamplingProfilerReportGenerator())
+            res = gmr.run()
+        except Exception:
+            print("Unable to run Guru Meditation Profile!",
+                  file=sys.stderr)
+        else:
+            print(res, file=sys.stderr)
+        finally:
+            cls._profile_lock.release()
+
     def _readd_sections(self):
         del self.sections[self.start_section_index:]
 
@@ -80,6 +146,9 @@ class GuruMeditation(object):
         except AttributeError:
             pass
 
+        for section_title, generator in self.instance_sections:
+            self.add_section(section_title, generator)
+
     def run(self):
         self._readd_sections()
         return super(GuruMeditation, self).run()
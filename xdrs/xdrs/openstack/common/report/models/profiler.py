@@ -0,0 +1,37 @@
+"""
+Provides the sampling profiler model
+"""
+
+import xdrs.openstack.common.report.models.with_default_views as mwdv
+import xdrs.openstack.common.report.views.text.profiler as text_views
+
+
+class ProfileModel(mwdv.ModelWithDefaultViews):
+    """
+    A Sampling Profile Model
+
+    This model holds the aggregated result of a sampling profiler run:
+    the hot functions of the native and of the green threads, and the
+    location of the collapsed stack file written for flame graphs.
+
+    :param float duration: how long the profiler ran, in seconds
+    :param float interval: the delay between two samples, in seconds
+    :param int samples: the number of samples taken
+    :param str collapsed_file: the collapsed stack file
+    :param dict stacks: kind -> number of stacks recorded (one per
+                        thread and sample)
+    :param dict functions: kind -> list of
+                           (function, self stacks, total stacks)
+    """
+
+    def __init__(self, duration, interval, samples, collapsed_file,
+                 stacks, functions):
+        super(ProfileModel, self).__init__(
+            text_view=text_views.ProfileView())
+
+        self['duration'] = duration
+        self['interval'] = interval
+        self['samples'] = samples
+        self['collapsed_file'] = collapsed_file
+        self['stacks'] = stacks
+        self['functions'] = functions
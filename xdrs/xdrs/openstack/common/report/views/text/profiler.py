@@ -0,0 +1,38 @@
+"""
+Provides the sampling profiler view
+"""
+
+
+class ProfileView(object):
+    """
+    A Sampling Profile View
+
+    The self and total columns are the share of the recorded stacks of
+    a kind (one per thread and sample) in which the function is on top
+    of, or anywhere on, the stack.
+    """
+
+    HEADER_STR = ("{samples} samples over {duration}s "
+                  "(every {interval}s)\n"
+                  "collapsed stacks: {collapsed_file}\n")
+    TABLE_STR = ("------{kind: ^60}------\n"
+                 "{stacks} stacks\n{header}\n{rows}\n")
+    ROW_STR = "{self_pct:>7.2%} {total_pct:>7.2%}  {function}"
+
+    def __call__(self, model):
+        tables = []
+        for kind in sorted(model.functions):
+            stacks = model.stacks.get(kind, 0)
+            rows = [self.ROW_STR.format(
+                        self_pct=float(own) / max(stacks, 1),
+                        total_pct=float(total) / max(stacks, 1),
+                        function=function)
+                    for function, own, total in model.functions[kind]]
+            tables.append(self.TABLE_STR.format(
+                kind=' %s ' % kind.title(),
+                stacks=stacks,
+                header="{0:>7} {1:>7}  {2}".format('self', 'total',
+                                                    'function'),
+                rows='\n'.join(rows) or 'No samples!'))
+
+        return self.HEADER_STR.format(**model.data) + '\n'.join(tables)
@@ -0,0 +1,107 @@
+"""
+RPC/API负载的快速primitive转换；
+
+jsonutils.to_primitive对每一个值都要依次进行isinstance检测、构造
+functools.partial并执行_nasty_type_tests，主机/虚拟机的CPU历史数据
+往往是包含数千个整数的列表，逐元素转换的开销非常可观。
+这里按照值的类型缓存对应的转换方法（每种类型只判定一次），并对元素
+全部为数值的列表直接整体拷贝；无法识别的类型仍然交给
+jsonutils.to_primitive处理，保证转换结果与其完全一致。
+"""
+
+import datetime
+
+import six
+
+from xdrs.openstack.common import jsonutils
+from xdrs.openstack.common import timeutils
+
+
+_NUMERIC_TYPES = frozenset(six.integer_types + (float, bool))
+_SIMPLE_TYPES = (six.string_types + six.integer_types
+                 + (type(None), bool, float))
+
+# type -> handler(value, convert_instances, convert_datetime, level, max_depth)
+_HANDLERS = {}
+
+
+def _identity(value, convert_instances, convert_datetime, level, max_depth):
+    return value
+
+
+def _datetime(value, convert_instances, convert_datetime, level, max_depth):
+    if convert_datetime:
+        return timeutils.strtime(value)
+    return value
+
+
+def _dict(value, convert_instances, convert_datetime, level, max_depth):
+    if level > max_depth:
+        return '?'
+    return dict((k, _convert(v, convert_instances, convert_datetime,
+                             level, max_depth))
+                for k, v in six.iteritems(value))
+
+
+def _list(value, convert_instances, convert_datetime, level, max_depth):
+    if level > max_depth:
+        return '?'
+    # NOTE: CPU历史数据等同构数值列表的快速通道，类型检测在C层完成；
+    if _NUMERIC_TYPES.issuperset(set(map(type, value))):
+        return list(value)
+    return [_convert(v, convert_instances, convert_datetime,
+                     level, max_depth)
+            for v in value]
+
+
+def _iteritems(value, convert_instances, convert_datetime, level, max_depth):
+    if level > max_depth:
+        return '?'
+    return _dict(dict(value.iteritems()), convert_instances,
+                 convert_datetime, level + 1, max_depth)
+
+
+def _fallback(value, convert_instances, convert_datetime, level, max_depth):
+    return jsonutils.to_primitive(value,
+                                  convert_instances=convert_instances,
+                                  convert_datetime=convert_datetime,
+                                  level=level,
+                                  max_depth=max_depth)
+
+
+def _lookup(value_type):
+    """
+    确定某一类型的转换方法；判定顺序与jsonutils.to_primitive保持一致；
+    """
+    if issubclass(value_type, _SIMPLE_TYPES):
+        return _identity
+    if issubclass(value_type, datetime.datetime):
+        return _datetime
+    if getattr(value_type, '__module__', None) == 'mox':
+        return _fallback
+    if issubclass(value_type, dict):
+        return _dict
+    if issubclass(value_type, (list, tuple)):
+        return _list
+    if hasattr(value_type, 'iteritems'):
+        return _iteritems
+    return _fallback
+
+
+def _convert(value, convert_instances, convert_datetime, level, max_depth):
+    value_type = type(value)
+    try:
+        handler = _HANDLERS[value_type]
+    except KeyError:
+        handler = _HANDLERS[value_type] = _lookup(value_type)
+    return handler(value, convert_instances, convert_datetime,
+                   level, max_depth)
+
+
+def to_primitive(value, convert_instances=False, convert_datetime=True,
+                 level=0, max_depth=3):
+    """
+    与jsonutils.to_primitive接口和结果一致的快速实现；
+    """
+    return _convert(value, convert_instances, convert_datetime,
+                    level, max_depth)
@@ -0,0 +1,216 @@
+"""
+可合并的流式分位数草图（KLL sketch）；
+
+检测算法和虚拟机选取算法以前每次都要读取完整的历史数据（本地文件或者数据库），
+再对最近的n个采样计算平均值或者分位数；这里为每个虚拟机实例和主机维护一个
+KLL草图（Karnin, Lang, Liberty 2016）：
+  草图由若干层组成，第h层中每个值代表2^h个采样；某一层满了之后把其中的值排序，
+  隔一个取一个（交替地取奇数位或者偶数位）放入上一层；
+  k个值的草图的秩误差约为1.7 / k（k=128时约为1.3%），
+  占用的空间为O(k)，与采样的个数无关；
+两个草图可以直接合并（逐层合并后再压缩），合并结果与对所有采样建立一个草图
+的误差相同，主机只需要提交草图（HostCpuData.cpu_sketch），不需要传输原始采样；
+
+WindowedSketch在一个草图中累计window个采样后开始一个新的草图，
+分位数由当前和上一个草图合并计算，即覆盖最近window到2 * window个采样；
+草图可以序列化为JSON（to_dict/from_dict），计算好的p50、p95、p99与草图一起保存，
+读取时不需要任何计算；
+"""
+
+import json
+import math
+
+
+DEFAULT_K = 128
+PERCENTILES = (50, 95, 99)
+
+# 每低一层容量乘以的系数；
+_C = 2.0 / 3.0
+
+
+class KLLSketch(object):
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.levels = [[]]
+        # 每一层下一次压缩时取偶数位（0）还是奇数位（1）；
+        self.offsets = [0]
+        self.n = 0
+        self.min = None
+        self.max = None
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * _C ** depth)))
+
+    def _compress(self):
+        while sum(len(items) for items in self.levels) >= \
+                sum(self._capacity(h) for h in range(len(self.levels))):
+            for h, items in enumerate(self.levels):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                        self.offsets.append(0)
+                    self._compact(h)
+                    break
+
+    def _compact(self, level):
+        items = sorted(self.levels[level])
+        # 奇数个值时留下最大的一个在本层；
+        keep = [items.pop()] if len(items) % 2 else []
+        offset = self.offsets[level]
+        self.offsets[level] ^= 1
+        self.levels[level + 1].extend(items[offset::2])
+        self.levels[level] = keep
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self._compress()
+
+    def merge(self, other):
+        """
+        把other合并到本草图中；
+        """
+        if not other.n:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+            self.offsets.append(0)
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """
+        返回分位数qs（0-1）对应的估计值列表；草图为空时返回None的列表；
+        """
+        if not self.n:
+            return [None] * len(qs)
+        weighted = sorted((value, 1 << h)
+                          for h, items in enumerate(self.levels)
+                          for value in items)
+        total = sum(weight for _value, weight in weighted)
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+                continue
+            if q >= 1:
+                result.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            value = weighted[-1][0]
+            for item, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    value = item
+                    break
+            result.append(value)
+        return result
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def copy(self):
+        return KLLSketch.from_dict(self.to_dict())
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'min': self.min, 'max': self.max,
+                'levels': self.levels, 'offsets': self.offsets}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch.levels = [list(items) for items in data['levels']]
+        sketch.offsets = list(data['offsets'])
+        return sketch
+
+
+class WindowedSketch(object):
+
+    def __init__(self, window, k=DEFAULT_K):
+        self.window = window
+        self.current = KLLSketch(k)
+        self.previous = None
+
+    def update(self, value):
+        if self.current.n >= self.window:
+            self.previous = self.current
+            self.current = KLLSketch(self.current.k)
+        self.current.update(value)
+
+    def merged(self):
+        """
+        返回覆盖当前和上一个窗口的草图；
+        """
+        sketch = self.current.copy()
+        if self.previous is not None:
+            sketch.merge(self.previous)
+        return sketch
+
+    def to_dict(self):
+        return {'window': self.window,
+                'current': self.current.to_dict(),
+                'previous': self.previous and self.previous.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['window'])
+        sketch.current = KLLSketch.from_dict(data['current'])
+        if data.get('previous'):
+            sketch.previous = KLLSketch.from_dict(data['previous'])
+        return sketch
+
+
+def percentiles(sketch, percentiles=PERCENTILES):
+    """
+    返回{'p50': XXX, 'p95': XXX, 'p99': XXX}；
+    """
+    values = sketch.quantiles([p / 100.0 for p in percentiles])
+    return dict(('p%d' % p, value) for p, value in zip(percentiles, values))
+
+
+def merge_all(sketches):
+    """
+    合并若干序列化的草图（to_dict的结果），返回合并后的KLLSketch；
+    """
+    result = None
+    for data in sketches:
+        if not data:
+            continue
+        sketch = KLLSketch.from_dict(data)
+        result = sketch if result is None else result.merge(sketch)
+    return result or KLLSketch()
+
+
+def stored_percentiles(data):
+    """
+    由数据库中保存的序列化草图（JSON文本）计算分位数，没有草图时返回None；
+    """
+    if not data:
+        return None
+    return percentiles(KLLSketch.from_dict(json.loads(data)))
+
+
+def exact_percentile(values, percentile):
+    """
+    没有草图时由原始采样计算分位数（nearest-rank）；
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percentile / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
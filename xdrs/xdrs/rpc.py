@@ -19,6 +19,7 @@ __all__ = [
     'RequestContextSerializer',
     'get_client',
     'get_server',
+    'get_notification_listener',
     'get_notifier',
     'TRANSPORT_ALIASES',
 ]
@@ -27,7 +28,7 @@ from oslo.config import cfg
 from oslo import messaging
 
 import xdrs.exception
-from xdrs.openstack.common import jsonutils
+from xdrs import primitives
 
 CONF = cfg.CONF
 
@@ -174,7 +175,7 @@ def get_allowed_exmods():
 class JsonPayloadSerializer(messaging.NoOpSerializer):
     @staticmethod
     def serialize_entity(context, entity):
-        return jsonutils.to_primitive(entity, convert_instances=True)
+        return primitives.to_primitive(entity, convert_instances=True)
 
 
 class RequestContextSerializer(messaging.Serializer):
@@ -221,6 +222,19 @@ def get_server(target, endpoints, serializer=None):
                                     serializer=serializer)
 
 
+def get_notification_listener(targets, endpoints, serializer=None):
+    """
+    创建通知消息的监听者，用于接收其他服务（例如nova）发出的通知；
+    """
+    assert TRANSPORT is not None
+    serializer = RequestContextSerializer(serializer)
+    return messaging.get_notification_listener(TRANSPORT,
+                                               targets,
+                                               endpoints,
+                                               executor='eventlet',
+                                               serializer=serializer)
+
+
 def get_notifier(service=None, host=None, publisher_id=None):
     assert NOTIFIER is not None
     if not publisher_id:
@@ -14,6 +14,8 @@ from xdrs import conductor
 from xdrs import context
 from xdrs import debugger
 from xdrs import exception
+from xdrs.hosts import reporter as host_reporter
+from xdrs import metrics
 from xdrs.objects import base as objects_base
 from xdrs.openstack.common.gettextutils import _
 from xdrs.openstack.common import importutils
@@ -278,6 +280,7 @@ class Service(service.Service):
         self.binary = binary
         self.topic = topic
         self.manager_class_name = manager
+        metrics.setup(binary)
         manager_class = importutils.import_class(self.manager_class_name)
         self.manager = manager_class(host=self.host, *args, **kwargs)
         self.rpcserver = None
@@ -440,6 +443,14 @@ class Service(service.Service):
                                      periodic_interval_max=
                                         self.periodic_interval_max)
 
+        """
+        服务心跳由本进程的主机状态上报者与主机的其他状态合并上报；
+        """
+        if self.report_interval:
+            reporter = host_reporter.get_reporter(self.conductor_api)
+            reporter.add_service(self.service_id)
+            reporter.start()
+
 
     def _create_service_ref(self, context):
         svc_values = {
@@ -571,6 +582,9 @@ class Service(service.Service):
         except Exception:
             pass
 
+        if self.report_interval:
+            host_reporter.get_reporter().remove_service(self.service_id)
+
         super(Service, self).stop()
 
     """
@@ -600,6 +614,7 @@ class WSGIService(object):
         Initialize, but do not start the WSGI server.
         """
         self.name = name
+        metrics.setup(name)
         self.loader = loader or wsgi.Loader()
         self.app = self.loader.load_app(name)
         """
@@ -664,6 +679,7 @@ class WSGIService(object):
         max_url_len = None
         ======================================================================================
         """
+        self.manager = None
         self.backdoor_port = None
 
 
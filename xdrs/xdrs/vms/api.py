@@ -137,6 +137,12 @@ class API(base.Base):
         
         return self.manager.get_vm_task_state_by_id(context, id)
     
+    def get_vms_metadata_by_host(self, context, host_name):
+        """
+        从本地清单vm_metadata获取指定主机上的虚拟机实例；
+        """
+        return self.manager.get_vms_metadata_by_host(context, host_name)
+    
     def delete_vm_metadata_by_id(self, context=None, id):
         """
         注：这个方法需要比较细致地来写；
@@ -161,6 +167,11 @@ class API(base.Base):
             context = context.get_admin_context()
         
         return self.manager.get_all_vms_migration_records(context)
+
+    def get_vms_migration_records_page(self, context, marker=None, limit=None):
+        return self.manager.get_vms_migration_records_page(context,
+                                                           marker=marker,
+                                                           limit=limit)
             
     def get_vm_migration_record_by_id(self, context=None, id):
         if context is None:
@@ -0,0 +1,187 @@
+"""
+nova中虚拟机实例和计算节点清单的本地镜像；
+
+虚拟机实例同步到vm_metadata，计算节点（nova-compute服务状态和hypervisor资源）
+同步到host_inventory，调度过程从本地数据表读取，不再每次调用nova API；
+
+同步方式：
+1.周期性轮询：使用changes-since只获取上次轮询之后发生变化的虚拟机实例
+  （包括已删除的虚拟机实例，状态为DELETED），每隔nova_inventory_full_sync_interval
+  做一次全量同步，删除本地多余的记录，修正丢失的变化；
+2.通知（可选）：监听nova发出的compute.instance.*通知，及时更新单个虚拟机实例；
+
+注：轮询在没有请求上下文的周期任务中运行，需要配置nova_admin_*服务账号；
+"""
+
+import time
+
+from oslo.config import cfg
+from oslo import messaging
+
+from xdrs.compute import nova
+from xdrs import conductor
+import xdrs.context
+from xdrs.openstack.common.gettextutils import _
+from xdrs.openstack.common import log as logging
+from xdrs.openstack.common import timeutils
+from xdrs import rpc
+
+
+inventory_opts = [
+    cfg.IntOpt('nova_inventory_poll_interval',
+               default=60,
+               help='Seconds between two incremental (changes-since) syncs '
+                    'of the nova instance and hypervisor inventory; '
+                    '0 disables the sync'),
+    cfg.IntOpt('nova_inventory_full_sync_interval',
+               default=3600,
+               help='Seconds between two full syncs of the nova inventory, '
+                    'which also remove the instances missed as deleted'),
+    cfg.BoolOpt('nova_inventory_notifications',
+                default=False,
+                help='Also update the nova inventory from the '
+                     'compute.instance.* notifications of nova'),
+    cfg.StrOpt('nova_notification_topic',
+               default='notifications',
+               help='Topic nova sends its notifications to'),
+    cfg.StrOpt('nova_notification_exchange',
+               default='nova',
+               help='Exchange nova sends its notifications to'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(inventory_opts)
+
+LOG = logging.getLogger(__name__)
+
+_NOVA_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _server_row(server):
+    """
+    nova虚拟机实例 --> vm_metadata记录；
+    """
+    updated = getattr(server, 'updated', None)
+    if updated:
+        updated = timeutils.parse_strtime(updated, _NOVA_TIME_FORMAT)
+    return {'vm_id': server.id,
+            'user_id': server.user_id,
+            'project_id': server.tenant_id,
+            'vm_state': getattr(server, 'OS-EXT-STS:vm_state', None),
+            'host_name': getattr(server, 'OS-EXT-SRV-ATTR:host', None),
+            'nova_updated_at': updated,
+            'deleted': server.status == 'DELETED'}
+
+
+def _host_rows(services, hypervisors):
+    """
+    nova-compute服务和hypervisor --> host_inventory记录；
+    """
+    hypervisors_by_host = dict()
+    for hypervisor in hypervisors:
+        service = getattr(hypervisor, 'service', None) or {}
+        hypervisors_by_host[service.get('host')] = hypervisor
+
+    rows = list()
+    for service in services:
+        hypervisor = hypervisors_by_host.get(service.host)
+        row = {'host_name': service.host,
+               'status': service.status,
+               'state': service.state,
+               'hypervisor_hostname': None,
+               'hypervisor_id': None,
+               'vcpus': None,
+               'memory_mb': None,
+               'running_vms': None}
+        if hypervisor is not None:
+            row.update({'hypervisor_hostname': hypervisor.hypervisor_hostname,
+                        'hypervisor_id': hypervisor.id,
+                        'vcpus': hypervisor.vcpus,
+                        'memory_mb': hypervisor.memory_mb,
+                        'running_vms': hypervisor.running_vms})
+        rows.append(row)
+    return rows
+
+
+class NovaInventory(object):
+    """
+    通过轮询保持本地清单与nova同步；
+    """
+
+    def __init__(self):
+        self.conductor_api = conductor.API()
+        self._changes_since = None
+        self._last_full_sync = 0
+        self._last_poll = 0
+
+    def poll_due(self):
+        interval = CONF.nova_inventory_poll_interval
+        return interval > 0 and time.time() - self._last_poll >= interval
+
+    def poll(self, context):
+        """
+        同步一次nova清单，返回vm_metadata的变化数目；
+        注：先记录本次轮询的开始时间再获取列表，下一次的changes-since从这个时间
+        开始，不会遗漏获取列表期间发生的变化；
+        """
+        now = time.time()
+        self._last_poll = now
+        full_sync = (self._changes_since is None or
+                     now - self._last_full_sync >=
+                     CONF.nova_inventory_full_sync_interval)
+        started_at = timeutils.utcnow()
+
+        if full_sync:
+            servers = nova.list_servers(None)
+        else:
+            changes_since = timeutils.strtime(self._changes_since,
+                                              _NOVA_TIME_FORMAT)
+            servers = nova.list_servers(
+                None, search_opts={'changes-since': changes_since})
+        counts = self.conductor_api.sync_vms_metadata(
+            context, [_server_row(server) for server in servers],
+            prune=full_sync)
+
+        hosts = _host_rows(nova.list_compute_services(None),
+                           nova.list_hypervisors(None))
+        self.conductor_api.sync_hosts_inventory(context, hosts)
+
+        self._changes_since = started_at
+        if full_sync:
+            self._last_full_sync = now
+        LOG.debug(_('Synced nova inventory (full: %(full)s): %(counts)s, '
+                    '%(hosts)d hosts'),
+                  {'full': full_sync, 'counts': counts, 'hosts': len(hosts)})
+        return counts
+
+
+class NotificationEndpoint(object):
+    """
+    处理nova的compute.instance.*通知，更新单个虚拟机实例的记录；
+    """
+
+    filter_event_prefix = 'compute.instance.'
+
+    def __init__(self):
+        self.conductor_api = conductor.API()
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata=None):
+        if not event_type.startswith(self.filter_event_prefix):
+            return
+        vm_id = payload.get('instance_id')
+        if not vm_id:
+            return
+        vm = {'vm_id': vm_id,
+              'user_id': payload.get('user_id'),
+              'project_id': payload.get('tenant_id'),
+              'vm_state': payload.get('state'),
+              'host_name': payload.get('host'),
+              'deleted': event_type == 'compute.instance.delete.end'}
+        context = xdrs.context.get_admin_context()
+        self.conductor_api.sync_vms_metadata(context, [vm])
+
+
+def get_notification_listener():
+    targets = [messaging.Target(topic=CONF.nova_notification_topic,
+                                exchange=CONF.nova_notification_exchange)]
+    return rpc.get_notification_listener(targets, [NotificationEndpoint()])
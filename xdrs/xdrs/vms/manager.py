@@ -40,6 +40,9 @@ class VmManager(manager.Manager):
     
     def get_vm_task_state_by_id(self, context, id):
         return self.conductor_api.get_vm_task_state_by_id(context, id)
+
+    def get_vms_metadata_by_host(self, context, host_name):
+        return self.conductor_api.get_vms_metadata_by_host(context, host_name)
     
     def delete_vm_metadata_by_id(self, context, id):
         """
@@ -60,6 +63,11 @@ class VmManager(manager.Manager):
     """
     def get_all_vms_migration_records(self, context):
         return self.conductor_api.get_all_vms_migration_records(context)
+
+    def get_vms_migration_records_page(self, context, marker=None, limit=None):
+        return self.conductor_api.get_vms_migration_records_page(context,
+                                                                 marker=marker,
+                                                                 limit=limit)
             
     def get_vm_migration_record_by_id(self, context, id):
         return self.conductor_api.get_vm_migration_record_by_id(context, id)